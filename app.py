@@ -1,98 +1,382 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Request, Response, current_app, render_template, request, jsonify, send_file, stream_with_context
+import json
 import os
+import shutil
+import time
 import traceback
-import uuid
+import zipfile
+from functools import partial
+from tempfile import SpooledTemporaryFile
 from werkzeug.utils import secure_filename
-from granite_client import GraniteClient
-from spec_parser import SpecParser
+import generation
+import metrics
+from generation import (
+    EmptyGenerationError, allowed_file, build_prompt, create_test_generation_prompt, generate_cached,
+    generate_for_api, max_new_tokens_for, parse_spec, result_cache_key, spec_hash_for
+)
+from resilience import CircuitOpenError
+from health import CachedCheck
+from rate_limiter import BATCH, INTERACTIVE, RateLimitExceeded
+from spec_validation import SpecValidationError
+from job_queue import JobQueue, QueueFullError
+from incremental import INCREMENTAL_KEY, IncrementalStore
+from session_store import SessionNotFound, SessionStore
+from artifact_store import ArtifactStore
+from zip_stream import ZipStream
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+class SpooledUploadRequest(Request):
+    """
+    Request that keeps uploaded files in memory up to UPLOAD_SPOOL_THRESHOLD
+    bytes and only spills larger ones to an anonymous temporary file, which
+    the OS removes as soon as it is closed.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPOOL_THRESHOLD'], mode='rb+')
+
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Limit upload size to 16MB
-app.config['UPLOAD_FOLDER'] = 'uploads'  # Folder to save uploaded files
+app.config['UPLOAD_SPOOL_THRESHOLD'] = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', 1024 * 1024))  # Uploads larger than this spill to a temp file
 app.config['GENERATED_TESTS_FOLDER'] = 'generated_tests'  # Folder to save generated test files
+app.config['ARTIFACT_FOLDER'] = os.path.join(app.config['GENERATED_TESTS_FOLDER'], 'artifacts')  # Generated files by generation id, with their index
+app.config['ARTIFACT_MAX_BYTES'] = int(os.environ.get('ARTIFACT_MAX_BYTES', 1024 * 1024 * 1024))  # Disk quota before least recently used files are deleted
+app.config['ARTIFACT_TTL'] = int(os.environ.get('ARTIFACT_TTL', 7 * 24 * 3600))  # Seconds a file is kept after its last download or update
+app.config['JOBS_FOLDER'] = 'jobs'  # Folder holding background job state shared between workers
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 4))  # Concurrent background generations
+app.config['JOB_QUEUE_DEPTH'] = int(os.environ.get('JOB_QUEUE_DEPTH', 16))  # Jobs allowed to wait for a worker
+app.config['JOB_RESULT_TTL'] = int(os.environ.get('JOB_RESULT_TTL', 3600))  # Seconds to keep finished jobs
+app.config['READY_CHECK_TTL'] = float(os.environ.get('READY_CHECK_TTL', 15))  # Seconds a /ready result is reused
+app.config['DEEP_HEALTH_ENABLED'] = os.environ.get('DEEP_HEALTH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+app.config['DEEP_HEALTH_MIN_INTERVAL'] = float(os.environ.get('DEEP_HEALTH_MIN_INTERVAL', 300))  # At most one real generation per interval
+app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', 4))  # Specs of one /generate/batch request generated at once
+app.config['BATCH_MAX_SPECS'] = int(os.environ.get('BATCH_MAX_SPECS', 100))  # Specs accepted per /generate/batch request
+app.config['SESSION_FOLDER'] = os.path.join('cache', 'sessions')  # Generation sessions (api_info, prompt, revisions) shared by all workers
+app.config['SESSION_MEMORY_MAX_BYTES'] = int(os.environ.get('SESSION_MEMORY_MAX_BYTES', 64 * 1024 * 1024))  # Decoded sessions kept in memory per worker
+app.config['SESSION_DISK_MAX_BYTES'] = int(os.environ.get('SESSION_DISK_MAX_BYTES', 1024 * 1024 * 1024))
+app.config['SESSION_TTL'] = int(os.environ.get('SESSION_TTL', 7 * 24 * 3600))  # Seconds a session survives after its last revision
 
 # Create folders if they don't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['GENERATED_TESTS_FOLDER'], exist_ok=True)
 
-# Allowed file extensions for upload
-ALLOWED_EXTENSIONS = {'json', 'yaml', 'yml'}
+def request_flag(name):
+    """True when a query string flag such as ?async=true is set."""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
 
-def allowed_file(filename):
-    """Check if the uploaded file has an allowed extension."""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def request_incremental_key():
+    """
+    Incremental key of the current request: ?incremental_key= to continue a
+    previous incremental generation, a fresh key for ?incremental=true, or
+    None when the request is not incremental.
+    """
+    key = request.args.get('incremental_key')
+    if key:
+        if not INCREMENTAL_KEY.match(key):
+            raise UploadError('incremental_key must be 1-128 letters, digits, "-" or "_"')
+        return key
+    return IncrementalStore.new_key() if request_flag('incremental') else None
 
-def create_test_generation_prompt(api_info):
+def request_priority(default=INTERACTIVE):
     """
-    Create a prompt for the AI model using API information.
-    This prompt tells the model to generate JUnit 5 test cases for the given API.
+    Rate limiter lane for the current request, from ?priority= or the
+    X-Priority header ('interactive' or 'batch').
     """
-    endpoints_summary = ""
-    for endpoint in api_info['endpoints']:
-        params = ", ".join([p.get('name', '') for p in endpoint.get('parameters', [])])
-        responses = ", ".join(endpoint.get('responses', {}).keys())
-        endpoints_summary += f"""
-- {endpoint['method']} {endpoint['path']}
-  Summary: {endpoint.get('summary', 'N/A')}
-  Parameters: {params if params else 'None'}
-  Responses: {responses if responses else 'N/A'}"""
-    
-    schemas_summary = ""
-    for name, schema in api_info.get('schemas', {}).items():
-        properties = schema.get('properties', {})
-        prop_list = ", ".join([f"{k}: {v.get('type', 'unknown')}" for k, v in properties.items()])
-        schemas_summary += f"- {name}: {prop_list}\n"
-    
-    # The prompt sent to the AI model
-    prompt = f"""You are an expert QA engineer specializing in API testing. Generate comprehensive JUnit 5 test cases for this REST API.
+    priority = (request.args.get('priority') or request.headers.get('X-Priority') or default).lower()
+    return priority if priority in (INTERACTIVE, BATCH) else default
 
-API Information:
-- Title: {api_info['title']}
-- Version: {api_info['version']}
-- Description: {api_info['description']}
-- Base URL: {api_info['base_url']}
+class UploadError(Exception):
+    """Raised when the request does not carry a usable spec file."""
+    pass
 
-Endpoints:{endpoints_summary}
+def get_uploaded_file():
+    """Return the uploaded spec file from the current request or raise UploadError."""
+    # Check if a file was uploaded
+    if 'file' not in request.files:
+        raise UploadError('No file uploaded')
 
-Data Models:
-{schemas_summary if schemas_summary else 'No schemas defined'}
+    file = request.files['file']
+    if file.filename == '':
+        raise UploadError('No file selected')
 
-Requirements:
-1. Generate complete JUnit 5 test classes with proper annotations
-2. Include positive test cases for valid inputs
-3. Include negative test cases for invalid data and error conditions
-4. Add boundary value testing for numeric fields
-5. Test edge cases (empty strings, null values, special characters)
-6. Generate realistic test data matching API schemas
-7. Use proper assertions for status codes, headers, and response body
-8. Use RestTemplate or TestRestTemplate for API calls
-9. Include setup and teardown methods
-10. Follow Spring Boot testing best practices
+    if not allowed_file(file.filename):
+        raise UploadError('Invalid file type. Please upload JSON, YAML, or YML files.')
+    return file
 
-Generate complete, runnable Java test classes:
+def test_filename_for(api_info):
+    """Download name of the Java file holding the tests generated for an API."""
+    return f"{secure_filename(api_info['title'].replace(' ', '_')) or 'Api'}_Tests.java"
 
-package com.example.api.test;
+def download_url_for(session):
+    return f"/download/{session['id']}"
 
-import org.junit.jupiter.api.Test;
-import org.junit.jupiter.api.BeforeEach;
-import org.springframework.boot.test.context.SpringBootTest;
-import org.springframework.test.web.reactive.server.WebTestClient;
-import static org.junit.jupiter.api.Assertions.*;
+def sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-@SpringBootTest(webEnvironment = SpringBootTest.WebEnvironment.RANDOM_PORT)
-public class {api_info['title'].replace(' ', '')}ApiTest {{
+def quota_exhausted(error):
+    """429 response used when the client-side watsonx quota is exhausted."""
+    response = jsonify({'error': f'Server is busy: {str(error)}. Please retry later.'})
+    response.headers['Retry-After'] = str(max(1, int(error.retry_after + 0.5)))
+    return response, 429
 
-text
+def upstream_unavailable(error):
+    """503 response used while the watsonx circuit breaker is failing fast."""
+    response = jsonify({'error': f'Test generation is temporarily unavailable: {str(error)}'})
+    response.headers['Retry-After'] = str(int(granite_client.circuit_breaker.reset_timeout))
+    return response, 503
 
-Generate the complete test implementation now:"""
-    return prompt
+def read_upload(file):
+    """
+    Read the uploaded spec straight from the request's upload buffer and
+    return (filename, content). Nothing is written to the uploads folder and
+    the buffer is released even when decoding fails.
+    """
+    start = time.perf_counter()
+    filename = secure_filename(file.filename)
+    try:
+        file_content = file.stream.read().decode('utf-8')
+    finally:
+        file.close()
+        metrics.observe_since('upload_read', start)
+    return filename, file_content
+
+def invalid_spec(e):
+    """400 response for a spec rejected by validation, listing where it is invalid."""
+    return jsonify({'error': str(e), 'validation_errors': e.errors}), 400
+
+def save_artifact(session, text, spec_hash=None):
+    """Store text as the downloadable test file of a session and return its metadata."""
+    start = time.perf_counter()
+    try:
+        return artifact_store.put(session['id'], session['filename'], text, spec_hash, granite_client.model_id)
+    finally:
+        metrics.observe_since('file_write', start)
+
+def generate_from_spec(file_content, filename, sharded=False, incremental_key=None, priority=INTERACTIVE):
+    """
+    Parse the API spec, generate test cases using the AI model and save the
+    generated test file. Returns the payload sent back to the frontend.
+    See generate_for_api for `sharded` and `incremental_key`.
+    """
+    # Parse the API spec
+    file_extension = filename.rsplit('.', 1)[1].lower()
+    api_info = parse_spec(file_content, file_extension)
 
-# Initialize the GraniteClient (reads credentials from .env)
-granite_client = GraniteClient()
+    generated_tests, diff, prompt_report, prompt = generate_for_api(api_info, sharded, incremental_key, priority)
+
+    # Keep the parsed spec and prompt server-side so feedback rounds only send the session id,
+    # and save the test file under the session's id
+    test_filename = test_filename_for(api_info)
+    session = session_store.create(api_info, generated_tests, test_filename, prompt)
+    save_artifact(session, generated_tests, spec_hash_for(file_content))
+
+    result = {
+        'success': True,
+        'test_cases': generated_tests,
+        'filename': test_filename,
+        'download_url': download_url_for(session),
+        'api_title': api_info['title'],
+        'endpoints_count': len(api_info['endpoints']),
+        'session_id': session['id'],
+        'revision': 1
+    }
+    if diff is not None:
+        result['diff'] = diff
+        result['incremental_key'] = incremental_key
+    if prompt_report is not None:
+        result['prompt'] = prompt_report
+    return result
+
+def read_archive_member(archive, member):
+    """Bytes of a spec inside an uploaded archive, refusing members larger than an upload."""
+    if member.file_size > app.config['MAX_CONTENT_LENGTH']:
+        raise UploadError(f'{member.filename} is larger than {app.config["MAX_CONTENT_LENGTH"]} bytes')
+    return archive.read(member)
+
+def spool_upload(file):
+    """
+    Copy an uploaded file into a spooled temporary file owned by the caller.
+    Werkzeug may close request files once the view returns, while batch specs
+    are read later, from the streamed response.
+    """
+    copy = SpooledTemporaryFile(max_size=app.config['UPLOAD_SPOOL_THRESHOLD'], mode='w+b')
+    try:
+        shutil.copyfileobj(file.stream, copy)
+        copy.seek(0)
+    except Exception:
+        copy.close()
+        raise
+    return copy
+
+def batch_spec_sources():
+    """
+    Return (sources, copies) for the specs of a batch request. Sources are
+    (name, loader) pairs for each uploaded `files` entry and each spec file
+    inside uploaded .zip archives. Loaders return the spec bytes and run on
+    the batch workers, so specs are only read (and decompressed) when they
+    are generated; they read from `copies`, spooled copies of the uploads
+    that the caller closes once the batch is done.
+    """
+    sources = []
+    copies = []
+    try:
+        for file in request.files.getlist('files') + request.files.getlist('file'):
+            if (file.filename or '').lower().endswith('.zip'):
+                copy = spool_upload(file)
+                copies.append(copy)
+                try:
+                    archive = zipfile.ZipFile(copy)
+                except zipfile.BadZipFile:
+                    raise UploadError(f'{file.filename} is not a valid ZIP archive')
+                for member in archive.infolist():
+                    if not member.is_dir() and allowed_file(member.filename):
+                        sources.append((member.filename, partial(read_archive_member, archive, member)))
+            elif allowed_file(file.filename):
+                copy = spool_upload(file)
+                copies.append(copy)
+                sources.append((file.filename, copy.read))
+            elif file.filename:
+                raise UploadError(f'Invalid file type: {file.filename}. Please upload JSON, YAML, YML or ZIP files.')
+
+        if not sources:
+            raise UploadError('No spec files uploaded')
+        if len(sources) > app.config['BATCH_MAX_SPECS']:
+            raise UploadError(f'Too many specs ({len(sources)}); at most {app.config["BATCH_MAX_SPECS"]} per batch')
+    except Exception:
+        close_all(copies)
+        raise
+    return sources, copies
+
+def close_all(files):
+    for file in files:
+        file.close()
+
+def batch_output_name(spec_name, used):
+    """
+    Archive path of the tests for a spec, mirroring its (sanitized) relative
+    path: billing/api.yaml -> billing/api_Tests.java. Names already in `used`
+    get a numeric suffix.
+    """
+    parts = [secure_filename(part) for part in spec_name.replace('\\', '/').split('/')]
+    base = os.path.splitext('/'.join(part for part in parts if part))[0] or 'api'
+    name = f"{base}_Tests.java"
+    index = 2
+    while name in used:
+        name = f"{base}_{index}_Tests.java"
+        index += 1
+    used.add(name)
+    return name
+
+def generate_batch_spec(spec_name, load, sharded, priority):
+    """Generate the tests for one spec of a batch; returns (manifest entry, code or None)."""
+    started = time.perf_counter()
+    entry = {'spec': spec_name}
+    generated_tests = None
+    try:
+        file_content = load().decode('utf-8')
+        api_info = parse_spec(file_content, spec_name.rsplit('.', 1)[1].lower())
+        entry['api_title'] = api_info['title']
+        entry['endpoints_count'] = len(api_info['endpoints'])
+        generated_tests, _, prompt_report, _ = generate_for_api(api_info, sharded=sharded, priority=priority)
+        if prompt_report:
+            entry['prompt'] = prompt_report
+        entry['status'] = 'generated'
+    except Exception as e:
+        metrics.record_error(e)
+        entry['status'] = 'failed'
+        entry['error'] = str(e)
+        if isinstance(e, SpecValidationError):
+            entry['validation_errors'] = e.errors
+    entry['seconds'] = round(time.perf_counter() - started, 4)
+    return entry, generated_tests
+
+def readiness_check():
+    """
+    Cheap readiness probe: a usable IAM token (the cached one, or a fresh one
+    when it has expired) and a reachable watsonx endpoint. No generation is made.
+    """
+    checks = {}
+
+    token = granite_client.token_status()
+    if not token['valid']:
+        try:
+            granite_client.get_access_token()
+            token = dict(granite_client.token_status(), refreshed=True)
+        except Exception as e:
+            token = dict(token, error=str(e))
+    checks['iam_token'] = dict(token, ok=token['valid'])
+
+    try:
+        checks['watsonx'] = dict(granite_client.ping(), ok=True)
+    except Exception as e:
+        checks['watsonx'] = {'ok': False, 'error': str(e)}
+
+    # Reported but not gating: an open breaker already fails requests fast
+    checks['circuit_breaker'] = {'state': granite_client.circuit_breaker.state}
+
+    return {'ok': checks['iam_token']['ok'] and checks['watsonx']['ok'], 'checks': checks}
+
+def deep_health_check():
+    """End-to-end probe that sends a real (tiny) prompt through the model."""
+    test_prompt = "Hello, respond with 'OK' if you can process this request."
+    response = granite_client.generate_test_cases(test_prompt, BATCH)
+    return {
+        'ok': True,
+        'granite_model': granite_client.model_id,
+        'project_id': granite_client.project_id,
+        'test_response': response.strip()
+    }
+
+def run_generation_job(*args):
+    """generate_from_spec as run by the background job queue, tracked in the job gauges."""
+    metrics.job_state('queued').dec()
+    metrics.job_state('running').inc()
+    try:
+        return generate_from_spec(*args)
+    except Exception as e:
+        metrics.record_error(e)
+        raise
+    finally:
+        metrics.job_state('running').dec()
+
+# Granite client, result cache, coalescer, incremental store and spec validator of the generation pipeline
+generation.setup()
+granite_client = generation.granite_client
+result_cache = generation.result_cache
+coalescer = generation.coalescer
+spec_validator = generation.spec_validator
+
+# Generation sessions for /regenerate and revision rollback
+session_store = SessionStore(
+    app.config['SESSION_FOLDER'],
+    memory_max_bytes=app.config['SESSION_MEMORY_MAX_BYTES'],
+    disk_max_bytes=app.config['SESSION_DISK_MAX_BYTES'],
+    ttl=app.config['SESSION_TTL']
+)
+
+# Generated test files by generation (session) id
+artifact_store = ArtifactStore(
+    app.config['ARTIFACT_FOLDER'],
+    max_bytes=app.config['ARTIFACT_MAX_BYTES'],
+    ttl=app.config['ARTIFACT_TTL']
+)
+
+# Probe results are cached so frequent liveness/readiness probes stay off the LLM
+readiness = CachedCheck(readiness_check, ttl=app.config['READY_CHECK_TTL'])
+deep_health = CachedCheck(deep_health_check, ttl=app.config['DEEP_HEALTH_MIN_INTERVAL'])
+
+# Bounded worker pool for asynchronous generation jobs
+job_queue = JobQueue(
+    max_workers=app.config['JOB_WORKERS'],
+    max_pending=app.config['JOB_QUEUE_DEPTH'],
+    result_ttl=app.config['JOB_RESULT_TTL'],
+    state_dir=app.config['JOBS_FOLDER']
+)
 
 @app.route('/')
 def index():
@@ -104,158 +388,469 @@ def generate_tests():
     """
     Handle file upload, parse the API spec, generate test cases using the AI model,
     save the generated test file, and return the result to the frontend.
+
+    With ?sharded=true the spec is generated shard by shard in parallel (see
+    generate_sharded). ?incremental=true starts an incremental generation and
+    returns its `incremental_key`; passing it back as ?incremental_key=
+    regenerates only the operations changed since. With ?async=true the generation runs on the background
+    job queue instead: the response is 202 with a job id to poll via
+    GET /jobs/<job_id>, or 429 when the queue is full.
     """
     try:
-        # Check if a file was uploaded
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type. Please upload JSON, YAML, or YML files.'}), 400
-        
-        # Save the uploaded file
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(filepath)
-        
-        # Read the file content
-        with open(filepath, 'r', encoding='utf-8') as f:
-            file_content = f.read()
-        
-        # Parse the API spec
-        file_extension = filename.rsplit('.', 1)[1].lower()
-        api_info = SpecParser.parse_openapi_spec(file_content, file_extension)
-        
-        # Create the prompt and generate test cases
-        prompt = create_test_generation_prompt(api_info)
-        generated_tests = granite_client.generate_test_cases(prompt)
-        
-        # If generation failed, return error
-        if not generated_tests or not generated_tests.strip():
-            return jsonify({'error': 'Test generation failed or returned empty result.'}), 500
-        
-        # Save the generated test cases to a file
-        test_filename = f"{api_info['title'].replace(' ', '_')}_Tests.java"
-        test_filepath = os.path.join(app.config['GENERATED_TESTS_FOLDER'], test_filename)
-        with open(test_filepath, 'w', encoding='utf-8') as f:
-            f.write(generated_tests)
-
-        # Remove the uploaded file after processing
-        os.remove(filepath)
-        
-        # Debug: print files in the generated_tests folder
-        print("Files in generated_tests:", os.listdir(app.config['GENERATED_TESTS_FOLDER']))
-        print("Expected filename:", test_filename)
+        file = get_uploaded_file()
+        filename, file_content = read_upload(file)
+
+        sharded = request_flag('sharded')
+        incremental_key = request_incremental_key()
+
+        if request_flag('async'):
+            metrics.job_state('queued').inc()
+            try:
+                job = job_queue.submit(
+                    run_generation_job, file_content, filename, sharded, incremental_key, request_priority(default=BATCH)
+                )
+            except QueueFullError as e:
+                metrics.job_state('queued').dec()
+                metrics.record_error(e)
+                response = jsonify({'error': f'Server is busy: {str(e)}. Please retry later.'})
+                response.headers['Retry-After'] = '5'
+                return response, 429
+            except Exception:
+                metrics.job_state('queued').dec()
+                raise
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f'/jobs/{job.id}'
+            }), 202
+
+        result = generate_from_spec(file_content, filename, sharded, incremental_key, request_priority())
         
         # Return the result to the frontend
-        return jsonify({
-            'success': True,
-            'test_cases': generated_tests,
-            'filename': test_filename,
-            'api_title': api_info['title'],
-            'endpoints_count': len(api_info['endpoints'])
-        })
+        return jsonify(result)
     
+    except UploadError as e:
+        metrics.record_error(e)
+        return jsonify({'error': str(e)}), 400
+    except SpecValidationError as e:
+        metrics.record_error(e)
+        return invalid_spec(e)
+    except EmptyGenerationError as e:
+        metrics.record_error(e)
+        return jsonify({'error': str(e)}), 500
+    except CircuitOpenError as e:
+        metrics.record_error(e)
+        return upstream_unavailable(e)
+    except RateLimitExceeded as e:
+        metrics.record_error(e)
+        return quota_exhausted(e)
     except Exception as e:
+        metrics.record_error(e)
         # Return error details if something goes wrong
         return jsonify({
             'error': f'Failed to generate tests: {str(e)}',
             'details': traceback.format_exc()
         }), 500
 
-@app.route('/download/<filename>')
-def download_tests(filename):
+@app.route('/generate/stream', methods=['POST'])
+def generate_tests_stream():
     """
-    Allow the user to download the generated Java test file.
+    Same as /generate, but relays the generated code to the browser as
+    Server-Sent Events while the model is still producing it.
+
+    Events: `meta` (API title, endpoint count, filename), one `chunk` per piece
+    of generated text, then `done` (with the session id) or `error`. Chunks are
+    written straight to a file in the artifact store, which is moved into place
+    once the generation is complete. A spec too large for one prompt is
+    answered with 413, since only /generate can shard it.
+
+    The relay itself never holds the whole output, but the finished file is
+    read back into memory once for the result cache and the session, which
+    keep the full text anyway. So peak memory per request is one generated
+    class, as with /generate; only the time to first byte improves.
     """
     try:
-        abs_generated_tests = os.path.abspath(app.config['GENERATED_TESTS_FOLDER'])
-        print("Download requested for:", filename)
-        print("Serving from:", abs_generated_tests)
-        print("Full file path:", os.path.join(abs_generated_tests, filename))
-        return send_from_directory(abs_generated_tests, filename, as_attachment=True)
+        file = get_uploaded_file()
+        filename, file_content = read_upload(file)
+
+        file_extension = filename.rsplit('.', 1)[1].lower()
+        api_info = parse_spec(file_content, file_extension)
+        prompt_build = build_prompt(api_info)
+        if not prompt_build.fits and api_info['endpoints']:
+            return jsonify({
+                'error': 'The spec does not fit one prompt within PROMPT_TOKEN_BUDGET even after compaction; '
+                         'use /generate, which generates it shard by shard.',
+                'prompt': prompt_build.report()
+            }), 413
+        prompt = prompt_build.text
+        priority = request_priority()
+    except UploadError as e:
+        metrics.record_error(e)
+        return jsonify({'error': str(e)}), 400
+    except SpecValidationError as e:
+        metrics.record_error(e)
+        return invalid_spec(e)
     except Exception as e:
-        print("Download error:", str(e))
-        return jsonify({'error': f'File not found: {str(e)}'}), 404
+        metrics.record_error(e)
+        return jsonify({
+            'error': f'Failed to generate tests: {str(e)}',
+            'details': traceback.format_exc()
+        }), 500
+
+    test_filename = test_filename_for(api_info)
+    spec_hash = spec_hash_for(file_content)
+    summary = {
+        'filename': test_filename,
+        'api_title': api_info['title'],
+        'endpoints_count': len(api_info['endpoints'])
+    }
+
+    def events():
+        yield sse_event('meta', summary)
+
+        cache_key = result_cache_key(api_info, prompt)
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cache_key:
+            metrics.record_cache_lookup(cached is not None)
+        if cached is not None:
+            yield sse_event('chunk', {'text': cached})
+            session = session_store.create(api_info, cached, test_filename, prompt)
+            save_artifact(session, cached, spec_hash)
+            yield sse_event('done', dict(
+                summary, success=True, cached=True, session_id=session['id'], revision=1,
+                download_url=download_url_for(session)
+            ))
+            return
+
+        partial_path = artifact_store.temp_path()
+        has_content = False
+        try:
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                for chunk in granite_client.generate_test_cases_stream(prompt, priority, max_new_tokens_for(api_info)):
+                    f.write(chunk)
+                    has_content = has_content or bool(chunk.strip())
+                    yield sse_event('chunk', {'text': chunk})
+
+            if not has_content:
+                metrics.record_error(EmptyGenerationError())
+                yield sse_event('error', {'error': 'Test generation failed or returned empty result.'})
+                return
+
+            with open(partial_path, 'r', encoding='utf-8') as f:
+                generated_tests = f.read()
+            if cache_key:
+                result_cache.put(cache_key, generated_tests)
+            session = session_store.create(api_info, generated_tests, test_filename, prompt)
+            start = time.perf_counter()
+            artifact_store.put_file(session['id'], test_filename, partial_path, spec_hash, granite_client.model_id)
+            metrics.observe_since('file_write', start)
+            yield sse_event('done', dict(
+                summary, success=True, session_id=session['id'], revision=1, download_url=download_url_for(session)
+            ))
+        except Exception as e:
+            metrics.record_error(e)
+            yield sse_event('error', {'error': f'Failed to generate tests: {str(e)}'})
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/generate/batch', methods=['POST'])
+def generate_tests_batch():
+    """
+    Generate tests for many specs at once: several `files` uploads and/or
+    .zip archives of specs. Up to BATCH_WORKERS specs are generated
+    concurrently (through the batch rate-limit lane unless ?priority= says
+    otherwise) and the response is a ZIP streamed as each test class
+    completes, ending with manifest.json holding every spec's status.
+    """
+    try:
+        sources, copies = batch_spec_sources()
+    except UploadError as e:
+        metrics.record_error(e)
+        return jsonify({'error': str(e)}), 400
+
+    sharded = request_flag('sharded')
+    priority = request_priority(default=BATCH)
+
+    def archive():
+        started_at = time.time()
+        started = time.perf_counter()
+        stream = ZipStream()
+        entries = []
+        used = set()
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, min(app.config['BATCH_WORKERS'], len(sources))), thread_name_prefix='generate-batch'
+        )
+        try:
+            # Futures are not kept, so each class is released once it is in the archive
+            for future in as_completed([
+                pool.submit(generate_batch_spec, name, load, sharded, priority) for name, load in sources
+            ]):
+                entry, generated_tests = future.result()
+                if generated_tests is not None:
+                    entry['output'] = batch_output_name(entry['spec'], used)
+                    yield stream.add(entry['output'], generated_tests)
+                entries.append(entry)
+
+            manifest = {
+                'started_at': started_at,
+                'wall_seconds': round(time.perf_counter() - started, 3),
+                'totals': {
+                    'specs': len(entries),
+                    'generated': sum(1 for entry in entries if entry['status'] == 'generated'),
+                    'failed': sum(1 for entry in entries if entry['status'] == 'failed')
+                },
+                'specs': sorted(entries, key=lambda entry: entry['spec'])
+            }
+            yield stream.add('manifest.json', json.dumps(manifest, indent=2))
+            yield stream.close()
+        finally:
+            # Stop queued specs when the client goes away mid-download
+            pool.shutdown(wait=False, cancel_futures=True)
+            close_all(copies)
+
+    return Response(
+        stream_with_context(archive()),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': 'attachment; filename=generated_tests.zip',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Return the status of a background generation job, with its result once finished."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'failed':
+        job['error'] = f"Failed to generate tests: {job['error']}"
+    return jsonify(job)
+
+@app.route('/download/<artifact_id>')
+def download_tests(artifact_id):
+    """
+    Download the generated Java test file of a generation. Responses carry an
+    ETag, so a repeated download with If-None-Match is answered with 304.
+    """
+    meta = artifact_store.get(artifact_id)
+    if meta is None:
+        # The file was evicted but its session is still alive: restore the current revision
+        try:
+            session = session_store.get(artifact_id)
+        except SessionNotFound:
+            return jsonify({'error': 'File not found'}), 404
+        meta = save_artifact(session, SessionStore.current(session)['code'])
+        if meta is None:
+            return jsonify({'error': 'File not found'}), 404
+
+    return send_file(
+        os.path.abspath(artifact_store.path_for(artifact_id)),
+        mimetype='text/x-java-source',
+        as_attachment=True,
+        download_name=meta['filename'],
+        etag=meta['etag'],
+        last_modified=meta['updated_at'],
+        max_age=0,
+        conditional=True
+    )
+
+@app.route('/artifacts')
+def list_artifacts():
+    """Metadata of stored test files, most recently updated first (?limit=, ?offset=)."""
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    artifacts = artifact_store.list(limit, offset)
+    for meta in artifacts:
+        meta['download_url'] = f"/download/{meta['id']}"
+    return jsonify({'artifacts': artifacts, 'limit': limit, 'offset': offset})
 
 @app.route('/health')
 def health_check():
     """
-    Simple health check endpoint to verify the app and Granite model are working.
+    Liveness probe: answers as long as the worker can serve requests.
+    It never contacts IAM or watsonx; see /ready and /health/deep for that.
     """
-    try:
-        test_prompt = "Hello, respond with 'OK' if you can process this request."
-        response = granite_client.generate_test_cases(test_prompt)
-        return jsonify({
-            'status': 'healthy',
-            'granite_model': granite_client.model_id,
-            'project_id': granite_client.project_id,
-            'test_response': response.strip()
-        })
-    except Exception as e:
-        return jsonify({
-            'status': 'unhealthy',
-            'error': str(e)
-        }), 500
+    return jsonify({'status': 'alive'})
+
+@app.route('/ready')
+def readiness_probe():
+    """
+    Readiness probe: IAM token validity and watsonx reachability, reusing the
+    last result for READY_CHECK_TTL seconds. 503 when not ready.
+    """
+    result, age = readiness.get()
+    body = dict(result, status='ready' if result['ok'] else 'not_ready', age_seconds=age)
+    body.pop('ok')
+    return jsonify(body), 200 if result['ok'] else 503
+
+@app.route('/health/deep')
+def deep_health_probe():
+    """
+    Full check that generates a short response from the Granite model. It runs
+    at most once per DEEP_HEALTH_MIN_INTERVAL seconds; other calls get the
+    last result with its age.
+    """
+    if not app.config['DEEP_HEALTH_ENABLED']:
+        return jsonify({'error': 'Deep health check is disabled'}), 404
+    result, age = deep_health.get()
+    body = dict(result, status='healthy' if result['ok'] else 'unhealthy', age_seconds=age)
+    body.pop('ok')
+    return jsonify(body), 200 if result['ok'] else 500
+
+@app.route('/stats')
+def stats():
+    """Runtime counters for the connection pool, job queue, result cache, coalescing, sessions, artifacts, spec validation and upstream retries."""
+    return jsonify({
+        'connection_pool': granite_client.connection_stats(),
+        'jobs': job_queue.stats(),
+        'result_cache': result_cache.stats() if result_cache else None,
+        'coalescing': coalescer.stats(),
+        'sessions': session_store.stats(),
+        'artifacts': artifact_store.stats(),
+        'spec_validation': spec_validator.stats() if spec_validator else None,
+        'upstream': granite_client.resilience_stats()
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus exposition of stage latencies, sizes, errors, cache lookups, job gauges and upstream retry and breaker counters for all workers."""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+def session_summary(session):
+    """Session metadata and revision history, without the code of each revision."""
+    return {
+        'session_id': session['id'],
+        'filename': session['filename'],
+        'api_title': session['api_info']['title'],
+        'endpoints_count': len(session['api_info']['endpoints']),
+        'created_at': session['created_at'],
+        'updated_at': session['updated_at'],
+        'revision': SessionStore.current(session)['revision'],
+        'revisions': [
+            {key: value for key, value in revision.items() if key != 'code'}
+            for revision in session['revisions']
+        ]
+    }
+
+def revision_result(session):
+    """Response payload for the current revision of a session, shaped like /generate's."""
+    current = SessionStore.current(session)
+    return {
+        'success': True,
+        'test_cases': current['code'],
+        'filename': session['filename'],
+        'download_url': download_url_for(session),
+        'api_title': session['api_info']['title'],
+        'endpoints_count': len(session['api_info']['endpoints']),
+        'session_id': session['id'],
+        'revision': current['revision']
+    }
 
 @app.route('/regenerate', methods=['POST'])
 def regenerate_tests():
+    """
+    Regenerate the tests of a session from user feedback. The body is
+    {"session_id": ..., "suggestions": ...}; the parsed spec, prompt and the
+    current code come from the session store, and the result is saved as the
+    session's next revision.
+    """
     try:
-        data = request.get_json()
-        filename = data.get('filename')
-        suggestions = data.get('suggestions', '').strip()
-        api_spec = data.get('api_spec', '')
-        api_spec_type = data.get('api_spec_type', '')
-        previous_code = data.get('previous_code', '')
+        data = request.get_json(silent=True) or {}
+        session_id = data.get('session_id')
+        suggestions = (data.get('suggestions') or '').strip()
 
-        if not filename or not suggestions or not api_spec or not previous_code:
-            return jsonify({'error': 'Missing required data for regeneration'}), 400
+        if not session_id or not suggestions:
+            return jsonify({'error': 'Missing session_id or suggestions for regeneration'}), 400
 
-        # Parse the API spec again
-        api_info = SpecParser.parse_openapi_spec(api_spec, api_spec_type)
+        session = session_store.get(session_id)
+        api_info = session['api_info']
+        prompt = session['prompt']
+        if prompt is None:
+            # Sharded and incremental generations have no single prompt; build it once
+            prompt = create_test_generation_prompt(api_info)
+            session_store.set_prompt(session_id, prompt)
+        previous_code = SessionStore.current(session)['code']
 
-        # Build a new prompt
-        prompt = create_test_generation_prompt(api_info)
         prompt += f"\n\nUser Feedback: {suggestions}\n\nPrevious Generated Code:\n```java\n{previous_code}\n```\nPlease update the test cases accordingly."
 
-        improved_tests = granite_client.generate_test_cases(prompt)
+        improved_tests = generate_cached(api_info, prompt, request_priority())
         if not improved_tests or not improved_tests.strip():
+            metrics.record_error(EmptyGenerationError())
             return jsonify({'error': 'Test regeneration failed or returned empty result.'}), 500
 
-        # Overwrite the generated test file
-        test_path = os.path.join(app.config['GENERATED_TESTS_FOLDER'], filename)
-        with open(test_path, 'w', encoding='utf-8') as f:
-            f.write(improved_tests)
+        session = session_store.add_revision(session_id, improved_tests, feedback=suggestions)
 
-        return jsonify({
-            'success': True,
-            'test_cases': improved_tests,
-            'filename': filename,
-            'api_title': api_info['title'],
-            'endpoints_count': len(api_info['endpoints'])
-        })
+        # Replace the session's test file
+        save_artifact(session, improved_tests)
+
+        return jsonify(revision_result(session))
+    except SessionNotFound as e:
+        metrics.record_error(e)
+        return jsonify({'error': str(e)}), 404
+    except CircuitOpenError as e:
+        metrics.record_error(e)
+        return upstream_unavailable(e)
+    except RateLimitExceeded as e:
+        metrics.record_error(e)
+        return quota_exhausted(e)
     except Exception as e:
+        metrics.record_error(e)
         print("Regenerate error:", str(e))
         return jsonify({
             'error': f'Failed to regenerate tests: {str(e)}',
             'details': traceback.format_exc()
         }), 500
 
+@app.route('/sessions/<session_id>')
+def session_status(session_id):
+    """Metadata and revision history (feedback and timestamps) of a generation session."""
+    try:
+        return jsonify(session_summary(session_store.get(session_id)))
+    except SessionNotFound as e:
+        return jsonify({'error': str(e)}), 404
+
+@app.route('/sessions/<session_id>/revisions/<int:revision>')
+def session_revision(session_id, revision):
+    """The code of one revision of a session."""
+    try:
+        session = session_store.get(session_id)
+    except SessionNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    if not 1 <= revision <= len(session['revisions']):
+        return jsonify({'error': f'Session has no revision {revision}'}), 404
+    return jsonify(dict(session['revisions'][revision - 1], session_id=session_id))
+
+@app.route('/sessions/<session_id>/rollback', methods=['POST'])
+def rollback_session(session_id):
+    """
+    Make an earlier revision current again ({"revision": n}). The code is
+    added as a new revision and written back to the session's test file.
+    """
+    data = request.get_json(silent=True) or {}
+    revision = data.get('revision')
+    if not isinstance(revision, int) or isinstance(revision, bool):
+        return jsonify({'error': 'revision must be an integer'}), 400
+    try:
+        session = session_store.rollback(session_id, revision)
+    except SessionNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
+    save_artifact(session, SessionStore.current(session)['code'])
+    return jsonify(revision_result(session))
+
 if __name__ == '__main__':
     # Run the Flask app
     app.run(debug=True, host='0.0.0.0', port=5000)
-
-# Example fetch call for regenerate
-fetch('/regenerate', {
-    method: 'POST',
-    headers: {'Content-Type': 'application/json'},
-    body: JSON.stringify({
-        filename: currentFilename, # must be set after generation
-        suggestions: feedbackInput.value.trim() # or whatever your textarea id is
-    })
-})
\ No newline at end of file
@@ -0,0 +1,221 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+ARTIFACT_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# Partial (.part) and temporary (.tmp) files older than this were left by
+# interrupted writes; no generation streams for that long
+STALE_PARTIAL_SECONDS = 24 * 3600
+
+
+class ArtifactStore:
+    """
+    Generated test files keyed by generation id, so concurrent generations of
+    APIs with the same title never overwrite each other.
+
+    Each artifact is stored as <folder>/<id>.java and replaced atomically. A
+    SQLite index in the same folder holds its metadata (download filename,
+    spec hash, model, timestamps, size and the content digest used as ETag),
+    so lookups and listings never touch the files themselves, and every
+    gunicorn worker shares it. Artifacts not downloaded or rewritten for `ttl`
+    seconds are deleted; beyond `max_bytes` the least recently used go first,
+    but never the artifact being written, so one larger than `max_bytes` is
+    still stored (and is the first to go on the next write).
+    Leftovers of interrupted writes are swept at most once a minute.
+    """
+
+    def __init__(self, folder, max_bytes=1024 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.folder = folder
+        self.index_path = os.path.join(folder, 'index.sqlite3')
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_sweep = 0
+        self.stores = 0
+        self.evictions = 0
+
+        os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS artifacts (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    spec_hash TEXT,
+                    model TEXT,
+                    etag TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS artifacts_accessed_at ON artifacts (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS artifacts_updated_at ON artifacts (updated_at)")
+
+    COLUMNS = ('id', 'filename', 'spec_hash', 'model', 'etag', 'size', 'created_at', 'updated_at', 'accessed_at')
+
+    def _connect(self):
+        # One short-lived connection per operation keeps this safe across threads
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    def path_for(self, artifact_id):
+        if not ARTIFACT_ID.match(artifact_id or ''):
+            raise ValueError(f"Invalid artifact id {artifact_id!r}")
+        return os.path.join(self.folder, f"{artifact_id}.java")
+
+    def temp_path(self):
+        """A fresh path inside the store for writing an artifact before put_file()."""
+        return os.path.join(self.folder, f"{uuid.uuid4().hex}.part")
+
+    def put(self, artifact_id, filename, text, spec_hash=None, model=None):
+        """Atomically store text as the artifact and return its metadata."""
+        tmp_path = f"{self.path_for(artifact_id)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return self.put_file(artifact_id, filename, tmp_path, spec_hash, model)
+
+    def put_file(self, artifact_id, filename, src_path, spec_hash=None, model=None):
+        """
+        Move a finished file (on the store's filesystem) into place as the
+        artifact and return its metadata. Rewriting an artifact keeps its
+        created_at and, unless a new one is given, its spec hash.
+        """
+        path = self.path_for(artifact_id)
+        digest = hashlib.sha256()
+        with open(src_path, 'rb') as f:
+            for block in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(block)
+        size = os.path.getsize(src_path)
+        os.replace(src_path, path)
+
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    """INSERT INTO artifacts (id, filename, spec_hash, model, etag, size, created_at, updated_at, accessed_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (id) DO UPDATE SET
+                           filename = excluded.filename,
+                           spec_hash = COALESCE(excluded.spec_hash, artifacts.spec_hash),
+                           model = COALESCE(excluded.model, artifacts.model),
+                           etag = excluded.etag,
+                           size = excluded.size,
+                           updated_at = excluded.updated_at,
+                           accessed_at = excluded.accessed_at""",
+                    (artifact_id, filename, spec_hash, model, digest.hexdigest()[:32], size, now, now, now)
+                )
+                evicted = self._evict(conn, now, keep=artifact_id)
+                row = self._select(conn, artifact_id)
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.stores += 1
+            self.evictions += evicted
+        return row
+
+    def _select(self, conn, artifact_id):
+        row = conn.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM artifacts WHERE id = ?", (artifact_id,)
+        ).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row is not None else None
+
+    def get(self, artifact_id, touch=True):
+        """
+        Metadata of an artifact, or None when it is unknown, expired or its
+        file is gone. `touch` marks it as recently used for retention.
+        """
+        if not ARTIFACT_ID.match(artifact_id or ''):
+            return None
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                meta = self._select(conn, artifact_id)
+                if meta is not None and (meta['accessed_at'] <= now - self.ttl or not os.path.exists(self.path_for(artifact_id))):
+                    conn.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
+                    self._remove_file(artifact_id)
+                    meta = None
+                if meta is not None and touch:
+                    conn.execute("UPDATE artifacts SET accessed_at = ? WHERE id = ?", (now, artifact_id))
+        finally:
+            conn.close()
+        return meta
+
+    def list(self, limit=100, offset=0):
+        """Metadata of stored artifacts, most recently updated first."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM artifacts WHERE accessed_at > ? "
+                "ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                (time.time() - self.ttl, limit, offset)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def _remove_file(self, artifact_id):
+        try:
+            os.remove(self.path_for(artifact_id))
+        except OSError:
+            pass
+
+    def _sweep_partials(self, now):
+        """Delete .part and .tmp files left by interrupted writes (at most once a minute)."""
+        with self._lock:
+            if now - self._last_sweep < 60:
+                return
+            self._last_sweep = now
+        for entry in os.scandir(self.folder):
+            if not entry.name.endswith(('.part', '.tmp')):
+                continue
+            try:
+                if entry.stat().st_mtime < now - STALE_PARTIAL_SECONDS:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _evict(self, conn, now, keep):
+        self._sweep_partials(now)
+        expired = [row[0] for row in conn.execute("SELECT id FROM artifacts WHERE accessed_at <= ?", (now - self.ttl,))]
+        for artifact_id in expired:
+            conn.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
+            self._remove_file(artifact_id)
+        evicted = len(expired)
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+        if total <= self.max_bytes:
+            return evicted
+
+        for artifact_id, size in conn.execute(
+            "SELECT id, size FROM artifacts WHERE id != ? ORDER BY accessed_at", (keep,)
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
+            self._remove_file(artifact_id)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        finally:
+            conn.close()
+        with self._lock:
+            return {
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'artifacts': count,
+                'bytes': total
+            }
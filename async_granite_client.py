@@ -0,0 +1,320 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import httpx
+
+import metrics
+from granite_client import GraniteClient, log_upstream_error
+from rate_limiter import BATCH, INTERACTIVE, RateLimitExceeded, estimate_tokens
+from resilience import RETRYABLE_STATUS_CODES, CircuitOpenError, parse_retry_after
+
+
+class AsyncGraniteClient(GraniteClient):
+    """
+    asyncio variant of GraniteClient built on a pooled httpx.AsyncClient.
+
+    It reads the same environment configuration and shares GraniteClient's
+    payload building, retry policy, retry budget, circuit breaker and rate
+    limiter. get_access_token and generate_test_cases are coroutines and
+    generate_test_cases_stream is an async generator, with the same
+    semantics as their blocking counterparts.
+
+    The HTTP client is created on first use and is bound to that event loop,
+    so use one instance per loop (SyncGraniteClient owns a dedicated loop).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.max_connections = int(os.environ.get("GRANITE_ASYNC_MAX_CONNECTIONS", 100))
+        self.max_concurrency = int(os.environ.get("GRANITE_ASYNC_MAX_CONCURRENCY", 50))
+        self._client = None
+        self._async_token_lock = None
+
+    def _http(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections if self.keep_alive else 0
+                ),
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0])
+            )
+        return self._client
+
+    async def _trace(self, event_name, info):
+        # httpcore reports every freshly opened socket; everything else reused the pool
+        if event_name == "connection.connect_tcp.complete":
+            self.pool_stats.record_new_connection()
+
+    async def _send(self, method, url, stream=False, **kwargs):
+        request = self._http().build_request(method, url, extensions={"trace": self._trace}, **kwargs)
+        self.pool_stats.record_request()
+        return await self._http().send(request, stream=stream)
+
+    async def get_access_token(self):
+        """Return a valid IAM token; refreshes are single-flight per event loop."""
+        if self.background_refresh:
+            self.start_token_refresher()
+
+        if self.access_token and time.time() < self.token_expires_at:
+            return self.access_token
+
+        if self._async_token_lock is None:
+            self._async_token_lock = asyncio.Lock()
+        async with self._async_token_lock:
+            if self.access_token and time.time() < self.token_expires_at:
+                return self.access_token
+            return await self._refresh_access_token_async()
+
+    async def _refresh_access_token_async(self):
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        data = {
+            "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
+            "apikey": self.api_key
+        }
+
+        start = time.perf_counter()
+        try:
+            response = await self._send("POST", self.iam_token_url, headers=headers, data=data)
+            response.raise_for_status()
+
+            return self._store_token(response.json())
+        except Exception as e:
+            raise Exception(f"Failed to get access token: {str(e)}")
+        finally:
+            metrics.observe_since('iam_token', start)
+
+    async def _post_generation(self, url, payload, stream=False, priority=INTERACTIVE):
+        """Coroutine version of GraniteClient._post_generation (retries, budget, breaker, quota)."""
+        self._count('calls')
+        self.retry_budget.record_call()
+        quota_tokens = self._quota_tokens(payload)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            await self.rate_limiter.acquire_async(quota_tokens, priority)
+            self.circuit_breaker.before_call()
+            self._count('attempts')
+            retry_after = None
+            try:
+                headers = {
+                    "Authorization": f"Bearer {await self.get_access_token()}",
+                    "Content-Type": "application/json"
+                }
+                if stream:
+                    headers["Accept"] = "text/event-stream"
+                start = time.perf_counter()
+                try:
+                    response = await self._send("POST", url, stream=stream, headers=headers, json=payload)
+                except Exception:
+                    metrics.observe_since('watsonx_call', start)
+                    raise
+                if not stream or response.status_code in RETRYABLE_STATUS_CODES:
+                    # A streamed body is timed until it is closed, in generate_test_cases_stream
+                    metrics.observe_since('watsonx_call', start)
+            except httpx.TransportError as e:
+                error = e
+            except Exception:
+                self.circuit_breaker.release_trial()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.circuit_breaker.record_success()
+                    return response
+                # A streamed body has not been read; log the status only
+                log_upstream_error(
+                    f"watsonx attempt {attempt} failed", response.status_code, None if stream else response.text
+                )
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                error = httpx.HTTPStatusError(
+                    f"{response.status_code} Error: {response.reason_phrase} for url: {response.url}",
+                    request=response.request,
+                    response=response
+                )
+                await response.aclose()
+
+            self.circuit_breaker.record_failure()
+            delay = self._retry_delay(attempt, retry_after)
+            if delay is None:
+                raise error
+            await asyncio.sleep(delay)
+
+    async def generate_test_cases(self, prompt, priority=INTERACTIVE, max_new_tokens=None):
+        """Coroutine version of GraniteClient.generate_test_cases, including continuations."""
+        url = f"{self.base_url}/ml/v1/text/generation?version=2023-05-29"
+        max_new_tokens = max_new_tokens or self.default_max_new_tokens
+        budget = max_new_tokens
+        text = ""
+        generated_tokens = 0
+        continuations = 0
+
+        while budget:
+            continuation_prompt = self._continuation_prompt(prompt, text)
+            payload = self._build_payload(continuation_prompt, budget)
+            metrics.record_generation('blocking', len(continuation_prompt))
+
+            response = None
+            try:
+                response = await self._post_generation(url, payload, priority=priority)
+                response.raise_for_status()
+
+                result = response.json()["results"][0]
+            except (CircuitOpenError, RateLimitExceeded):
+                raise
+            except Exception as e:
+                if response is not None:
+                    log_upstream_error("Test generation failed", response.status_code, response.text)
+                raise Exception(f"Failed to generate test cases: {str(e)}")
+
+            chunk = result["generated_text"]
+            metrics.record_response(len(chunk))
+            text += chunk
+            generated_tokens += result.get("generated_token_count") or estimate_tokens(chunk)
+            budget = self._continuation_budget(
+                result.get("stop_reason"), text, max_new_tokens, generated_tokens, continuations
+            )
+            continuations += 1
+
+        return text
+
+    async def generate_test_cases_stream(self, prompt, priority=INTERACTIVE, max_new_tokens=None):
+        """Async generator yielding generated text chunks from the generation_stream endpoint, with continuations."""
+        url = f"{self.base_url}/ml/v1/text/generation_stream?version=2023-05-29"
+        max_new_tokens = max_new_tokens or self.default_max_new_tokens
+        budget = max_new_tokens
+        text = ""
+        generated_tokens = 0
+        continuations = 0
+
+        while budget:
+            continuation_prompt = self._continuation_prompt(prompt, text)
+            payload = self._build_payload(continuation_prompt, budget)
+            metrics.record_generation('stream', len(continuation_prompt))
+
+            received = ""
+            stop_reason = None
+            token_count = None
+            try:
+                response = await self._post_generation(url, payload, stream=True, priority=priority)
+                try:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line or not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if not data or data == "[DONE]":
+                            continue
+                        event = json.loads(data)
+                        for result in event.get("results", []):
+                            stop_reason = result.get("stop_reason", stop_reason)
+                            token_count = result.get("generated_token_count", token_count)
+                            chunk = result.get("generated_text", "")
+                            if chunk:
+                                received += chunk
+                                yield chunk
+                finally:
+                    await response.aclose()
+                    # Once closed, httpx's elapsed covers the call up to the end of the body
+                    metrics.observe('watsonx_call', response.elapsed.total_seconds())
+            except (CircuitOpenError, RateLimitExceeded):
+                raise
+            except Exception as e:
+                raise Exception(f"Failed to stream test cases: {str(e)}")
+            finally:
+                metrics.record_response(len(received))
+
+            text += received
+            generated_tokens += token_count or estimate_tokens(received)
+            budget = self._continuation_budget(stop_reason, text, max_new_tokens, generated_tokens, continuations)
+            continuations += 1
+
+    async def generate_many(self, prompts, priority=BATCH, concurrency=None):
+        """
+        Generate every prompt concurrently, at most `concurrency` (default
+        GRANITE_ASYNC_MAX_CONCURRENCY) at a time. Returns results in prompt
+        order; a failed prompt yields its exception instead of a string.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.max_concurrency)
+
+        async def generate(prompt):
+            async with semaphore:
+                return await self.generate_test_cases(prompt, priority)
+
+        return await asyncio.gather(*(generate(prompt) for prompt in prompts), return_exceptions=True)
+
+    async def aclose(self):
+        """Stop background work and close all pooled connections."""
+        self.stop_token_refresher()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self.session.close()
+
+
+class SyncGraniteClient:
+    """
+    Blocking facade over AsyncGraniteClient, so code written against
+    GraniteClient (like app.py) can use the asyncio client unchanged.
+
+    Coroutines run on a private event loop in a daemon thread, started lazily
+    (and again after a fork, since gunicorn workers do not inherit threads).
+    Attributes not defined here, such as model_id, generation_parameters or
+    resilience_stats, are served by the wrapped client.
+    """
+
+    def __init__(self):
+        self.client = AsyncGraniteClient()
+        self._loop = None
+        self._loop_pid = None
+        self._loop_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None or self._loop_pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._loop_pid = os.getpid()
+                # A client created on another loop (or in the parent process) cannot be reused
+                self.client._client = None
+                self.client._async_token_lock = None
+                threading.Thread(target=self._loop.run_forever, name="granite-async-loop", daemon=True).start()
+            return self._loop
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop()).result()
+
+    def get_access_token(self):
+        return self._run(self.client.get_access_token())
+
+    def generate_test_cases(self, prompt, priority=INTERACTIVE, max_new_tokens=None):
+        return self._run(self.client.generate_test_cases(prompt, priority, max_new_tokens))
+
+    def generate_many(self, prompts, priority=BATCH, concurrency=None):
+        return self._run(self.client.generate_many(prompts, priority, concurrency))
+
+    def generate_test_cases_stream(self, prompt, priority=INTERACTIVE, max_new_tokens=None):
+        stream = self.client.generate_test_cases_stream(prompt, priority, max_new_tokens)
+        try:
+            while True:
+                try:
+                    chunk = self._run(stream.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            self._run(stream.aclose())
+
+    def close(self):
+        if self._loop is not None and self._loop_pid == os.getpid():
+            self._run(self.client.aclose())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+        else:
+            self.client.stop_token_refresher()
+            self.client.session.close()
@@ -0,0 +1,265 @@
+"""
+Generate JUnit tests for every OpenAPI spec (.yaml, .yml, .json) under a
+directory, several specs at a time.
+
+Each spec's tests are written next to its relative path under the output
+directory (specs/billing/api.yaml -> out/billing/api_Tests.java; specs
+sharing a name but not an extension keep it: api_yaml_Tests.java). Progress is
+recorded in <output>/.batch_state.json after every spec, so specs whose
+content, model and generation settings are unchanged since their last run are
+skipped; rerunning an interrupted batch therefore resumes where it stopped.
+A JSON summary with per-spec timings is written at the end.
+
+Generations go through the same pipeline as the web app (see generation.py):
+its result cache, coalescer, retry policy and the batch lane of the rate
+limiter. Nothing of the web app itself is loaded.
+
+Usage: python batch_generate.py SPEC_DIR [--output generated_tests/batch] [--workers 4]
+                                [--sharded] [--force] [--summary FILE]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import generation
+from rate_limiter import BATCH
+
+STATE_FILENAME = '.batch_state.json'
+
+
+def find_specs(spec_dir, output_dir):
+    """Relative paths of the spec files under spec_dir, in a stable order."""
+    output_dir = os.path.abspath(output_dir)
+    specs = []
+    for root, dirs, files in os.walk(spec_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_dir)
+        for name in sorted(files):
+            if generation.allowed_file(name):
+                specs.append(os.path.relpath(os.path.join(root, name), spec_dir))
+    return specs
+
+
+def output_paths_for(output_dir, specs):
+    """
+    Java file holding the tests generated for each spec, mirroring its
+    relative path (billing/api.yaml -> billing/api_Tests.java). Specs that
+    differ only by extension keep it in the name (api_yaml_Tests.java and
+    api_json_Tests.java), so no spec overwrites another's tests.
+    """
+    stems = Counter(os.path.splitext(spec)[0] for spec in specs)
+    used = set()
+    paths = {}
+    for spec in specs:
+        base, extension = os.path.splitext(spec)
+        if stems[base] > 1:
+            base = f"{base}_{extension[1:]}"
+        name = f"{base}_Tests.java"
+        index = 2
+        # Compared case-insensitively, for case-insensitive file systems
+        while name.lower() in used:
+            name = f"{base}_{index}_Tests.java"
+            index += 1
+        used.add(name.lower())
+        paths[spec] = os.path.join(output_dir, name)
+    return paths
+
+
+def fingerprint(content, sharded):
+    """
+    Identity of a generation: spec bytes, model, generation parameters, the
+    settings that size max_new_tokens per spec and continue truncated
+    outputs, prompt budget, mode and how specs are sharded.
+    """
+    client = generation.granite_client
+    config = generation.config
+    material = json.dumps({
+        'spec': hashlib.sha256(content).hexdigest(),
+        'model': client.model_id,
+        'parameters': client.generation_parameters(),
+        'output_budget': {
+            'base': client.max_new_tokens_base,
+            'per_endpoint': client.max_new_tokens_per_endpoint,
+            'limit': client.max_new_tokens_limit,
+            'continuations': client.max_continuations,
+            'total': client.max_total_new_tokens
+        },
+        'prompt_token_budget': config['PROMPT_TOKEN_BUDGET'],
+        'sharded': sharded,
+        'sharding': {
+            'auto_threshold': config['SHARD_AUTO_THRESHOLD'],
+            'max_endpoints': config['SHARD_MAX_ENDPOINTS'],
+            'by': config['SHARD_BY']
+        }
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def write_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class BatchState:
+    """Fingerprint of the last successful generation of each spec, saved after every update."""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, STATE_FILENAME)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._specs = json.load(f).get('specs', {})
+        except (OSError, ValueError):
+            self._specs = {}
+
+    def is_current(self, spec, spec_fingerprint, output_path):
+        entry = self._specs.get(spec)
+        return (
+            bool(entry) and entry.get('fingerprint') == spec_fingerprint
+            and entry.get('output') == output_path and os.path.exists(output_path)
+        )
+
+    def record(self, spec, spec_fingerprint, output_path):
+        with self._lock:
+            self._specs[spec] = {
+                'fingerprint': spec_fingerprint,
+                'output': output_path,
+                'generated_at': time.time()
+            }
+            write_atomic(self.path, json.dumps({'specs': self._specs}, indent=2, sort_keys=True))
+
+
+def process_spec(spec_dir, output_path, spec, state, sharded, force):
+    """Generate the tests for one spec into output_path and return its summary entry."""
+    started = time.perf_counter()
+    entry = {'spec': spec, 'output': output_path, 'timings': {}}
+    timings = entry['timings']
+
+    try:
+        stage = time.perf_counter()
+        with open(os.path.join(spec_dir, spec), 'rb') as f:
+            content = f.read()
+        spec_fingerprint = fingerprint(content, sharded)
+        timings['read'] = time.perf_counter() - stage
+
+        if not force and state.is_current(spec, spec_fingerprint, output_path):
+            entry['status'] = 'skipped'
+            return entry
+
+        stage = time.perf_counter()
+        api_info = generation.parse_spec(content.decode('utf-8'), spec.rsplit('.', 1)[1].lower())
+        timings['parse'] = time.perf_counter() - stage
+        entry['api_title'] = api_info['title']
+        entry['endpoints_count'] = len(api_info['endpoints'])
+
+        stage = time.perf_counter()
+        generated_tests, _, prompt_report, _ = generation.generate_for_api(api_info, sharded=sharded, priority=BATCH)
+        timings['generate'] = time.perf_counter() - stage
+        if prompt_report:
+            entry['prompt'] = prompt_report
+
+        stage = time.perf_counter()
+        write_atomic(output_path, generated_tests)
+        state.record(spec, spec_fingerprint, output_path)
+        timings['write'] = time.perf_counter() - stage
+        entry['status'] = 'generated'
+    except Exception as e:
+        entry['status'] = 'failed'
+        entry['error'] = str(e)
+    finally:
+        timings['total'] = time.perf_counter() - started
+        entry['timings'] = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+    return entry
+
+
+def build_summary(specs, entries, started_at, wall_seconds, workers, interrupted):
+    done = {entry['spec'] for entry in entries}
+    entries = sorted(entries, key=lambda entry: entry['spec'])
+    entries += [{'spec': spec, 'status': 'pending'} for spec in specs if spec not in done]
+
+    totals = {'specs': len(specs)}
+    for status in ('generated', 'skipped', 'failed', 'pending'):
+        totals[status] = sum(1 for entry in entries if entry['status'] == status)
+    generate_times = [entry['timings']['generate'] for entry in entries if 'generate' in entry.get('timings', {})]
+
+    return {
+        'started_at': started_at,
+        'wall_seconds': round(wall_seconds, 3),
+        'workers': workers,
+        'interrupted': interrupted,
+        'totals': totals,
+        'generate_seconds': {
+            'total': round(sum(generate_times), 3),
+            'mean': round(sum(generate_times) / len(generate_times), 3) if generate_times else None,
+            'max': round(max(generate_times), 3) if generate_times else None
+        },
+        'specs': entries
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('spec_dir', help='Directory searched recursively for specs')
+    parser.add_argument('--output', default=os.path.join('generated_tests', 'batch'),
+                        help='Directory receiving the generated .java files (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=4, help='Specs generated concurrently (default: %(default)s)')
+    parser.add_argument('--sharded', action='store_true', help='Generate each spec shard by shard')
+    parser.add_argument('--force', action='store_true', help='Regenerate specs even when they are up to date')
+    parser.add_argument('--summary', help='Where to write the JSON summary (default: <output>/batch_summary.json)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.spec_dir):
+        parser.error(f"{args.spec_dir} is not a directory")
+    generation.setup()
+    os.makedirs(args.output, exist_ok=True)
+    summary_path = args.summary or os.path.join(args.output, 'batch_summary.json')
+
+    specs = find_specs(args.spec_dir, args.output)
+    output_paths = output_paths_for(args.output, specs)
+    state = BatchState(args.output)
+    print(f"Found {len(specs)} specs in {args.spec_dir}; generating with {args.workers} workers")
+
+    started_at = time.time()
+    started = time.perf_counter()
+    entries = []
+    interrupted = False
+    pool = ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix='batch-generate')
+    try:
+        futures = [
+            pool.submit(process_spec, args.spec_dir, output_paths[spec], spec, state, args.sharded, args.force)
+            for spec in specs
+        ]
+        for future in as_completed(futures):
+            entry = future.result()
+            entries.append(entry)
+            detail = entry.get('error') or f"{entry['timings']['total']:.1f}s"
+            print(f"[{len(entries)}/{len(specs)}] {entry['status']:<9} {entry['spec']} ({detail})")
+        pool.shutdown()
+    except KeyboardInterrupt:
+        interrupted = True
+        pool.shutdown(wait=False, cancel_futures=True)
+        print("Interrupted; rerun the same command to resume", file=sys.stderr)
+
+    summary = build_summary(specs, entries, started_at, time.perf_counter() - started, args.workers, interrupted)
+    write_atomic(summary_path, json.dumps(summary, indent=2))
+    totals = summary['totals']
+    print(f"Generated {totals['generated']}, skipped {totals['skipped']}, failed {totals['failed']}, "
+          f"pending {totals['pending']} in {summary['wall_seconds']:.1f}s; summary written to {summary_path}")
+
+    if interrupted:
+        return 130
+    return 1 if totals['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Load benchmark for the generation endpoints.
+
+Drives POST /generate (or /generate/stream) at a fixed concurrency with
+synthetic specs of several sizes and reports throughput and p50/p95/p99
+latency overall and per size.
+
+By default everything runs locally: a fake watsonx/IAM server
+(fake_watsonx.py) and the Flask app on an ephemeral port in this process.
+Pass --target to load an already running deployment (e.g. gunicorn), and
+--upstream if that deployment talks to a fake server you started yourself.
+Each request gets an API title unique to the run so it misses the result cache;
+--cached sends identical specs to measure the cached path.
+
+Usage: python bench_load.py [--concurrency 16] [--requests 200] [--sizes small,medium,large]
+                            [--latency 0.5] [--rate-limit-rate 0.0] [--error-rate 0.0]
+                            [--stream] [--cached] [--target URL] [--json FILE]
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_spec_parser import generate_spec
+from fake_watsonx import FakeWatsonxConfig, FakeWatsonxServer
+
+# (paths, schemas) of each synthetic spec size
+SPEC_SIZES = {
+    'small': (5, 3),
+    'medium': (50, 20),
+    'large': (500, 100)
+}
+
+
+def percentile(sorted_values, fraction):
+    """Linearly interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(samples, wall_seconds):
+    """Throughput and latency percentiles (ms) of (status, seconds) samples."""
+    latencies = sorted(seconds for status, seconds in samples if status == 200)
+    summary = {
+        'requests': len(samples),
+        'ok': len(latencies),
+        'statuses': dict(Counter(str(status) for status, _ in samples)),
+        'throughput_rps': round(len(latencies) / wall_seconds, 2) if wall_seconds else None
+    }
+    for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0)):
+        value = percentile(latencies, fraction)
+        summary[f'{name}_ms'] = round(value * 1000, 1) if value is not None else None
+    return summary
+
+
+def start_local_app(upstream_url):
+    """Import the app against the given upstream and serve it from a thread; returns its base URL."""
+    os.environ.update({
+        'IBM_API_KEY': os.environ.get('IBM_API_KEY', 'bench'),
+        'IBM_PROJECT_ID': os.environ.get('IBM_PROJECT_ID', 'bench'),
+        'GRANITE_MODEL': os.environ.get('GRANITE_MODEL', 'ibm/granite-bench'),
+        'IBM_WATSONX_URL': upstream_url,
+        'IBM_IAM_URL': f"{upstream_url}/identity/token"
+    })
+    from werkzeug.serving import make_server
+    import app as application
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, application.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def run_load(target, specs, total, concurrency, stream, cached):
+    """Send `total` uploads round-robin over the spec sizes; returns ([(size, status, seconds)], wall seconds)."""
+    endpoint = f"{target}/generate/stream" if stream else f"{target}/generate"
+    sizes = list(specs)
+    run_id = uuid.uuid4().hex[:8]
+    local = threading.local()
+
+    def one(index):
+        size = sizes[index % len(sizes)]
+        spec = specs[size]
+        if not cached:
+            spec = dict(spec, info=dict(spec['info'], title=f"{spec['info']['title']} {run_id} {index}"))
+        body = json.dumps(spec).encode('utf-8')
+
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.post(endpoint, files={'file': (f'{size}.json', body, 'application/json')})
+            status = response.status_code
+            if stream and status == 200 and 'event: done' not in response.text:
+                status = 'stream_error'
+        except requests.RequestException:
+            status = 'connection_error'
+        return size, status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    return results, time.perf_counter() - start
+
+
+def report(label, summary):
+    def ms(name):
+        value = summary[f'{name}_ms']
+        return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+    print(f"{label:<8} {summary['requests']:6d} {summary['ok']:6d} {summary['throughput_rps'] or 0:9.2f} "
+          f"{ms('p50')} {ms('p95')} {ms('p99')} {ms('max')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--sizes', default='small,medium,large', help=f"Comma separated subset of {', '.join(SPEC_SIZES)}")
+    parser.add_argument('--stream', action='store_true', help='Load /generate/stream instead of /generate')
+    parser.add_argument('--cached', action='store_true', help='Send identical specs so repeats hit the result cache')
+    parser.add_argument('--target', help='Base URL of a running app; default starts one in-process')
+    parser.add_argument('--upstream', help='Base URL of a running fake watsonx; default starts one in-process')
+    parser.add_argument('--latency', type=float, default=0.5, help='Fake watsonx seconds per generation')
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of fake generations answered with 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of fake generations answered with 503')
+    parser.add_argument('--json', help='Also write the results to this file (for CI)')
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SPEC_SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    fake = None
+    upstream = args.upstream
+    if not args.target and not upstream:
+        fake = FakeWatsonxServer(config=FakeWatsonxConfig(
+            latency=args.latency, jitter=args.jitter,
+            rate_limit_rate=args.rate_limit_rate, error_rate=args.error_rate
+        )).start()
+        upstream = fake.url
+    target = args.target or start_local_app(upstream)
+
+    specs = {size: generate_spec(*SPEC_SIZES[size]) for size in sizes}
+    print(f"Target {target}, upstream {upstream or 'as configured on target'}: "
+          f"{args.requests} requests at concurrency {args.concurrency}, sizes {', '.join(sizes)}\n")
+
+    results, wall_seconds = run_load(target, specs, args.requests, args.concurrency, args.stream, args.cached)
+
+    summary = {'overall': summarize([(status, seconds) for _, status, seconds in results], wall_seconds)}
+    for size in sizes:
+        summary[size] = summarize([(status, seconds) for s, status, seconds in results if s == size], wall_seconds)
+
+    print(f"{'size':<8} {'reqs':>6} {'ok':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for label in sizes + ['overall']:
+        report(label, summary[label])
+    print(f"\nStatuses: {summary['overall']['statuses']}, wall time {wall_seconds:.2f}s")
+    if fake:
+        summary['upstream'] = fake.snapshot()
+        print(f"Fake watsonx calls: {summary['upstream']}")
+        fake.stop()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(dict(summary, wall_seconds=round(wall_seconds, 3), concurrency=args.concurrency,
+                           stream=args.stream, cached=args.cached), f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Peak-memory benchmark for parsing a large JSON spec: SpecParser (whole
+document, raw operation copies) versus StreamingSpecParser (member by member,
+compact records).
+
+Each parser runs in a fresh child process that first reads the spec text.
+It reports the process's peak RSS, which includes the same text and
+interpreter in both runs, and the peak of Python allocations made while
+parsing, as traced by tracemalloc. Both parsers must render the same prompt.
+
+Usage: python bench_spec_memory.py [--paths 20000] [--schemas 2000] [--no-tracemalloc]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_spec_parser import generate_spec
+
+PARSERS = ('standard', 'streaming')
+
+
+def vendor_spec(num_paths, num_schemas):
+    """generate_spec with the bulk vendor specs carry: inline response schemas, examples and long descriptions."""
+    spec = generate_spec(num_paths, num_schemas)
+    for i, item in enumerate(spec['paths'].values()):
+        for operation in item.values():
+            operation['description'] = f'Operation {i}. ' + 'Lorem ipsum dolor sit amet. ' * 20
+            for parameter in operation.get('parameters', []):
+                parameter['description'] = 'Parameter description. ' * 5
+                parameter['example'] = 42
+            operation['responses']['500'] = {
+                'description': 'Server error',
+                'content': {'application/json': {
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'code': {'type': 'integer', 'description': 'Error code'},
+                            'message': {'type': 'string', 'description': 'Human readable message'},
+                            'details': {'type': 'array', 'items': {'type': 'object', 'properties': {
+                                'field': {'type': 'string'}, 'issue': {'type': 'string'}
+                            }}}
+                        }
+                    },
+                    'examples': {'default': {'value': {'code': 500, 'message': 'Internal error', 'details': []}}}
+                }}
+            }
+    return spec
+
+
+def max_rss_bytes():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def child(parser_name, path, trace):
+    """Parse the spec at path with one parser and print a JSON measurement."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    from prompt_builder import build_test_generation_prompt
+    from spec_parser import SpecParser
+    from streaming_spec_parser import StreamingSpecParser
+
+    if trace:
+        import tracemalloc
+        tracemalloc.start()
+    start = time.perf_counter()
+    if parser_name == 'streaming':
+        api_info = StreamingSpecParser.parse_openapi_spec(text)
+    else:
+        api_info = SpecParser.parse_openapi_spec(text, 'json')
+    seconds = time.perf_counter() - start
+    peak_rss = max_rss_bytes()
+    traced = tracemalloc.get_traced_memory()[1] if trace else None
+    if trace:
+        tracemalloc.stop()
+
+    prompt = build_test_generation_prompt(api_info, 6000).text
+    print(json.dumps({
+        'parser': parser_name,
+        'seconds': seconds,
+        'peak_rss_bytes': peak_rss,
+        'traced_peak_bytes': traced,
+        'endpoints': len(api_info['endpoints']),
+        'prompt_chars': len(prompt),
+        'prompt_hash': hash(prompt)
+    }))
+
+
+def measure(parser_name, path, trace):
+    env = dict(os.environ, PYTHONHASHSEED='0')
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', parser_name, path] + ([] if trace else ['--no-tracemalloc']),
+        check=True, capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def mb(value):
+    return f"{value / 1e6:8.1f} MB" if value is not None else '       n/a'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paths', type=int, default=20000)
+    parser.add_argument('--schemas', type=int, default=2000)
+    parser.add_argument('--no-tracemalloc', action='store_true', help='Skip allocation tracing (faster, RSS only)')
+    parser.add_argument('--child', nargs=2, metavar=('PARSER', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], not args.no_tracemalloc)
+        return
+
+    fd, path = tempfile.mkstemp(suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(vendor_spec(args.paths, args.schemas), f)
+        print(f"Spec: {args.paths} paths, {args.schemas} schemas, JSON {os.path.getsize(path) / 1e6:.1f} MB\n")
+
+        results = {name: measure(name, path, not args.no_tracemalloc) for name in PARSERS}
+    finally:
+        os.remove(path)
+
+    print(f"{'parser':<10} {'time':>9} {'peak RSS':>11} {'traced peak':>11}")
+    for name in PARSERS:
+        result = results[name]
+        print(f"{name:<10} {result['seconds']:8.2f}s {mb(result['peak_rss_bytes'])} {mb(result['traced_peak_bytes'])}")
+
+    standard, streaming = results['standard'], results['streaming']
+    print(f"\nPeak RSS reduced {standard['peak_rss_bytes'] / streaming['peak_rss_bytes']:.1f}x")
+    if streaming['traced_peak_bytes']:
+        print(f"Parsing allocations reduced {standard['traced_peak_bytes'] / streaming['traced_peak_bytes']:.1f}x")
+    same = standard['prompt_hash'] == streaming['prompt_hash'] and standard['endpoints'] == streaming['endpoints']
+    print(f"Same prompt: {'yes' if same else 'NO'}")
+    return 0 if same else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Micro-benchmark for spec loading: pure-Python yaml.safe_load / json.loads
+versus the C-accelerated loaders SpecParser uses when available.
+
+Usage: python bench_spec_parser.py [--paths 2000] [--schemas 500] [--repeat 3]
+"""
+import argparse
+import json
+import time
+
+import yaml
+
+from spec_parser import FAST_YAML_LOADER, SpecParser, orjson
+
+
+def generate_spec(num_paths=2000, num_schemas=500):
+    """Build a synthetic OpenAPI 3 document with CRUD operations and shared schemas."""
+    schemas = {}
+    for i in range(num_schemas):
+        properties = {
+            'id': {'type': 'integer', 'format': 'int64'},
+            'name': {'type': 'string', 'maxLength': 128, 'description': f'Name of resource {i}'},
+            'status': {'type': 'string', 'enum': ['active', 'inactive', 'pending']},
+            'tags': {'type': 'array', 'items': {'type': 'string'}}
+        }
+        if i:
+            properties['parent'] = {'$ref': f'#/components/schemas/Model{i - 1}'}
+        schemas[f'Model{i}'] = {'type': 'object', 'required': ['name'], 'properties': properties}
+
+    paths = {}
+    for i in range(num_paths):
+        model = f'#/components/schemas/Model{i % num_schemas}'
+        tag = f'group{i % 25}'
+        paths[f'/resources{i}/{{id}}'] = {
+            'get': {
+                'summary': f'Get resource {i}',
+                'description': 'Returns a single resource. ' * 5,
+                'tags': [tag],
+                'parameters': [
+                    {'name': 'id', 'in': 'path', 'required': True, 'schema': {'type': 'integer'}},
+                    {'name': 'expand', 'in': 'query', 'schema': {'type': 'boolean'}}
+                ],
+                'responses': {
+                    '200': {'description': 'OK', 'content': {'application/json': {'schema': {'$ref': model}}}},
+                    '404': {'description': 'Not found'}
+                }
+            },
+            'put': {
+                'summary': f'Replace resource {i}',
+                'tags': [tag],
+                'parameters': [{'name': 'id', 'in': 'path', 'required': True, 'schema': {'type': 'integer'}}],
+                'requestBody': {'required': True, 'content': {'application/json': {'schema': {'$ref': model}}}},
+                'responses': {'204': {'description': 'Updated'}, '400': {'description': 'Invalid'}}
+            }
+        }
+
+    return {
+        'openapi': '3.0.0',
+        'info': {'title': 'Benchmark API', 'version': '1.0.0', 'description': 'Generated for benchmarking'},
+        'servers': [{'url': 'https://api.example.com'}],
+        'paths': paths,
+        'components': {'schemas': schemas}
+    }
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def report(label, baseline, fast):
+    speedup = baseline / fast if fast else float('inf')
+    print(f"{label:<28} baseline {baseline * 1000:9.1f} ms   fast {fast * 1000:9.1f} ms   speedup {speedup:5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paths', type=int, default=2000)
+    parser.add_argument('--schemas', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    spec = generate_spec(args.paths, args.schemas)
+    dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+    yaml_text = yaml.dump(spec, Dumper=dumper, sort_keys=False)
+    json_text = json.dumps(spec)
+    print(f"Spec: {args.paths} paths, {args.schemas} schemas, "
+          f"YAML {len(yaml_text) / 1e6:.1f} MB, JSON {len(json_text) / 1e6:.1f} MB")
+    print(f"libyaml: {'yes' if FAST_YAML_LOADER else 'no'}, orjson: {'yes' if orjson else 'no'}\n")
+
+    baseline, expected = best_of(args.repeat, yaml.safe_load, yaml_text)
+    fast, loaded = best_of(args.repeat, SpecParser._load_document, yaml_text, 'yaml')
+    assert loaded == expected, "fast YAML loader produced a different document"
+    report('YAML load', baseline, fast)
+
+    baseline, expected = best_of(args.repeat, json.loads, json_text)
+    fast, loaded = best_of(args.repeat, SpecParser._load_document, json_text, 'json')
+    assert loaded == expected, "fast JSON loader produced a different document"
+    report('JSON load', baseline, fast)
+
+    parse_yaml, _ = best_of(args.repeat, SpecParser.parse_openapi_spec, yaml_text, 'yaml')
+    parse_json, _ = best_of(args.repeat, SpecParser.parse_openapi_spec, json_text, 'json')
+    print(f"\nparse_openapi_spec end to end: YAML {parse_yaml * 1000:.1f} ms, JSON {parse_json * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-worker locking is unavailable
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """
+    Deduplicates identical in-flight work.
+
+    run(key, fn) executes fn for the first caller of a key; callers that
+    arrive with the same key while it is running wait for it and share its
+    result (or exception) instead of repeating the call.
+
+    worker_lock(key) extends this across gunicorn workers on one host with an
+    flock on a file in `lock_dir`: a worker that waited on the lock should
+    re-check the shared result cache before doing the work itself.
+    """
+
+    # Lock files idle for longer than this are removed
+    LOCK_FILE_TTL = 3600
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir if fcntl else None
+        self._lock = threading.Lock()
+        self._last_prune = 0
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.coalesced_across_workers = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def run(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    @contextmanager
+    def worker_lock(self, key):
+        """Hold an exclusive per-key lock shared by all processes using lock_dir."""
+        if not self.lock_dir:
+            yield
+            return
+
+        self._prune_lock_files()
+        path = os.path.join(self.lock_dir, f"{key}.lock")
+        with open(path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                os.utime(path)
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _prune_lock_files(self):
+        """
+        Remove long-idle lock files. Files are not deleted right after use
+        because a process blocked on the old file could then hold a lock at
+        the same time as one that created a fresh file.
+        """
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        for entry in os.scandir(self.lock_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < now - self.LOCK_FILE_TTL:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def record_cross_worker_hit(self):
+        """Count a request answered by another worker's result."""
+        with self._lock:
+            self.coalesced_across_workers += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'coalesced_across_workers': self.coalesced_across_workers
+            }
@@ -0,0 +1,244 @@
+"""
+Local stand-in for IBM Cloud IAM and the watsonx.ai text generation API, for
+load testing and CI without credentials or quota.
+
+Implements POST /identity/token, POST /ml/v1/text/generation and
+POST /ml/v1/text/generation_stream (Server-Sent Events), plus GET / for
+readiness pings and GET /_stats for request counters. Responses are a JUnit
+class named after the class in the prompt with one test per endpoint, after
+a configurable latency; a configurable share of generation calls fails with
+429 (with Retry-After) or 503 instead. Output longer than max_new_tokens
+(about four characters per token) is cut off with stop_reason "max_tokens",
+and a prompt ending in such partial output is continued where it stopped.
+
+Usage: python fake_watsonx.py [--port 8090] [--latency 0.5] [--jitter 0.1]
+                              [--rate-limit-rate 0.0] [--error-rate 0.0]
+
+Then point the app at it:
+    IBM_WATSONX_URL=http://127.0.0.1:8090 IBM_IAM_URL=http://127.0.0.1:8090/identity/token
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeWatsonxConfig:
+    """Behaviour of the fake server; attributes may be changed while it runs."""
+
+    def __init__(self, latency=0.5, jitter=0.1, rate_limit_rate=0.0, error_rate=0.0,
+                 retry_after=1, stream_chunks=8, token_ttl=3600):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.stream_chunks = stream_chunks
+        self.token_ttl = token_ttl
+
+
+ENDPOINT_LINE = re.compile(r'^- (GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS) (\S+)', re.MULTILINE)
+
+
+def generated_test_class(prompt):
+    """A JUnit class named after the class the prompt asks for, with one test per listed endpoint."""
+    match = re.search(r'public class (\w+)', prompt or '')
+    class_name = match.group(1) if match else 'GeneratedApiTest'
+    tests = []
+    for index, (method, path) in enumerate(ENDPOINT_LINE.findall(prompt or '')):
+        tests.append(
+            "    @Test\n"
+            f"    void test{index}{method.title()}() {{\n"
+            f"        // {method} {path}\n"
+            "        assertEquals(200, 200);\n"
+            "    }\n"
+        )
+    return (
+        "```java\n"
+        "package com.example.api.test;\n\n"
+        "import org.junit.jupiter.api.Test;\n"
+        "import static org.junit.jupiter.api.Assertions.*;\n\n"
+        f"public class {class_name} {{\n"
+        + ("\n".join(tests) or "    @Test\n    void respondsWithOk() {\n        assertEquals(200, 200);\n    }\n")
+        + "}\n"
+        "```"
+    )
+
+
+def continue_output(prompt, text):
+    """The rest of `text` when the prompt already ends with a prefix of it (a continuation call)."""
+    for length in range(len(text) - 1, 0, -1):
+        if prompt.endswith(text[:length]):
+            return text[length:]
+    return text
+
+
+class FakeWatsonxHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def do_GET(self):
+        if self.path == '/_stats':
+            self._send_json(200, self.server.snapshot())
+        else:
+            self._send_json(200, {'service': 'fake-watsonx'})
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split('?', 1)[0]
+        if path == '/identity/token':
+            self.server.count('token')
+            self._send_json(200, {
+                'access_token': f'fake-{random.getrandbits(64):016x}',
+                'token_type': 'Bearer',
+                'expires_in': self.config.token_ttl
+            })
+        elif path in ('/ml/v1/text/generation', '/ml/v1/text/generation_stream'):
+            self._generation(body, stream=path.endswith('_stream'))
+        else:
+            self._send_json(404, {'errors': [{'message': f'Unknown path {path}'}]})
+
+    def _generation(self, body, stream):
+        config = self.config
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            self.server.count('rate_limited')
+            self._send_json(429, {'errors': [{'code': 'too_many_requests'}]},
+                            headers={'Retry-After': str(config.retry_after)})
+            return
+        if roll < config.rate_limit_rate + config.error_rate:
+            self.server.count('errors')
+            self._send_json(503, {'errors': [{'code': 'service_unavailable'}]})
+            return
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._send_json(400, {'errors': [{'message': 'Invalid JSON body'}]})
+            return
+        prompt = request.get('input', '')
+        max_new_tokens = request.get('parameters', {}).get('max_new_tokens', 1000)
+
+        self.server.count('stream' if stream else 'generation')
+        text = continue_output(prompt, generated_test_class(prompt))
+        stop_reason = 'eos_token'
+        if len(text) > max_new_tokens * 4:
+            text = text[:max_new_tokens * 4]
+            stop_reason = 'max_tokens'
+        delay = max(config.latency + random.uniform(-config.jitter, config.jitter), 0.0)
+        if not stream:
+            time.sleep(delay)
+            self._send_json(200, {'results': [{
+                'generated_text': text,
+                'generated_token_count': -(-len(text) // 4),
+                'input_token_count': len(prompt) // 4,
+                'stop_reason': stop_reason
+            }]})
+            return
+
+        chunks = max(config.stream_chunks, 1)
+        size = -(-len(text) // chunks)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for i in range(0, len(text), size):
+            time.sleep(delay / chunks)
+            last = i + size >= len(text)
+            event = {'results': [{
+                'generated_text': text[i:i + size],
+                'generated_token_count': -(-min(i + size, len(text)) // 4),
+                'stop_reason': stop_reason if last else 'not_finished'
+            }]}
+            self.wfile.write(f"id: {i // size + 1}\nevent: message\ndata: {json.dumps(event)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeWatsonxServer(ThreadingHTTPServer):
+    """Threaded fake watsonx/IAM server. Port 0 picks a free port; see `url`."""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        super().__init__((host, port), FakeWatsonxHandler)
+        self.config = config or FakeWatsonxConfig()
+        self._stats_lock = threading.Lock()
+        self._stats = {'token': 0, 'generation': 0, 'stream': 0, 'rate_limited': 0, 'errors': 0}
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def snapshot(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def start(self):
+        """Serve from a daemon thread and return self."""
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-watsonx', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.5, help='Mean seconds per generation (default: %(default)s)')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Uniform +/- seconds added to the latency')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of generations answered with 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of generations answered with 503')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--stream-chunks', type=int, default=8, help='Events per streamed generation')
+    args = parser.parse_args()
+
+    config = FakeWatsonxConfig(
+        latency=args.latency, jitter=args.jitter, rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate, retry_after=args.retry_after, stream_chunks=args.stream_chunks
+    )
+    server = FakeWatsonxServer(args.host, args.port, config)
+    print(f"Fake watsonx listening on {server.url} (IAM: {server.url}/identity/token)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
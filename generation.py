@@ -0,0 +1,348 @@
+"""
+The test generation pipeline shared by the web app (app.py) and the batch
+CLI (batch_generate.py): spec parsing and validation, prompt building, and
+generation through the result cache, request coalescer, sharding and
+incremental regeneration.
+
+Settings are read from the environment into `config`. The Granite client and
+the caches and stores behind it are only created by setup(), so importing
+this module has no side effects.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from dotenv import load_dotenv
+
+import metrics
+from coalescer import RequestCoalescer
+from granite_client import GraniteClient
+from incremental import IncrementalStore, diff_specs, endpoint_fingerprints, endpoint_key
+from prompt_builder import build_test_generation_prompt
+from rate_limiter import INTERACTIVE
+from result_cache import ResultCache
+from sharding import endpoint_name, merge_test_classes, shard_endpoints
+from spec_parser import SpecParser
+from spec_validation import SpecValidator, StructuralCheck
+from streaming_spec_parser import StreamingSpecParser
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+config = {
+    'RESULT_CACHE_ENABLED': os.environ.get('RESULT_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+    'RESULT_CACHE_PATH': os.environ.get('RESULT_CACHE_PATH', os.path.join('cache', 'results.sqlite3')),
+    'RESULT_CACHE_TTL': int(os.environ.get('RESULT_CACHE_TTL', 7 * 24 * 3600)),  # Seconds before a cached result expires
+    'RESULT_CACHE_MAX_ENTRIES': int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1000)),
+    'RESULT_CACHE_MAX_BYTES': int(os.environ.get('RESULT_CACHE_MAX_BYTES', 100 * 1024 * 1024)),
+    'COALESCE_ACROSS_WORKERS': os.environ.get('COALESCE_ACROSS_WORKERS', 'false').lower() in ('1', 'true', 'yes'),
+    'COALESCE_LOCK_FOLDER': os.path.join('cache', 'locks'),  # Lock files for cross-worker coalescing
+    'SHARD_BY': os.environ.get('SHARD_BY', 'tag'),  # 'tag' or 'path'
+    'SHARD_MAX_ENDPOINTS': int(os.environ.get('SHARD_MAX_ENDPOINTS', 10)),  # Endpoints per shard prompt
+    'SHARD_PARALLELISM': int(os.environ.get('SHARD_PARALLELISM', 4)),  # Shards generated at once
+    'INCREMENTAL_FOLDER': os.path.join('cache', 'incremental'),  # Per-key state for incremental regeneration
+    'INCREMENTAL_MAX_BYTES': int(os.environ.get('INCREMENTAL_MAX_BYTES', 1024 * 1024 * 1024)),  # Disk quota before the oldest state files are deleted
+    'INCREMENTAL_TTL': int(os.environ.get('INCREMENTAL_TTL', 30 * 24 * 3600)),  # Seconds incremental state is kept after its last generation
+    'SHARD_AUTO_THRESHOLD': int(os.environ.get('SHARD_AUTO_THRESHOLD', 0)),  # Shard specs with this many endpoints (0 = only on request)
+    'SPEC_STREAMING_MIN_BYTES': int(os.environ.get('SPEC_STREAMING_MIN_BYTES', 8 * 1024 * 1024)),  # JSON specs this large use the compact streaming parser (0 = never)
+    'SPEC_VALIDATION': os.environ.get('SPEC_VALIDATION', 'off').lower(),  # 'off', 'structural' or 'full' (adds openapi-spec-validator)
+    'SPEC_VALIDATION_TIME_BUDGET': float(os.environ.get('SPEC_VALIDATION_TIME_BUDGET', 2)),  # Seconds to wait for full validation before going ahead on the structural check
+    'SPEC_VALIDATION_FULL_MAX_BYTES': int(os.environ.get('SPEC_VALIDATION_FULL_MAX_BYTES', 5 * 1024 * 1024)),  # Larger specs get the structural check only
+    'SPEC_VALIDATION_MAX_IN_FLIGHT': int(os.environ.get('SPEC_VALIDATION_MAX_IN_FLIGHT', 1)),  # Full validations running or queued per worker; beyond it requests get the structural check
+    'SPEC_VALIDATION_CACHE_ENTRIES': int(os.environ.get('SPEC_VALIDATION_CACHE_ENTRIES', 1000)),  # Validation results kept per worker, by spec hash
+    'PROMPT_TOKEN_BUDGET': int(os.environ.get('PROMPT_TOKEN_BUDGET', 6000))  # Estimated prompt tokens before compaction (0 = unlimited)
+}
+
+# Allowed spec file extensions
+ALLOWED_EXTENSIONS = {'json', 'yaml', 'yml'}
+
+# Created by setup()
+granite_client = None
+result_cache = None
+coalescer = None
+incremental_store = None
+spec_validator = None
+_setup_lock = threading.Lock()
+
+def setup():
+    """
+    Create the Granite client (reads credentials from .env), the result
+    cache, coalescer, incremental store and spec validator from `config`.
+    Later calls keep the objects already created.
+    """
+    global granite_client, result_cache, coalescer, incremental_store, spec_validator
+    with _setup_lock:
+        if granite_client is not None:
+            return
+
+        # GRANITE_ASYNC_CLIENT=true switches to the asyncio/httpx client behind its blocking facade
+        if os.environ.get('GRANITE_ASYNC_CLIENT', 'false').lower() in ('1', 'true', 'yes'):
+            from async_granite_client import SyncGraniteClient
+            client = SyncGraniteClient()
+        else:
+            client = GraniteClient()
+
+        # Persistent cache of generated tests, shared by all workers on this host
+        if config['RESULT_CACHE_ENABLED']:
+            result_cache = ResultCache(
+                config['RESULT_CACHE_PATH'],
+                ttl=config['RESULT_CACHE_TTL'],
+                max_entries=config['RESULT_CACHE_MAX_ENTRIES'],
+                max_bytes=config['RESULT_CACHE_MAX_BYTES']
+            )
+
+        # Deduplicates identical in-flight generations (optionally across workers)
+        coalescer = RequestCoalescer(
+            lock_dir=config['COALESCE_LOCK_FOLDER'] if config['COALESCE_ACROSS_WORKERS'] else None
+        )
+
+        # Previous per-operation generations, for incremental regeneration
+        incremental_store = IncrementalStore(
+            config['INCREMENTAL_FOLDER'],
+            max_bytes=config['INCREMENTAL_MAX_BYTES'],
+            ttl=config['INCREMENTAL_TTL']
+        )
+
+        # Spec validation before prompt building, cached by spec hash
+        if config['SPEC_VALIDATION'] != 'off':
+            spec_validator = SpecValidator(
+                mode=config['SPEC_VALIDATION'],
+                time_budget=config['SPEC_VALIDATION_TIME_BUDGET'],
+                full_max_bytes=config['SPEC_VALIDATION_FULL_MAX_BYTES'],
+                cache_entries=config['SPEC_VALIDATION_CACHE_ENTRIES'],
+                max_in_flight=config['SPEC_VALIDATION_MAX_IN_FLIGHT']
+            )
+
+        granite_client = client
+
+def allowed_file(filename):
+    """Check if the uploaded file has an allowed extension."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def create_test_generation_prompt(api_info):
+    """
+    Create a prompt for the AI model using API information.
+    This prompt tells the model to generate JUnit 5 test cases for the given API.
+    It is compacted to fit PROMPT_TOKEN_BUDGET (see prompt_builder).
+    """
+    return build_prompt(api_info).text
+
+@metrics.timed('prompt_build')
+def build_prompt(api_info):
+    """Build the generation prompt within PROMPT_TOKEN_BUDGET and count any compaction."""
+    prompt = build_test_generation_prompt(api_info, config['PROMPT_TOKEN_BUDGET'] or None)
+    if prompt.compacted:
+        metrics.record_prompt_compaction(prompt.compactions)
+        logger.debug("Compacted prompt for %r: %s", api_info['title'], json.dumps(prompt.report()))
+    return prompt
+
+class EmptyGenerationError(Exception):
+    """Raised when the model returns no usable test code."""
+    pass
+
+def spec_hash_for(file_content):
+    return hashlib.sha256(file_content.encode('utf-8')).hexdigest()
+
+@metrics.timed('spec_parse')
+def parse_spec(file_content, file_type):
+    """
+    Parse an uploaded spec into api_info (see SpecParser.parse_openapi_spec).
+    JSON specs of at least SPEC_STREAMING_MIN_BYTES go through the
+    memory-bounded StreamingSpecParser, which keeps only what the prompt uses.
+
+    Unless SPEC_VALIDATION is 'off', the document is validated on the way
+    (see spec_validation), so an invalid spec raises SpecValidationError
+    before any prompt is built or model called. Streamed specs get the
+    structural check only.
+    """
+    threshold = config['SPEC_STREAMING_MIN_BYTES']
+    if file_type.lower() == 'json' and threshold and len(file_content) >= threshold:
+        if spec_validator is None:
+            return StreamingSpecParser.parse_openapi_spec(file_content)
+        spec_hash = spec_hash_for(file_content)
+        check = StructuralCheck() if spec_validator.cached(spec_hash) is None else None
+        start = time.perf_counter()
+        api_info = StreamingSpecParser.parse_openapi_spec(file_content, check)
+        if check is not None:
+            spec_validator.record(spec_hash, 'structural', check.errors, start)
+        return api_info
+
+    validate = None
+    if spec_validator is not None:
+        validate = partial(validate_spec, spec_hash_for(file_content), size=len(file_content))
+    return SpecParser.parse_openapi_spec(file_content, file_type, validate)
+
+def validate_spec(spec_hash, document, size):
+    start = time.perf_counter()
+    try:
+        return spec_validator.validate(spec_hash, document, size)
+    finally:
+        metrics.observe_since('spec_validate', start)
+
+def max_new_tokens_for(api_info):
+    """Per-call output budget for a spec, sized from its endpoint count."""
+    return granite_client.max_new_tokens_for(len(api_info['endpoints']))
+
+def result_cache_key(api_info, prompt):
+    """
+    Cache key for a generation, or None when the output is not cacheable.
+    Only greedy decoding is deterministic, so sampled outputs are never cached.
+    """
+    parameters = granite_client.generation_parameters(max_new_tokens_for(api_info))
+    if result_cache is None or parameters.get('decoding_method') != 'greedy':
+        return None
+    return ResultCache.make_key(api_info, prompt, granite_client.model_id, parameters)
+
+def generate_cached(api_info, prompt, priority=INTERACTIVE):
+    """
+    Generate tests for the prompt, reusing a cached result for identical input.
+    Concurrent requests for the same input are coalesced into a single
+    Granite call whose result they all share.
+    """
+    cache_key = result_cache_key(api_info, prompt)
+    if cache_key:
+        cached = result_cache.get(cache_key)
+        metrics.record_cache_lookup(cached is not None)
+        if cached is not None:
+            return cached
+
+    flight_key = cache_key or hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def generate():
+        with coalescer.worker_lock(flight_key):
+            # Another worker may have finished the same generation while we waited
+            if cache_key:
+                cached = result_cache.get(cache_key)
+                if cached is not None:
+                    coalescer.record_cross_worker_hit()
+                    return cached
+
+            generated_tests = granite_client.generate_test_cases(prompt, priority, max_new_tokens_for(api_info))
+            if cache_key and generated_tests and generated_tests.strip():
+                result_cache.put(cache_key, generated_tests)
+            return generated_tests
+
+    return coalescer.run(flight_key, generate)
+
+def generate_shards(api_info, shards, priority=INTERACTIVE):
+    """
+    Generate each (name, endpoints) shard from a prompt holding only its
+    endpoints and the schemas they reference, SHARD_PARALLELISM at a time.
+    Returns (name, generated text) pairs in shard order.
+    """
+    def generate_shard(shard):
+        name, endpoints = shard
+        shard_info = dict(
+            api_info,
+            title=f"{api_info['title']} {name}",
+            endpoints=endpoints,
+            schemas=SpecParser.referenced_schemas(endpoints, api_info.get('schemas', {}))
+        )
+        prompt = create_test_generation_prompt(shard_info)
+        return name, generate_cached(shard_info, prompt, priority)
+
+    if not shards:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(config['SHARD_PARALLELISM'], len(shards)))) as pool:
+        return list(pool.map(generate_shard, shards))
+
+def test_class_name_for(api_info):
+    """Name of the merged top-level test class for an API."""
+    return re.sub(r'\W', '', api_info['title']) + 'ApiTest'
+
+def generate_sharded(api_info, priority=INTERACTIVE):
+    """
+    Split the endpoints into shards (by tag or path prefix), generate them in
+    parallel and merge the shard classes into one test class.
+    """
+    shards = shard_endpoints(
+        api_info['endpoints'],
+        by=config['SHARD_BY'],
+        max_endpoints=config['SHARD_MAX_ENDPOINTS']
+    )
+    results = generate_shards(api_info, shards, priority)
+
+    if not any(text and text.strip() for _, text in results):
+        return ''
+    return merge_test_classes(test_class_name_for(api_info), results)
+
+def generate_incremental(api_info, incremental_key, priority=INTERACTIVE):
+    """
+    Regenerate only the operations that changed since the last generation
+    under the same incremental key and splice them into the stored
+    per-operation tests. Returns (merged test code, diff summary).
+    """
+    previous_state = incremental_store.load(incremental_key)
+    fingerprints = endpoint_fingerprints(api_info)
+    diff = diff_specs(previous_state, api_info, fingerprints)
+    stale = set(diff['added']) | set(diff['changed'])
+
+    previous_endpoints = previous_state.get('endpoints', {}) if previous_state else {}
+    stale_endpoints = [endpoint for endpoint in api_info['endpoints'] if endpoint_key(endpoint) in stale]
+    results = generate_shards(api_info, [(endpoint_name(endpoint), [endpoint]) for endpoint in stale_endpoints], priority)
+    generated = {endpoint_key(endpoint): text for endpoint, (_, text) in zip(stale_endpoints, results)}
+
+    endpoints_state = {}
+    sections = []
+    for endpoint in api_info['endpoints']:
+        key = endpoint_key(endpoint)
+        name = endpoint_name(endpoint)
+        code = generated[key] if key in stale else previous_endpoints[key]['code']
+        if code and code.strip():
+            endpoints_state[key] = {'fingerprint': fingerprints[key], 'name': name, 'code': code}
+            sections.append((name, code))
+
+    incremental_store.save(incremental_key, api_info, endpoints_state)
+    if not sections:
+        return '', diff
+    return merge_test_classes(test_class_name_for(api_info), sections), diff
+
+def generate_for_api(api_info, sharded=False, incremental_key=None, priority=INTERACTIVE):
+    """
+    Generate the test code for a parsed spec and return (code, diff, prompt
+    report, prompt), where diff is the incremental diff summary, the prompt
+    report describes how a single prompt was compacted to fit the token
+    budget and prompt is the text sent to the model (each None when not
+    applicable, e.g. prompt for sharded and incremental generations).
+
+    Large specs are generated shard by shard when `sharded` is set or the
+    endpoint count reaches SHARD_AUTO_THRESHOLD, or when even the fully
+    compacted single prompt exceeds PROMPT_TOKEN_BUDGET. With an `incremental_key`
+    only the operations that changed since the previous generation under
+    that key are sent to the model. Raises EmptyGenerationError when nothing usable came back.
+    """
+    threshold = config['SHARD_AUTO_THRESHOLD']
+    if threshold and len(api_info['endpoints']) >= threshold:
+        sharded = True
+
+    # Create the prompt and generate test cases
+    diff = None
+    prompt_report = None
+    prompt_text = None
+    if incremental_key and api_info['endpoints']:
+        generated_tests, diff = generate_incremental(api_info, incremental_key, priority)
+    elif sharded and api_info['endpoints']:
+        generated_tests = generate_sharded(api_info, priority)
+    else:
+        prompt = build_prompt(api_info)
+        if prompt.compacted:
+            prompt_report = prompt.report()
+        if prompt.fits or not api_info['endpoints']:
+            prompt_text = prompt.text
+            generated_tests = generate_cached(api_info, prompt_text, priority)
+        else:
+            # Still over PROMPT_TOKEN_BUDGET after every compaction: shard rather than leave endpoints out
+            prompt_report['sharded'] = True
+            generated_tests = generate_sharded(api_info, priority)
+
+    # If generation failed, report it
+    if not generated_tests or not generated_tests.strip():
+        raise EmptyGenerationError('Test generation failed or returned empty result.')
+    return generated_tests, diff, prompt_report, prompt_text
@@ -1,16 +1,115 @@
+import json
+import logging
 import os
+import threading
 import requests
 import time
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import metrics
+from rate_limiter import INTERACTIVE, RateLimitExceeded, TokenBucketLimiter, estimate_tokens
+from sharding import java_code_complete
+from resilience import (
+    RETRYABLE_STATUS_CODES, CircuitBreaker, CircuitOpenError, RetryBudget, RetryPolicy, parse_retry_after
+)
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# watsonx stop reasons meaning the output was cut off by max_new_tokens
+TRUNCATED_STOP_REASONS = {"max_tokens"}
+
+# Upstream error bodies are cut to this many characters in log messages
+LOGGED_BODY_CHARS = 500
+
+# IAM tokens are treated as expired this many seconds early
+TOKEN_EXPIRY_MARGIN = 300
+
+
+def log_upstream_error(message, status_code, body=None):
+    """Log a watsonx error response at warning level, with its body truncated."""
+    if body is None:
+        logger.warning("%s: HTTP %s", message, status_code)
+    else:
+        logger.warning("%s: HTTP %s: %s", message, status_code, body[:LOGGED_BODY_CHARS])
+
+
+def _env_flag(name, default):
+    """Read a boolean flag such as GRANITE_HTTP_KEEP_ALIVE from the environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class ConnectionPoolStats:
+    """Thread-safe counters showing how often requests reuse a pooled connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'pool_hits': max(self.requests - self.new_connections, 0)
+            }
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose urllib3 pools report every freshly opened socket to a
+    ConnectionPoolStats instance. Any request that does not open a new socket
+    was served from the keep-alive pool.
+    """
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+
+        def counting(pool_class):
+            class CountingPool(pool_class):
+                def _new_conn(self):
+                    stats.record_new_connection()
+                    return super()._new_conn()
+            return CountingPool
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': counting(HTTPConnectionPool),
+            'https': counting(HTTPSConnectionPool)
+        }
+
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        return super().send(request, **kwargs)
+
+
 class GraniteClient:
+    IAM_TOKEN_URL = "https://iam.cloud.ibm.com/identity/token"
+
     def __init__(self):
         self.api_key = os.environ.get("IBM_API_KEY")
         self.project_id = os.environ.get("IBM_PROJECT_ID")
         self.base_url = os.environ.get("IBM_WATSONX_URL")  # <-- Make sure this is set
         self.model_id = os.environ.get("GRANITE_MODEL")
+        self.iam_token_url = os.environ.get("IBM_IAM_URL", self.IAM_TOKEN_URL)
         self.access_token = None
         self.token_expires_at = 0
 
@@ -18,49 +117,246 @@ class GraniteClient:
             raise ValueError("Missing IBM_API_KEY, IBM_PROJECT_ID, or IBM_WATSONX_URL in environment variables.")
         if not self.model_id:
             raise ValueError("Missing GRANITE_MODEL in environment variables.")
+
+        # HTTP connection pool settings (shared by IAM and watsonx calls)
+        self.pool_connections = int(os.environ.get("GRANITE_HTTP_POOL_CONNECTIONS", 4))
+        self.pool_maxsize = int(os.environ.get("GRANITE_HTTP_POOL_MAXSIZE", 16))
+        self.pool_block = _env_flag("GRANITE_HTTP_POOL_BLOCK", False)
+        self.keep_alive = _env_flag("GRANITE_HTTP_KEEP_ALIVE", True)
+        self.timeout = (
+            float(os.environ.get("GRANITE_HTTP_CONNECT_TIMEOUT", 5)),
+            float(os.environ.get("GRANITE_HTTP_READ_TIMEOUT", 120))
+        )
+        self.pool_stats = ConnectionPoolStats()
+        self.session = self._create_session()
+
+        # IAM token refresh: single-flight lock plus optional background renewal
+        self._token_lock = threading.Lock()
+        self.background_refresh = _env_flag("GRANITE_TOKEN_BACKGROUND_REFRESH", False)
+        self.refresh_ahead = float(os.environ.get("GRANITE_TOKEN_REFRESH_AHEAD", 120))
+        self.refresh_retry_interval = float(os.environ.get("GRANITE_TOKEN_REFRESH_RETRY", 15))
+        self.refresh_min_interval = float(os.environ.get("GRANITE_TOKEN_REFRESH_MIN_INTERVAL", 10))
+        self._refresher = None
+        self._refresher_pid = None
+        self._refresher_stop = threading.Event()
+        self._refresher_start_lock = threading.Lock()
+
+        # Retries with jittered backoff, a retry budget and a circuit breaker for watsonx calls
+        self.retry_policy = RetryPolicy(
+            max_attempts=int(os.environ.get("GRANITE_RETRY_MAX_ATTEMPTS", 3)),
+            base_delay=float(os.environ.get("GRANITE_RETRY_BASE_DELAY", 0.5)),
+            max_delay=float(os.environ.get("GRANITE_RETRY_MAX_DELAY", 30))
+        )
+        self.retry_budget = RetryBudget(
+            ratio=float(os.environ.get("GRANITE_RETRY_BUDGET_RATIO", 0.2)),
+            min_retries=int(os.environ.get("GRANITE_RETRY_BUDGET_MIN", 10))
+        )
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=int(os.environ.get("GRANITE_BREAKER_FAILURE_THRESHOLD", 5)),
+            reset_timeout=float(os.environ.get("GRANITE_BREAKER_RESET_TIMEOUT", 30)),
+            listener=metrics.record_breaker_event
+        )
+        # Client-side quota governor (requests/second and tokens/minute); 0 disables a limit
+        self.rate_limiter = TokenBucketLimiter(
+            requests_per_second=float(os.environ.get("GRANITE_RATE_LIMIT_RPS", 0)),
+            tokens_per_minute=float(os.environ.get("GRANITE_RATE_LIMIT_TPM", 0)),
+            batch_reserve=float(os.environ.get("GRANITE_RATE_LIMIT_BATCH_RESERVE", 0.25)),
+            max_wait=float(os.environ.get("GRANITE_RATE_LIMIT_MAX_WAIT", 60)),
+            state_path=os.environ.get("GRANITE_RATE_LIMIT_STATE") or None
+        )
+        # Output budget: sized per spec, with continuation calls for truncated classes
+        self.default_max_new_tokens = int(os.environ.get("GRANITE_MAX_NEW_TOKENS", 1000))
+        self.max_new_tokens_base = int(os.environ.get("GRANITE_MAX_NEW_TOKENS_BASE", 800))
+        self.max_new_tokens_per_endpoint = int(os.environ.get("GRANITE_MAX_NEW_TOKENS_PER_ENDPOINT", 350))
+        self.max_new_tokens_limit = int(os.environ.get("GRANITE_MAX_NEW_TOKENS_LIMIT", 4096))
+        self.max_continuations = int(os.environ.get("GRANITE_MAX_CONTINUATIONS", 3))
+        self.max_total_new_tokens = int(os.environ.get("GRANITE_MAX_TOTAL_NEW_TOKENS", 12000))
+
+        self._call_stats_lock = threading.Lock()
+        self._call_stats = {
+            'calls': 0, 'attempts': 0, 'retries': 0, 'retries_exhausted': 0, 'budget_denied': 0,
+            'continuations': 0, 'truncated': 0
+        }
+
+    def _create_session(self):
+        """
+        Build the pooled session used for every outbound call. requests.Session
+        and the underlying urllib3 pools are safe to share between the threads
+        of a Flask/gunicorn worker since no per-request state is kept on them.
+        """
+        session = requests.Session()
+        adapter = PooledHTTPAdapter(
+            self.pool_stats,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def connection_stats(self):
+        """Return pool hit / new connection counters for the shared session."""
+        return self.pool_stats.snapshot()
+
+    def resilience_stats(self):
+        """Return retry, retry budget and circuit breaker counters for watsonx calls."""
+        with self._call_stats_lock:
+            stats = dict(self._call_stats)
+        stats['retry_budget_balance'] = self.retry_budget.balance
+        stats['circuit_breaker'] = self.circuit_breaker.stats()
+        stats['rate_limiter'] = self.rate_limiter.stats()
+        return stats
+
+    def _count(self, name):
+        with self._call_stats_lock:
+            self._call_stats[name] += 1
+        metrics.record_upstream_event(name)
+
+    def close(self):
+        """Stop background work and close all pooled connections."""
+        self.stop_token_refresher()
+        self.session.close()
     
     def get_access_token(self):
+        """
+        Return a valid IAM token. Refreshes are single-flight: when the token
+        has expired, one caller fetches a new one while concurrent callers wait
+        on the lock and then reuse its result.
+        """
+        if self.background_refresh:
+            self.start_token_refresher()
+
         if self.access_token and time.time() < self.token_expires_at:
             return self.access_token
-        
-        url = "https://iam.cloud.ibm.com/identity/token"
+
+        with self._token_lock:
+            if self.access_token and time.time() < self.token_expires_at:
+                return self.access_token
+            return self._refresh_access_token()
+
+    def _refresh_access_token(self):
+        """Fetch a new IAM token. Callers must hold self._token_lock."""
+        url = self.iam_token_url
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
         data = {
             "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
             "apikey": self.api_key
         }
         
+        start = time.perf_counter()
         try:
-            response = requests.post(url, headers=headers, data=data)
+            response = self.session.post(url, headers=headers, data=data, timeout=self.timeout)
             response.raise_for_status()
             
-            token_data = response.json()
-            self.access_token = token_data["access_token"]
-            self.token_expires_at = time.time() + token_data.get("expires_in", 3600) - 300
-            
-            return self.access_token
+            return self._store_token(response.json())
         except Exception as e:
             raise Exception(f"Failed to get access token: {str(e)}")
-    
-    def generate_test_cases(self, prompt):
-        url = f"{self.base_url}/ml/v1/text/generation?version=2023-05-29"
-        
-        headers = {
+        finally:
+            metrics.observe_since('iam_token', start)
+
+    def _store_token(self, token_data):
+        """Cache an IAM token response and return the token."""
+        self.access_token = token_data["access_token"]
+        # Tokens shorter-lived than twice the margin keep half their lifetime
+        expires_in = token_data.get("expires_in", 3600)
+        self.token_expires_at = time.time() + expires_in - min(TOKEN_EXPIRY_MARGIN, expires_in / 2)
+        return self.access_token
+
+    def start_token_refresher(self):
+        """
+        Start the background thread that renews the token
+        GRANITE_TOKEN_REFRESH_AHEAD seconds before it would expire, so request
+        threads never wait on IAM in steady state. The thread is started
+        lazily (and again after a fork) because gunicorn workers do not
+        inherit threads from the master process.
+        """
+        if self._refresher and self._refresher.is_alive() and self._refresher_pid == os.getpid():
+            return
+        with self._refresher_start_lock:
+            if self._refresher and self._refresher.is_alive() and self._refresher_pid == os.getpid():
+                return
+            self._refresher_stop.clear()
+            self._refresher_pid = os.getpid()
+            self._refresher = threading.Thread(
+                target=self._token_refresh_loop,
+                name="granite-token-refresher",
+                daemon=True
+            )
+            self._refresher.start()
+
+    def stop_token_refresher(self):
+        """Stop the background token refresher, if running."""
+        self._refresher_stop.set()
+        if self._refresher and self._refresher.is_alive():
+            self._refresher.join(timeout=5)
+        self._refresher = None
+
+    def _token_refresh_loop(self):
+        while not self._refresher_stop.is_set():
+            wait = self.token_expires_at - self.refresh_ahead - time.time()
+            if self.access_token:
+                # Tokens that live shorter than refresh_ahead would otherwise be renewed nonstop
+                wait = max(wait, self.refresh_min_interval)
+            if wait > 0 and self._refresher_stop.wait(wait):
+                break
+            try:
+                with self._token_lock:
+                    if self.token_expires_at - self.refresh_ahead <= time.time():
+                        self._refresh_access_token()
+            except Exception:
+                logger.warning("Background token refresh failed", exc_info=True)
+                if self._refresher_stop.wait(self.refresh_retry_interval):
+                    break
+
+    def token_status(self):
+        """Whether a cached IAM token is valid, without contacting IAM."""
+        remaining = self.token_expires_at - time.time() if self.access_token else 0
+        return {'valid': remaining > 0, 'expires_in': max(int(remaining), 0)}
+
+    def ping(self, timeout=5):
+        """
+        Check that the watsonx endpoint answers at all, without spending a
+        generation. Any HTTP response counts as reachable; returns the status
+        code and latency, or raises on connection errors and timeouts.
+        """
+        start = time.time()
+        response = self.session.get(self.base_url, timeout=(self.timeout[0], timeout))
+        return {'status_code': response.status_code, 'latency_ms': round((time.time() - start) * 1000, 1)}
+
+    def _headers(self):
+        return {
             "Authorization": f"Bearer {self.get_access_token()}",
             "Content-Type": "application/json"
         }
-        
-        payload = {
+
+    def max_new_tokens_for(self, endpoint_count):
+        """
+        Output budget of one generation call for a spec with `endpoint_count`
+        endpoints: a base for the class skeleton plus a share per endpoint,
+        capped at GRANITE_MAX_NEW_TOKENS_LIMIT.
+        """
+        budget = self.max_new_tokens_base + self.max_new_tokens_per_endpoint * endpoint_count
+        return max(1, min(budget, self.max_new_tokens_limit))
+
+    def generation_parameters(self, max_new_tokens=None):
+        """Decoding parameters sent with every generation request."""
+        return {
+            "decoding_method": "greedy",
+            "max_new_tokens": max_new_tokens or self.default_max_new_tokens,
+            "min_new_tokens": 1,
+            "stop_sequences": ["<end of code>"],
+            "repetition_penalty": 1
+        }
+
+    def _build_payload(self, prompt, max_new_tokens=None):
+        return {
             "model_id": self.model_id,
             "project_id": self.project_id,
             "input": prompt,
-            "parameters": {
-                "decoding_method": "greedy",
-                "max_new_tokens": 1000,
-                "min_new_tokens": 1,
-                "stop_sequences": ["<end of code>"],
-                "repetition_penalty": 1
-            },
+            "parameters": self.generation_parameters(max_new_tokens),
             "moderations": {
                 "hap": {
                     "input": {
@@ -80,13 +376,205 @@ class GraniteClient:
                 }
             }
         }
-        
-        try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result["results"][0]["generated_text"]
-        except Exception as e:
-            print(response.status_code, response.text)
-            raise Exception(f"Failed to generate test cases: {str(e)}")
+
+    def _post_generation(self, url, payload, stream=False, priority=INTERACTIVE):
+        """
+        POST a generation request to watsonx, retrying 429/5xx responses,
+        connection errors and timeouts with jittered exponential backoff
+        (honoring Retry-After) while the retry budget allows. Fails fast with
+        CircuitOpenError while the circuit breaker is open. Every attempt
+        first waits for quota from the rate limiter (RateLimitExceeded if it
+        does not free up in time) and only then asks the breaker. Returns the response; non-retryable HTTP
+        errors are left to the caller.
+        """
+        self._count('calls')
+        self.retry_budget.record_call()
+        quota_tokens = self._quota_tokens(payload)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            # Wait for quota first, so a half-open trial slot is never held while waiting locally
+            self.rate_limiter.acquire(quota_tokens, priority)
+            self.circuit_breaker.before_call()
+            self._count('attempts')
+            retry_after = None
+            try:
+                headers = self._headers()
+                if stream:
+                    headers["Accept"] = "text/event-stream"
+                start = time.perf_counter()
+                try:
+                    response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout, stream=stream)
+                except Exception:
+                    metrics.observe_since('watsonx_call', start)
+                    raise
+                if not stream or response.status_code in RETRYABLE_STATUS_CODES:
+                    # A streamed body is timed until it is closed, in generate_test_cases_stream
+                    metrics.observe_since('watsonx_call', start)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except Exception:
+                # Not an upstream failure (e.g. IAM token); don't hold the breaker's trial slot
+                self.circuit_breaker.release_trial()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.circuit_breaker.record_success()
+                    return response
+                log_upstream_error(f"watsonx attempt {attempt} failed", response.status_code, response.text)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                error = requests.HTTPError(
+                    f"{response.status_code} Error: {response.reason} for url: {response.url}",
+                    response=response
+                )
+                response.close()
+
+            self.circuit_breaker.record_failure()
+            delay = self._retry_delay(attempt, retry_after)
+            if delay is None:
+                raise error
+            time.sleep(delay)
+
+    def _retry_delay(self, attempt, retry_after=None):
+        """Seconds to wait before retrying a failed attempt, or None when it must not be retried."""
+        if attempt >= self.retry_policy.max_attempts:
+            self._count('retries_exhausted')
+            return None
+        delay = self.retry_policy.delay(attempt, retry_after)
+        if delay is None:
+            return None
+        if not self.retry_budget.try_spend():
+            self._count('budget_denied')
+            return None
+        self._count('retries')
+        return delay
+
+    @staticmethod
+    def _quota_tokens(payload):
+        """Tokens a generation request counts against the tokens-per-minute quota."""
+        return estimate_tokens(payload["input"]) + payload["parameters"].get("max_new_tokens", 0)
+
+    def _continuation_budget(self, stop_reason, text, max_new_tokens, generated_tokens, continuations):
+        """
+        max_new_tokens for the next continuation call, or None when the output
+        is finished: the model stopped by itself, the class is already
+        complete, or GRANITE_MAX_CONTINUATIONS / GRANITE_MAX_TOTAL_NEW_TOKENS
+        is reached.
+        """
+        if stop_reason not in TRUNCATED_STOP_REASONS or java_code_complete(text):
+            return None
+        remaining = self.max_total_new_tokens - generated_tokens
+        if continuations >= self.max_continuations or remaining <= 0:
+            self._count('truncated')
+            return None
+        self._count('continuations')
+        return min(max_new_tokens, remaining)
+
+    @staticmethod
+    def _continuation_prompt(prompt, text):
+        """Prompt for a continuation call: the original prompt followed by the output so far."""
+        return prompt + text if text else prompt
+
+    def generate_test_cases(self, prompt, priority=INTERACTIVE, max_new_tokens=None):
+        """
+        Generate text for the prompt with up to `max_new_tokens` tokens per
+        call. When the output is cut off by that limit before the Java class
+        is complete, continuation calls pick up where it stopped (see
+        _continuation_budget) and the pieces are returned joined.
+        """
+        url = f"{self.base_url}/ml/v1/text/generation?version=2023-05-29"
+        max_new_tokens = max_new_tokens or self.default_max_new_tokens
+        budget = max_new_tokens
+        text = ""
+        generated_tokens = 0
+        continuations = 0
+
+        while budget:
+            continuation_prompt = self._continuation_prompt(prompt, text)
+            payload = self._build_payload(continuation_prompt, budget)
+            metrics.record_generation('blocking', len(continuation_prompt))
+
+            response = None
+            try:
+                response = self._post_generation(url, payload, priority=priority)
+                response.raise_for_status()
+
+                result = response.json()["results"][0]
+            except (CircuitOpenError, RateLimitExceeded):
+                raise
+            except Exception as e:
+                if response is not None:
+                    log_upstream_error("Test generation failed", response.status_code, response.text)
+                raise Exception(f"Failed to generate test cases: {str(e)}")
+
+            chunk = result["generated_text"]
+            metrics.record_response(len(chunk))
+            text += chunk
+            generated_tokens += result.get("generated_token_count") or estimate_tokens(chunk)
+            budget = self._continuation_budget(
+                result.get("stop_reason"), text, max_new_tokens, generated_tokens, continuations
+            )
+            continuations += 1
+
+        return text
+
+    def generate_test_cases_stream(self, prompt, priority=INTERACTIVE, max_new_tokens=None):
+        """
+        Stream generated text from the watsonx generation_stream endpoint.
+        Yields text chunks as soon as they arrive instead of waiting for the
+        whole completion, continuing a truncated class with further streamed
+        calls like generate_test_cases. Only opening each stream is retried;
+        once chunks have been yielded a failure is raised to the caller.
+        """
+        url = f"{self.base_url}/ml/v1/text/generation_stream?version=2023-05-29"
+        max_new_tokens = max_new_tokens or self.default_max_new_tokens
+        budget = max_new_tokens
+        text = ""
+        generated_tokens = 0
+        continuations = 0
+
+        while budget:
+            continuation_prompt = self._continuation_prompt(prompt, text)
+            payload = self._build_payload(continuation_prompt, budget)
+            metrics.record_generation('stream', len(continuation_prompt))
+
+            received = ""
+            stop_reason = None
+            token_count = None
+            response = None
+            try:
+                response = self._post_generation(url, payload, stream=True, priority=priority)
+                opened = time.perf_counter()
+                with response:
+                    response.raise_for_status()
+                    # SSE is UTF-8; requests would otherwise assume ISO-8859-1 for text/*
+                    response.encoding = "utf-8"
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line or not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if not data or data == "[DONE]":
+                            continue
+                        event = json.loads(data)
+                        for result in event.get("results", []):
+                            stop_reason = result.get("stop_reason", stop_reason)
+                            token_count = result.get("generated_token_count", token_count)
+                            chunk = result.get("generated_text", "")
+                            if chunk:
+                                received += chunk
+                                yield chunk
+            except (CircuitOpenError, RateLimitExceeded):
+                raise
+            except Exception as e:
+                raise Exception(f"Failed to stream test cases: {str(e)}")
+            finally:
+                if response is not None:
+                    # elapsed runs from sending to the headers; add the time spent reading the body
+                    metrics.observe('watsonx_call', response.elapsed.total_seconds() + time.perf_counter() - opened)
+                metrics.record_response(len(received))
+
+            text += received
+            generated_tokens += token_count or estimate_tokens(received)
+            budget = self._continuation_budget(stop_reason, text, max_new_tokens, generated_tokens, continuations)
+            continuations += 1
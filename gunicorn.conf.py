@@ -0,0 +1,20 @@
+# Loaded automatically by `gunicorn app:app` from the project directory.
+import os
+import shutil
+
+# Workers record metrics in this directory so /metrics can aggregate them (see metrics.py).
+# It must be set before the app is imported, which is why it lives here.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join('cache', 'prometheus'))
+
+
+def on_starting(server):
+    """Start every server run with empty metric files."""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop live gauges of workers that exited."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
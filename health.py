@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class CachedCheck:
+    """
+    Runs a health check at most once every `ttl` seconds and serves the last
+    result in between, so frequent probes cost nothing upstream. Callers that
+    arrive while the check is running wait for it and share its result.
+
+    The check returns a dict with an 'ok' key; an exception counts as a
+    failed check.
+    """
+
+    def __init__(self, check, ttl):
+        self.check = check
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked_at = 0.0
+        self.runs = 0
+
+    def _fresh(self):
+        return self._result is not None and time.time() - self._checked_at < self.ttl
+
+    def get(self):
+        """Return (result, age in seconds), running the check first if the cached result is stale."""
+        if not self._fresh():
+            with self._lock:
+                if not self._fresh():
+                    try:
+                        result = self.check()
+                    except Exception as e:
+                        result = {'ok': False, 'error': str(e)}
+                    self._result = result
+                    self._checked_at = time.time()
+                    self.runs += 1
+        return self._result, round(time.time() - self._checked_at, 1)
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict
+
+from spec_parser import SpecParser
+
+
+def endpoint_key(endpoint: Dict) -> str:
+    """Stable identity of an operation, e.g. 'GET /pets/{petId}'."""
+    return f"{endpoint['method']} {endpoint['path']}"
+
+
+def _digest(value: Any) -> str:
+    material = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def endpoint_fingerprints(api_info: Dict) -> Dict[str, str]:
+    """
+    Hash each operation together with the schemas it references, so that a
+    change to a shared schema marks every operation using it as changed.
+    """
+    schemas = api_info.get('schemas', {})
+    fingerprints = {}
+    for endpoint in api_info['endpoints']:
+        referenced = SpecParser.referenced_schemas([endpoint], schemas)
+        fingerprints[endpoint_key(endpoint)] = _digest({'endpoint': endpoint, 'schemas': referenced})
+    return fingerprints
+
+
+def diff_specs(previous_state: Dict, api_info: Dict, fingerprints: Dict[str, str]) -> Dict[str, list]:
+    """
+    Structural diff between the stored state of a previous generation and a
+    newly parsed spec. Operations whose stored test code is missing count as
+    changed so they are generated again.
+    """
+    old_endpoints = previous_state.get('endpoints', {}) if previous_state else {}
+    old_schemas = previous_state.get('api_info', {}).get('schemas', {}) if previous_state else {}
+    new_schemas = api_info.get('schemas', {})
+
+    diff = {'added': [], 'removed': [], 'changed': [], 'unchanged': []}
+    for key, fingerprint in fingerprints.items():
+        old = old_endpoints.get(key)
+        if old is None:
+            diff['added'].append(key)
+        elif old.get('fingerprint') != fingerprint or not old.get('code'):
+            diff['changed'].append(key)
+        else:
+            diff['unchanged'].append(key)
+    diff['removed'] = [key for key in old_endpoints if key not in fingerprints]
+
+    diff['schemas_added'] = [name for name in new_schemas if name not in old_schemas]
+    diff['schemas_removed'] = [name for name in old_schemas if name not in new_schemas]
+    diff['schemas_changed'] = [
+        name for name in new_schemas
+        if name in old_schemas and _digest(new_schemas[name]) != _digest(old_schemas[name])
+    ]
+    return diff
+
+
+INCREMENTAL_KEY = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+
+
+class IncrementalStore:
+    """
+    Keeps, per incremental key, the last parsed api_info and the generated
+    test code of each operation, as one JSON file per key in `folder`. The
+    key is chosen by the client (or issued on its first incremental
+    generation), so unrelated specs that share a title never splice each
+    other's tests. Files are removed `ttl` seconds after their last update,
+    and the oldest ones once the folder exceeds `max_bytes`.
+    """
+
+    def __init__(self, folder, max_bytes=1024 * 1024 * 1024, ttl=30 * 24 * 3600):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_prune = 0
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def new_key():
+        return uuid.uuid4().hex
+
+    def _path(self, key):
+        if not isinstance(key, str) or not INCREMENTAL_KEY.match(key):
+            raise ValueError(f"Invalid incremental key {key!r}")
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, f"{name}.json")
+
+    def load(self, key):
+        """Return the stored state for a key, or None."""
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) < time.time() - self.ttl:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key, api_info, endpoints):
+        """
+        Store the state of a generation. `endpoints` maps endpoint_key() to
+        {'fingerprint', 'name', 'code'}.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'api_info': api_info, 'endpoints': endpoints}, f)
+            os.replace(tmp_path, path)
+        self._prune()
+
+    def _prune(self):
+        """Remove expired state files and the oldest ones beyond max_bytes (at most once a minute)."""
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < 60:
+                return
+            self._last_prune = now
+
+        files = []
+        for entry in os.scandir(self.folder):
+            try:
+                if entry.is_file() and entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                pass
+
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in sorted(files):
+            if mtime >= now - self.ttl and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no free worker or queue slot."""
+    pass
+
+
+class Job:
+    """State of one background generation job."""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.details = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == 'succeeded':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+            data['details'] = self.details
+        return data
+
+
+class JobQueue:
+    """
+    Bounded thread pool for long-running generation jobs.
+
+    At most `max_workers` jobs run at once and at most `max_pending` more may
+    wait for a worker; submit() raises QueueFullError beyond that so the caller
+    can apply backpressure. Finished jobs are kept for `result_ttl` seconds.
+
+    When `state_dir` is given, each job's state is also written there as JSON
+    so that any gunicorn worker can answer a status request, not only the one
+    that accepted the job.
+    """
+
+    def __init__(self, max_workers=4, max_pending=16, result_ttl=3600, state_dir=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.state_dir = state_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='generation-job')
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return its Job, or raise QueueFullError."""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(
+                f"Job queue is full ({self.max_workers} running, {self.max_pending} waiting)"
+            )
+        self._prune()
+
+        job = Job(uuid.uuid4().hex)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._persist(job)
+
+        try:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise
+        return job
+
+    def get(self, job_id):
+        """Return the job's state as a dict, or None if it is unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not self._expired(job.finished_at):
+                return job.to_dict()
+        return self._load(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            job.status = 'running'
+            job.started_at = time.time()
+            self._persist(job)
+            job.result = fn(*args, **kwargs)
+            job.status = 'succeeded'
+        except Exception as e:
+            job.error = str(e)
+            job.details = traceback.format_exc()
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            self._slots.release()
+            self._persist(job)
+
+    def _job_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _persist(self, job):
+        if not self.state_dir:
+            return
+        path = self._job_path(job.id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job.to_dict(), f)
+            os.replace(tmp_path, path)
+        except Exception:
+            logger.warning("Failed to persist state of job %s", job.id, exc_info=True)
+
+    def _load(self, job_id):
+        if not self.state_dir or not job_id.isalnum():
+            return None
+        path = self._job_path(job_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(data.get('finished_at')):
+            # Left by an earlier process; _prune only runs on submit
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return data
+
+    def _expired(self, finished_at):
+        return bool(finished_at) and finished_at < time.time() - self.result_ttl
+
+    def _prune(self):
+        """
+        Drop jobs that finished more than result_ttl ago, in memory and on
+        disk, plus stale temporary files (at most once a minute).
+        """
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        cutoff = now - self.result_ttl
+
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+        if self.state_dir:
+            for entry in os.scandir(self.state_dir):
+                try:
+                    # A file is rewritten when its job finishes, so a newer one cannot have expired
+                    if not entry.is_file() or entry.stat().st_mtime >= cutoff:
+                        continue
+                    if entry.name.endswith('.json') and not self._finished_before(entry.path, cutoff):
+                        # Queued or running for longer than result_ttl; other workers still answer for it
+                        continue
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _finished_before(path, cutoff):
+        """True when the persisted job at path finished before cutoff."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            return False
+        finished_at = data.get('finished_at')
+        return data.get('status') in ('succeeded', 'failed') and bool(finished_at) and finished_at < cutoff
@@ -0,0 +1,118 @@
+"""
+Prometheus metrics for the generation pipeline.
+
+Metrics are module-level prometheus_client objects with their label children
+bound once at import, so recording is a lock-protected float update with no
+per-request allocation. When PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py
+does this), every worker writes its values to memory-mapped files in that
+directory and render() aggregates all workers.
+"""
+import os
+import time
+from functools import wraps
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+STAGES = ('upload_read', 'spec_parse', 'spec_validate', 'prompt_build', 'iam_token', 'watsonx_call', 'file_write')
+
+# From sub-millisecond parsing up to multi-minute generations
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    'granite_stage_duration_seconds', 'Time spent in each stage of a generation request',
+    ['stage'], buckets=STAGE_BUCKETS
+)
+PROMPT_CHARS = Counter('granite_prompt_chars', 'Characters of prompt text sent to watsonx')
+RESPONSE_CHARS = Counter('granite_response_chars', 'Characters of generated text received from watsonx')
+GENERATIONS = Counter('granite_generations', 'Generation requests sent to watsonx', ['mode'])
+ERRORS = Counter('granite_errors', 'Failed requests by exception type', ['type'])
+PROMPT_COMPACTIONS = Counter('granite_prompt_compactions', 'Prompts compacted to fit the token budget, by step', ['step'])
+CACHE_LOOKUPS = Counter('granite_result_cache_lookups', 'Result cache lookups', ['result'])
+UPSTREAM_EVENTS = Counter(
+    'granite_upstream_events', 'watsonx generation calls, attempts, retries, retry budget denials, continuations and truncations', ['event']
+)
+BREAKER_EVENTS = Counter('granite_circuit_breaker_events', 'Circuit breaker openings and calls it rejected', ['event'])
+JOBS = Gauge('granite_jobs', 'Background generation jobs by state', ['state'], multiprocess_mode='livesum')
+
+_stage_children = {stage: STAGE_SECONDS.labels(stage) for stage in STAGES}
+_generation_children = {mode: GENERATIONS.labels(mode) for mode in ('blocking', 'stream')}
+_cache_children = {result: CACHE_LOOKUPS.labels(result) for result in ('hit', 'miss')}
+_job_children = {state: JOBS.labels(state) for state in ('queued', 'running')}
+_upstream_children = {
+    event: UPSTREAM_EVENTS.labels(event)
+    for event in ('calls', 'attempts', 'retries', 'retries_exhausted', 'budget_denied', 'continuations', 'truncated')
+}
+_breaker_children = {event: BREAKER_EVENTS.labels(event) for event in ('opened', 'rejected')}
+
+
+def observe_since(stage, start):
+    """Record the time elapsed since `start` (a time.perf_counter() value) for a stage."""
+    _stage_children[stage].observe(time.perf_counter() - start)
+
+
+def observe(stage, seconds):
+    """Record a duration measured elsewhere for a stage."""
+    _stage_children[stage].observe(seconds)
+
+
+def timed(stage):
+    """Decorator recording every call of the function as the given stage."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe_since(stage, start)
+        return wrapper
+    return decorator
+
+
+def record_generation(mode, prompt_chars):
+    _generation_children[mode].inc()
+    PROMPT_CHARS.inc(prompt_chars)
+
+
+def record_response(chars):
+    RESPONSE_CHARS.inc(chars)
+
+
+def record_error(error):
+    ERRORS.labels(type(error).__name__).inc()
+
+
+def record_prompt_compaction(steps):
+    for step in steps:
+        PROMPT_COMPACTIONS.labels(step).inc()
+
+
+def record_cache_lookup(hit):
+    _cache_children['hit' if hit else 'miss'].inc()
+
+
+def record_upstream_event(event):
+    """Count a watsonx call event (see GraniteClient.resilience_stats for the names)."""
+    _upstream_children[event].inc()
+
+
+def record_breaker_event(event):
+    """Count the circuit breaker opening ('opened') or failing a call fast ('rejected')."""
+    _breaker_children[event].inc()
+
+
+def job_state(state):
+    """Gauge child for background jobs in `state` ('queued' or 'running')."""
+    return _job_children[state]
+
+
+def render():
+    """Return (body, content type) of the metrics exposition for all workers."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
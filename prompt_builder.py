@@ -0,0 +1,238 @@
+"""
+Builds the JUnit test generation prompt for a parsed spec within a token budget.
+
+The prompt is rendered at full detail first. While its estimated size exceeds
+the budget, compaction steps are applied in order, each one trading detail
+for space:
+
+    descriptions          drop the API description and endpoint summaries
+    shared_parameters     define parameters used by several endpoints once
+    schema_types          list schema properties without their types
+    unreferenced_schemas  drop schemas no endpoint references
+    schema_names          list schemas by name only
+
+Endpoints are never dropped: a spec whose prompt still exceeds the budget
+after every step is reported as not fitting (PromptBuild.fits), and the caller
+generates it shard by shard instead. Every step renders in time linear in the
+size of the spec, and there is a fixed number of steps, so building stays
+linear overall.
+"""
+from collections import Counter
+from typing import Dict
+
+from rate_limiter import estimate_tokens
+from spec_parser import SpecParser
+
+COMPACTION_STEPS = ('descriptions', 'shared_parameters', 'schema_types', 'unreferenced_schemas', 'schema_names')
+
+REQUIREMENTS = """Requirements:
+1. Generate complete JUnit 5 test classes with proper annotations
+2. Include positive test cases for valid inputs
+3. Include negative test cases for invalid data and error conditions
+4. Add boundary value testing for numeric fields
+5. Test edge cases (empty strings, null values, special characters)
+6. Generate realistic test data matching API schemas
+7. Use proper assertions for status codes, headers, and response body
+8. Use RestTemplate or TestRestTemplate for API calls
+9. Include setup and teardown methods
+10. Follow Spring Boot testing best practices"""
+
+
+def schema_type(schema):
+    """Short type label for a schema, naming referenced schemas instead of expanding them."""
+    if not isinstance(schema, dict):
+        return 'unknown'
+    ref = schema.get('$ref')
+    if isinstance(ref, str):
+        return ref.rsplit('/', 1)[-1]
+    if schema.get('type') == 'array':
+        return f"array<{schema_type(schema.get('items', {}))}>"
+    return schema.get('type', 'unknown')
+
+
+def request_body_type(request_body):
+    """Type label of the first media type schema in a request body, or None."""
+    for media in (request_body or {}).get('content', {}).values():
+        if isinstance(media, dict) and 'schema' in media:
+            return schema_type(media['schema'])
+    return None
+
+
+def parameter_definition(parameter):
+    """One-line definition of a parameter, e.g. 'petId (path, integer, required)'."""
+    details = [parameter.get('in', 'query'), schema_type(parameter.get('schema', {}))]
+    if parameter.get('required'):
+        details.append('required')
+    return f"{parameter.get('name', '')} ({', '.join(details)})"
+
+
+class PromptBuild:
+    """A rendered prompt together with what was compacted to fit the budget."""
+
+    def __init__(self, text, budget):
+        self.text = text
+        self.budget = budget
+        self.estimated_tokens = estimate_tokens(text)
+        self.compactions = []
+        self.dropped = {}
+
+    @property
+    def compacted(self):
+        return bool(self.compactions)
+
+    @property
+    def fits(self):
+        """Whether the prompt is within its budget (always, without one)."""
+        return not self.budget or self.estimated_tokens <= self.budget
+
+    def report(self):
+        return {
+            'estimated_tokens': self.estimated_tokens,
+            'budget': self.budget,
+            'fits': self.fits,
+            'compactions': list(self.compactions),
+            'dropped': dict(self.dropped)
+        }
+
+
+class PromptBuilder:
+    """Renders the test generation prompt for one api_info at a given compaction level."""
+
+    def __init__(self, api_info):
+        self.api_info = api_info
+        self.endpoints = api_info['endpoints']
+        self.schemas = api_info.get('schemas', {})
+        # Parameters with an identical definition on two or more endpoints
+        counts = Counter(
+            parameter_definition(parameter)
+            for endpoint in self.endpoints
+            for parameter in {parameter_definition(p): p for p in endpoint.get('parameters', [])}.values()
+        )
+        self.shared_parameters = [definition for definition, count in counts.items() if count > 1]
+
+    def _header(self, descriptions):
+        info = self.api_info
+        lines = [
+            "You are an expert QA engineer specializing in API testing. "
+            "Generate comprehensive JUnit 5 test cases for this REST API.",
+            "",
+            "API Information:",
+            f"- Title: {info['title']}",
+            f"- Version: {info['version']}"
+        ]
+        if descriptions:
+            lines.append(f"- Description: {info['description']}")
+        lines.append(f"- Base URL: {info['base_url']}")
+        return "\n".join(lines) + "\n"
+
+    def _endpoint_block(self, endpoint, descriptions, shared):
+        parts = [f"\n- {endpoint['method']} {endpoint['path']}"]
+        if descriptions:
+            parts.append(f"\n  Summary: {endpoint.get('summary', 'N/A')}")
+        params = []
+        for parameter in endpoint.get('parameters', []):
+            definition = parameter_definition(parameter)
+            params.append(parameter.get('name', '') if definition in shared else definition)
+        parts.append(f"\n  Parameters: {', '.join(params) if params else 'None'}")
+        body_type = request_body_type(endpoint.get('request_body'))
+        if body_type:
+            parts.append(f"\n  Request Body: {body_type}")
+        responses = ", ".join(endpoint.get('responses', {}).keys())
+        parts.append(f"\n  Responses: {responses if responses else 'N/A'}")
+        return "".join(parts)
+
+    def _shared_parameters_section(self, shared):
+        if not shared:
+            return ""
+        return "\n\nCommon Parameters (referenced by name above):\n" + "\n".join(f"- {d}" for d in shared)
+
+    def _schemas_section(self, schemas, with_types, names_only):
+        if not schemas:
+            return "No schemas defined"
+        if names_only:
+            return ", ".join(schemas) + "\n"
+        lines = []
+        for name, schema in schemas.items():
+            properties = schema.get('properties', {}) if isinstance(schema, dict) else {}
+            if with_types:
+                prop_list = ", ".join(f"{k}: {schema_type(v)}" for k, v in properties.items())
+            else:
+                prop_list = ", ".join(properties)
+            lines.append(f"- {name}: {prop_list}\n")
+        return "".join(lines)
+
+    def _footer(self):
+        class_name = self.api_info['title'].replace(' ', '')
+        return f"""
+
+{REQUIREMENTS}
+
+Generate complete, runnable Java test classes:
+
+package com.example.api.test;
+
+import org.junit.jupiter.api.Test;
+import org.junit.jupiter.api.BeforeEach;
+import org.springframework.boot.test.context.SpringBootTest;
+import org.springframework.test.web.reactive.server.WebTestClient;
+import static org.junit.jupiter.api.Assertions.*;
+
+@SpringBootTest(webEnvironment = SpringBootTest.WebEnvironment.RANDOM_PORT)
+public class {class_name}ApiTest {{
+
+text
+
+Generate the complete test implementation now:"""
+
+    def render(self, applied):
+        """Render with the given compaction steps applied."""
+        descriptions = 'descriptions' not in applied
+        shared = set(self.shared_parameters) if 'shared_parameters' in applied else set()
+        schemas = self.schemas
+        if 'unreferenced_schemas' in applied:
+            schemas = SpecParser.referenced_schemas(self.endpoints, self.schemas)
+
+        blocks = [self._endpoint_block(endpoint, descriptions, shared) for endpoint in self.endpoints]
+        fixed = [
+            self._header(descriptions),
+            "\nEndpoints:",
+            self._shared_parameters_section(sorted(shared)),
+            "\n\nData Models:\n",
+            self._schemas_section(schemas, 'schema_types' not in applied, 'schema_names' in applied),
+            self._footer()
+        ]
+
+        return "".join(fixed[:2] + blocks + fixed[2:])
+
+    def build(self, max_tokens=None):
+        """Return a PromptBuild within max_tokens (estimated), compacting only as far as needed."""
+        applied = []
+        text = self.render(applied)
+        if max_tokens:
+            for step in COMPACTION_STEPS:
+                if estimate_tokens(text) <= max_tokens:
+                    break
+                applied.append(step)
+                text = self.render(applied)
+
+        result = PromptBuild(text, max_tokens)
+        result.compactions = applied
+        if 'descriptions' in applied:
+            result.dropped['descriptions'] = (
+                sum(1 for e in self.endpoints if e.get('summary')) + (1 if self.api_info.get('description') else 0)
+            )
+        if 'shared_parameters' in applied:
+            result.dropped['repeated_parameter_definitions'] = len(self.shared_parameters)
+        if 'schema_types' in applied:
+            result.dropped['schema_property_types'] = True
+        if 'unreferenced_schemas' in applied:
+            referenced = SpecParser.referenced_schemas(self.endpoints, self.schemas)
+            result.dropped['schemas'] = [name for name in self.schemas if name not in referenced]
+        if 'schema_names' in applied:
+            result.dropped['schema_properties'] = True
+        return result
+
+
+def build_test_generation_prompt(api_info: Dict, max_tokens: int = None) -> PromptBuild:
+    """Build the JUnit test generation prompt for api_info, compacted to fit max_tokens if given."""
+    return PromptBuilder(api_info).build(max_tokens)
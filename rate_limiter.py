@@ -0,0 +1,217 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+
+class RateLimitExceeded(Exception):
+    """Raised when quota does not free up within the limiter's max wait."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(text):
+    """Rough token count for quota accounting (about four characters per token)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+class _MemoryBuckets:
+    """Bucket levels held in this process only."""
+
+    # update() only takes an in-process lock, so it may run on the event loop
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._levels = {}
+
+    def update(self, fn):
+        with self._lock:
+            self._levels = fn(self._levels)
+            return self._levels
+
+
+class _SQLiteBuckets:
+    """Bucket levels in a SQLite file, so every gunicorn worker on the host draws from the same quota."""
+
+    # update() may wait up to the connection timeout for other processes' write locks
+    blocking = True
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def update(self, fn):
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front so read-modify-write is atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            levels = {name: (level, updated_at) for name, level, updated_at in conn.execute(
+                "SELECT name, level, updated_at FROM buckets"
+            )}
+            levels = fn(levels)
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                [(name, level, updated_at) for name, (level, updated_at) in levels.items()]
+            )
+            conn.execute("COMMIT")
+            return levels
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class TokenBucketLimiter:
+    """
+    Client-side quota governor with two token buckets: one for requests per
+    second and one for model tokens per minute (estimated prompt tokens plus
+    max_new_tokens). A limit of 0 disables that bucket.
+
+    Batch callers may only draw a bucket down to `batch_reserve` of its
+    capacity; the reserved share is kept for interactive requests so UI users
+    are not starved by CI jobs.
+
+    acquire() blocks until the request fits, or raises RateLimitExceeded after
+    `max_wait` seconds. With `state_path` the bucket levels live in SQLite and
+    are shared by all processes using the same file.
+    """
+
+    def __init__(self, requests_per_second=0, tokens_per_minute=0, batch_reserve=0.25, max_wait=60, state_path=None):
+        self.capacities = {}
+        self.rates = {}
+        if requests_per_second > 0:
+            self.capacities['requests'] = max(float(requests_per_second), 1.0)
+            self.rates['requests'] = float(requests_per_second)
+        if tokens_per_minute > 0:
+            self.capacities['tokens'] = float(tokens_per_minute)
+            self.rates['tokens'] = tokens_per_minute / 60.0
+        self.batch_reserve = batch_reserve
+        self.max_wait = max_wait
+        self._buckets = _SQLiteBuckets(state_path) if state_path else _MemoryBuckets()
+        self._stats_lock = threading.Lock()
+        self._stats = {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'rejected': 0}
+
+    @property
+    def enabled(self):
+        return bool(self.capacities)
+
+    def _floor(self, name, cost, priority):
+        """Level a batch request must leave in a bucket, never so high that it could not fit at all."""
+        if priority != BATCH:
+            return 0.0
+        capacity = self.capacities[name]
+        return min(capacity * self.batch_reserve, capacity - cost)
+
+    def _try_take(self, costs, priority):
+        """Take costs from every bucket atomically; return 0 on success or the seconds to wait."""
+        result = {'wait': 0.0}
+
+        def take(levels):
+            now = time.time()
+            current = {}
+            for name, capacity in self.capacities.items():
+                level, updated_at = levels.get(name, (capacity, now))
+                current[name] = min(capacity, level + max(now - updated_at, 0) * self.rates[name])
+
+            wait = 0.0
+            for name in self.capacities:
+                needed = costs[name] + self._floor(name, costs[name], priority) - current[name]
+                if needed > 0:
+                    wait = max(wait, needed / self.rates[name])
+
+            if wait == 0.0:
+                for name in current:
+                    current[name] -= costs[name]
+            result['wait'] = wait
+            return {name: (level, now) for name, level in current.items()}
+
+        self._buckets.update(take)
+        return result['wait']
+
+    def _costs(self, tokens):
+        # A single request larger than the whole bucket could never fit; cap it at a full bucket
+        return {name: min(cost, self.capacities.get(name, cost))
+                for name, cost in (('requests', 1.0), ('tokens', float(tokens)))}
+
+    def _record(self, start, waited):
+        with self._stats_lock:
+            self._stats['acquired'] += 1
+            if waited:
+                self._stats['waited'] += 1
+                self._stats['wait_seconds'] += time.time() - start
+
+    def _reject(self, wait, priority):
+        with self._stats_lock:
+            self._stats['rejected'] += 1
+        return RateLimitExceeded(
+            f"watsonx quota exhausted; {priority} request would wait {wait:.1f}s", retry_after=wait
+        )
+
+    def acquire(self, tokens, priority=INTERACTIVE):
+        """Block until one request costing `tokens` model tokens fits within the quota."""
+        if not self.enabled:
+            return
+        costs = self._costs(tokens)
+        start = time.time()
+        deadline = start + self.max_wait
+        waited = False
+        while True:
+            wait = self._try_take(costs, priority)
+            if wait == 0.0:
+                break
+            if time.time() + wait > deadline:
+                raise self._reject(wait, priority)
+            waited = True
+            time.sleep(min(wait, 1.0))
+        self._record(start, waited)
+
+    async def acquire_async(self, tokens, priority=INTERACTIVE):
+        """
+        Coroutine version of acquire() that waits without blocking the event
+        loop; with shared SQLite state, bucket updates run in a worker thread.
+        """
+        if not self.enabled:
+            return
+        costs = self._costs(tokens)
+        start = time.time()
+        deadline = start + self.max_wait
+        waited = False
+        while True:
+            if self._buckets.blocking:
+                # Keep SQLite lock waits off the event loop
+                wait = await asyncio.to_thread(self._try_take, costs, priority)
+            else:
+                wait = self._try_take(costs, priority)
+            if wait == 0.0:
+                break
+            if time.time() + wait > deadline:
+                raise self._reject(wait, priority)
+            waited = True
+            await asyncio.sleep(min(wait, 1.0))
+        self._record(start, waited)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        stats['enabled'] = self.enabled
+        return stats
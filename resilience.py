@@ -0,0 +1,170 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Upstream responses worth retrying: rate limited or temporarily unavailable
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is known to be failing."""
+    pass
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, capped at max_delay."""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Delay before retrying after the given (1-based) failed attempt.
+        A Retry-After hint from the server takes precedence; None means the
+        hint exceeds max_delay and the call should not be retried.
+        """
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent traffic so that an upstream outage
+    does not turn into a retry storm. Every call deposits `ratio` tokens,
+    every retry withdraws one; `min_retries` tokens are always available.
+    """
+
+    def __init__(self, ratio=0.2, min_retries=10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self._lock = threading.Lock()
+        self._balance = float(min_retries)
+
+    def record_call(self):
+        with self._lock:
+            self._balance = min(self._balance + self.ratio, self.min_retries + self.ratio * 100)
+
+    def try_spend(self):
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+    @property
+    def balance(self):
+        with self._lock:
+            return round(self._balance, 2)
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast with CircuitOpenError for `reset_timeout` seconds. Then a single
+    trial call is let through: success closes the circuit, failure opens it
+    again.
+
+    `listener`, if given, is called with 'opened' or 'rejected' as those
+    happen. It runs under the breaker's lock, so it must be quick and must not
+    call back into the breaker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, listener=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.listener = listener
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opens = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may be made now."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.time() - self._opened_at >= self.reset_timeout:
+                    self._state = self.HALF_OPEN
+                    self._trial_in_flight = False
+                else:
+                    self._reject()
+                    raise CircuitOpenError("watsonx circuit breaker is open; failing fast")
+            if self._state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    self._reject()
+                    raise CircuitOpenError("watsonx circuit breaker is half-open; trial call in progress")
+                self._trial_in_flight = True
+
+    def _reject(self):
+        self.rejected += 1
+        self._notify('rejected')
+
+    def _notify(self, event):
+        if self.listener is not None:
+            self.listener(event)
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """
+        Give back the half-open trial slot of a call that never reached the
+        upstream (e.g. IAM token failures), without counting
+        it as a success or a failure.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opens += 1
+                    self._notify('opened')
+                self._state = self.OPEN
+                self._opened_at = time.time()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'opens': self.opens,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResultCache:
+    """
+    Persistent, content-addressed cache of generated test code.
+
+    Entries live in a SQLite file so they survive restarts and are shared by
+    every gunicorn worker on the host. Keys are SHA-256 digests of the
+    normalized API info, the rendered prompt, the model id and the decoding
+    parameters (see make_key), so any change to one of them is a miss.
+    Entries expire after `ttl` seconds; when the cache grows past
+    `max_entries` or `max_bytes` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=1000, max_bytes=100 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+
+    @staticmethod
+    def make_key(api_info, prompt, model_id, parameters):
+        """Hash everything that determines the model output into a cache key."""
+        material = json.dumps({
+            'api_info': api_info,
+            'prompt': prompt,
+            'model_id': model_id,
+            'parameters': parameters
+        }, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _connect(self):
+        # One short-lived connection per operation keeps this safe across threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key):
+        """Return the cached text for key, or None on a miss."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT value FROM results WHERE key = ? AND created_at > ?",
+                    (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        finally:
+            conn.close()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row is not None else None
+
+    def put(self, key, value):
+        """Store value under key and evict expired or least recently used entries."""
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now)
+                )
+                evicted = self._evict(conn, now)
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.stores += 1
+            self.evictions += evicted
+
+    def _evict(self, conn, now):
+        evicted = conn.execute("DELETE FROM results WHERE created_at <= ?", (now - self.ttl,)).rowcount
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return evicted
+
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed_at").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        finally:
+            conn.close()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'entries': count,
+                'bytes': total
+            }
@@ -0,0 +1,266 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-worker locking is unavailable
+    fcntl = None
+
+SESSION_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class SessionNotFound(Exception):
+    """Raised when a generation session is unknown or has expired."""
+    pass
+
+
+class SessionStore:
+    """
+    Server-side state of generation sessions: the parsed api_info, the prompt
+    and every code revision, keyed by a session id, so feedback rounds only
+    need the id instead of re-sending and re-parsing the spec.
+
+    Each session is written to one JSON file in `folder`, so every gunicorn
+    worker (and a restarted server) can continue it. Recently used sessions
+    are also kept decoded in an in-memory LRU of at most `memory_max_bytes`
+    (measured as serialized size); a cached copy is reused only while its
+    file is unchanged. Files are removed `ttl` seconds after their last
+    update, and the oldest ones once the folder exceeds `disk_max_bytes`.
+
+    Updates (revisions, rollbacks, prompts) read and rewrite a session under
+    an flock on its <id>.lock file, so concurrent updates from any worker are
+    applied one after the other instead of overwriting each other.
+    """
+
+    def __init__(self, folder, memory_max_bytes=64 * 1024 * 1024, disk_max_bytes=1024 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.folder = folder
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()  # Used when flock is unavailable
+        self._memory = OrderedDict()  # id -> (session, size, mtime_ns)
+        self._memory_bytes = 0
+        self._last_prune = 0
+        self.memory_hits = 0
+        self.disk_loads = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.folder, f"{session_id}.json")
+
+    def _lock_path(self, session_id):
+        return os.path.join(self.folder, f"{session_id}.lock")
+
+    @contextmanager
+    def _updating(self, session_id):
+        """Hold the exclusive update lock of an existing session."""
+        if not isinstance(session_id, str) or not SESSION_ID.match(session_id) or not os.path.exists(self._path(session_id)):
+            raise SessionNotFound(f"Unknown or expired session {session_id!r}")
+        if fcntl is None:
+            with self._update_lock:
+                yield
+            return
+        with open(self._lock_path(session_id), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _locked_if_idle(self, session_id):
+        """
+        Yield True while holding the update lock of a session that no worker
+        is updating, or False without waiting when one is.
+        """
+        if fcntl is None:
+            yield True
+            return
+        with open(self._lock_path(session_id), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _remember(self, session_id, session, size, mtime_ns):
+        with self._lock:
+            previous = self._memory.pop(session_id, None)
+            if previous is not None:
+                self._memory_bytes -= previous[1]
+            if size > self.memory_max_bytes:
+                return
+            self._memory[session_id] = (session, size, mtime_ns)
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_max_bytes:
+                _, (_, evicted_size, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+
+    def _forget(self, session_id):
+        with self._lock:
+            entry = self._memory.pop(session_id, None)
+            if entry is not None:
+                self._memory_bytes -= entry[1]
+
+    def _save(self, session):
+        data = json.dumps(session)
+        path = self._path(session['id'])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._remember(session['id'], session, len(data), os.stat(path).st_mtime_ns)
+        self._prune()
+        return session
+
+    def create(self, api_info, code, filename, prompt=None):
+        """Start a session whose first revision is `code`; returns the session dict."""
+        now = time.time()
+        session = {
+            'id': uuid.uuid4().hex,
+            'api_info': api_info,
+            'prompt': prompt,
+            'filename': filename,
+            'created_at': now,
+            'updated_at': now,
+            'revisions': [{'revision': 1, 'code': code, 'feedback': None, 'created_at': now}]
+        }
+        return self._save(session)
+
+    def get(self, session_id, fresh=False):
+        """
+        Return the session dict, or raise SessionNotFound. Treat the result as
+        read-only. `fresh` skips the in-memory copy and reads the file, as
+        updates do while holding the session's lock.
+        """
+        if not isinstance(session_id, str) or not SESSION_ID.match(session_id):
+            raise SessionNotFound(f"Unknown session {session_id!r}")
+        path = self._path(session_id)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            self._forget(session_id)
+            raise SessionNotFound(f"Unknown or expired session {session_id}")
+
+        with self._lock:
+            entry = None if fresh else self._memory.get(session_id)
+            if entry is not None and entry[2] == mtime_ns:
+                if entry[0]['updated_at'] >= time.time() - self.ttl:
+                    self._memory.move_to_end(session_id)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[session_id]
+                self._memory_bytes -= entry[1]
+                raise SessionNotFound(f"Unknown or expired session {session_id}")
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = f.read()
+            session = json.loads(data)
+        except (OSError, ValueError):
+            raise SessionNotFound(f"Unknown or expired session {session_id}")
+        if session['updated_at'] < time.time() - self.ttl:
+            raise SessionNotFound(f"Unknown or expired session {session_id}")
+        with self._lock:
+            self.disk_loads += 1
+        self._remember(session_id, session, len(data), mtime_ns)
+        return session
+
+    def _append_revision(self, session, code, feedback=None, rolled_back_from=None):
+        now = time.time()
+        revision = {
+            'revision': len(session['revisions']) + 1,
+            'code': code,
+            'feedback': feedback,
+            'created_at': now
+        }
+        if rolled_back_from is not None:
+            revision['rolled_back_from'] = rolled_back_from
+        return self._save(dict(session, updated_at=now, revisions=session['revisions'] + [revision]))
+
+    def add_revision(self, session_id, code, feedback=None):
+        """Append a code revision and return the updated session."""
+        with self._updating(session_id):
+            return self._append_revision(self.get(session_id, fresh=True), code, feedback)
+
+    def set_prompt(self, session_id, prompt):
+        """Store the base prompt of a session created without one."""
+        with self._updating(session_id):
+            return self._save(dict(self.get(session_id, fresh=True), prompt=prompt))
+
+    def rollback(self, session_id, revision):
+        """
+        Make an earlier revision current again. History is kept: the old code
+        is appended as a new revision, so a rollback can itself be undone.
+        """
+        with self._updating(session_id):
+            session = self.get(session_id, fresh=True)
+            if not 1 <= revision <= len(session['revisions']):
+                raise ValueError(f"Session has no revision {revision}")
+            code = session['revisions'][revision - 1]['code']
+            return self._append_revision(session, code, rolled_back_from=revision)
+
+    @staticmethod
+    def current(session):
+        """The latest revision of a session."""
+        return session['revisions'][-1]
+
+    def _prune(self):
+        """
+        Remove expired session files and the oldest ones beyond
+        disk_max_bytes (at most once a minute), with their lock files.
+        Sessions being updated are left for a later pass.
+        """
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+
+        files = []
+        for entry in os.scandir(self.folder):
+            try:
+                if entry.is_file() and entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path, entry.name[:-len('.json')]))
+            except OSError:
+                pass
+
+        total = sum(size for _, size, _, _ in files)
+        for mtime, size, path, session_id in sorted(files):
+            if mtime >= now - self.ttl and total <= self.disk_max_bytes:
+                break
+            # Remove the lock file only while holding it: a worker waiting on it then finds the
+            # session gone, and no later worker can lock a fresh file while this one is held
+            try:
+                with self._locked_if_idle(session_id) as idle:
+                    if not idle:
+                        continue
+                    os.remove(path)
+                    try:
+                        os.remove(self._lock_path(session_id))
+                    except OSError:
+                        pass
+            except OSError:
+                continue
+            total -= size
+            self._forget(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory_sessions': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'memory_hits': self.memory_hits,
+                'disk_loads': self.disk_loads
+            }
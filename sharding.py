@@ -0,0 +1,167 @@
+import re
+from typing import Dict, List, Tuple
+
+CLASS_DECLARATION = re.compile(r'^[ \t]*(?:public\s+)?(?:final\s+)?class\s+(\w+)', re.MULTILINE)
+CODE_FENCE = re.compile(r'```[a-zA-Z]*\n(.*?)(?:```|$)', re.DOTALL)
+DEFAULT_PACKAGE = 'com.example.api.test'
+
+
+def _identifier(text: str) -> str:
+    """Turn a tag or path segment into a CamelCase Java identifier fragment."""
+    words = re.split(r'[^0-9a-zA-Z]+', text)
+    name = ''.join(word[:1].upper() + word[1:] for word in words if word)
+    if not name:
+        return 'Default'
+    return name if not name[0].isdigit() else f'N{name}'
+
+
+def _shard_key(endpoint: Dict, by: str) -> str:
+    if by == 'tag' and endpoint.get('tags'):
+        return endpoint['tags'][0]
+    # Group by the first literal path segment, e.g. /pets/{petId} -> pets
+    for segment in endpoint['path'].split('/'):
+        if segment and not segment.startswith('{'):
+            return segment
+    return 'root'
+
+
+def endpoint_name(endpoint: Dict) -> str:
+    """Java identifier for a single operation, e.g. GET /pets/{petId} -> GetPetsPetId."""
+    return _identifier(f"{endpoint['method'].lower()} {endpoint['path']}")
+
+
+def shard_endpoints(endpoints: List[Dict], by: str = 'tag', max_endpoints: int = 10) -> List[Tuple[str, List[Dict]]]:
+    """
+    Group endpoints by their first tag (falling back to the path prefix) or by
+    path prefix, then split groups larger than `max_endpoints`. Returns
+    (shard name, endpoints) pairs whose names are unique Java identifiers.
+    """
+    groups = {}
+    for endpoint in endpoints:
+        groups.setdefault(_shard_key(endpoint, by), []).append(endpoint)
+
+    shards = []
+    used_names = set()
+    for key, group in groups.items():
+        base_name = _identifier(key)
+        step = max(max_endpoints, 1)
+        for start in range(0, len(group), step):
+            name = base_name
+            index = 2
+            while name in used_names:
+                name = f'{base_name}{index}'
+                index += 1
+            used_names.add(name)
+            shards.append((name, group[start:start + step]))
+    return shards
+
+
+def extract_java_code(text: str) -> str:
+    """Strip markdown fences and the stop marker from a model response."""
+    match = CODE_FENCE.search(text)
+    code = match.group(1) if match else text
+    return code.replace('<end of code>', '').strip()
+
+
+def java_code_complete(text: str) -> bool:
+    """
+    True when the Java code in a model response is syntactically closed: it
+    declares a class, every brace is balanced and no string, char literal or
+    comment is left open. Used to tell a truncated class from a finished one.
+    """
+    code = extract_java_code(text)
+    depth = 0
+    opened = False
+    i = 0
+    length = len(code)
+    while i < length:
+        char = code[i]
+        if code.startswith('//', i):
+            end = code.find('\n', i)
+            i = length if end == -1 else end + 1
+            continue
+        if code.startswith('/*', i):
+            end = code.find('*/', i + 2)
+            if end == -1:
+                return False
+            i = end + 2
+            continue
+        if code.startswith('"""', i):
+            end = code.find('"""', i + 3)
+            if end == -1:
+                return False
+            i = end + 3
+            continue
+        if char in '"\'':
+            i += 1
+            while i < length and code[i] != char:
+                if code[i] == '\n':
+                    return False
+                i += 2 if code[i] == '\\' else 1
+            if i >= length:
+                return False
+        elif char == '{':
+            depth += 1
+            opened = True
+        elif char == '}':
+            depth -= 1
+            if depth < 0:
+                return False
+        i += 1
+    return opened and depth == 0 and CLASS_DECLARATION.search(code) is not None
+
+
+def merge_test_classes(class_name: str, sources: List[Tuple[str, str]]) -> str:
+    """
+    Merge the test classes generated for each shard into one compilable file.
+
+    Every shard class becomes a JUnit 5 @Nested class of `class_name`;
+    imports are de-duplicated and class-level annotations (e.g.
+    @SpringBootTest) are moved to the outer class. A shard whose output holds
+    no class declaration is kept as a comment so nothing is silently lost.
+    """
+    package = None
+    imports = []
+    annotations = []
+    nested = []
+    used_names = set()
+
+    for shard_name, text in sources:
+        code = extract_java_code(text)
+        match = CLASS_DECLARATION.search(code)
+        if not match:
+            commented = '\n'.join(f'// {line}' for line in code.splitlines())
+            nested.append(f'// Shard {shard_name} did not contain a test class:\n{commented}')
+            continue
+
+        header = code[:match.start()].splitlines()
+        for line in header:
+            stripped = line.strip()
+            if stripped.startswith('package ') and package is None:
+                package = stripped[len('package '):].rstrip(';').strip()
+            elif stripped.startswith('import ') and stripped not in imports:
+                imports.append(stripped)
+            elif stripped.startswith('@') and stripped not in annotations:
+                annotations.append(stripped)
+
+        inner_name = match.group(1)
+        if inner_name in used_names:
+            inner_name = f'{inner_name}{shard_name}'
+        used_names.add(inner_name)
+
+        body = code[match.end():]
+        declaration = f'@Nested\nclass {inner_name}'
+        nested.append(declaration + body)
+
+    nested_import = 'import org.junit.jupiter.api.Nested;'
+    if nested_import not in imports:
+        imports.append(nested_import)
+
+    parts = [f'package {package or DEFAULT_PACKAGE};', '', *sorted(imports), '']
+    parts.extend(annotations)
+    parts.append(f'public class {class_name} {{')
+    for block in nested:
+        parts.append('')
+        parts.extend(f'    {line}' if line.strip() else '' for line in block.splitlines())
+    parts.append('}')
+    return '\n'.join(parts) + '\n'
@@ -1,20 +1,166 @@
 import yaml
 import json
-from typing import Dict, List, Any
+import re
+from typing import Dict, List, Any, Set
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# libyaml's C loader when PyYAML was built with it, else the pure-Python one
+FAST_YAML_LOADER = getattr(yaml, 'CSafeLoader', None)
+
+SCHEMA_REF_PREFIX = '#/components/schemas/'
+
+# Integers orjson may not keep exact (beyond 64 bits) have at least this many digits
+LONG_DIGIT_RUN = re.compile(r'\d{19}')
+
+
+class RefResolver:
+    """
+    Resolves local `$ref`s of one OpenAPI document.
+
+    Only the top of a node is resolved (a parameter, request body, response
+    or path item that is a reference), so schemas stay as `$ref`s and are
+    never expanded into each operation. Reference targets are memoized, and
+    a chain that comes back to a reference already followed is circular and
+    stops there.
+
+    The resolver also builds the schema reference graph once and answers
+    which schemas a node uses transitively (see schemas_used_by).
+    """
+
+    def __init__(self, spec: Dict):
+        self.spec = spec
+        self.schemas = spec.get('components', {}).get('schemas', {}) or {}
+        self._targets = {}
+        self._schema_graph = {name: self._direct_schema_refs(schema) for name, schema in self.schemas.items()}
+        self._closures = {}
+
+    def _lookup(self, ref: str) -> Any:
+        if ref in self._targets:
+            return self._targets[ref]
+        node = self.spec
+        for part in ref[2:].split('/'):
+            part = part.replace('~1', '/').replace('~0', '~')
+            if isinstance(node, list):
+                node = node[int(part)]
+            else:
+                node = node[part]
+        self._targets[ref] = node
+        return node
+
+    def resolve_shallow(self, node: Any) -> Any:
+        """Follow $ref chains at the top of node only (e.g. a parameter or response reference)."""
+        seen = set()
+        while isinstance(node, dict) and isinstance(node.get('$ref'), str) and node['$ref'].startswith('#/'):
+            ref = node['$ref']
+            if ref in seen:
+                break
+            seen.add(ref)
+            try:
+                node = self._lookup(ref)
+            except (KeyError, IndexError, ValueError):
+                break
+        return node
+
+    def _direct_schema_refs(self, node: Any) -> Set[str]:
+        """Schema names referenced by node, following non-schema component refs."""
+        found = set()
+        pending = [node]
+        followed = set()
+        while pending:
+            current = pending.pop()
+            if isinstance(current, dict):
+                ref = current.get('$ref')
+                if isinstance(ref, str):
+                    if ref.startswith(SCHEMA_REF_PREFIX):
+                        name = ref[len(SCHEMA_REF_PREFIX):].replace('~1', '/').replace('~0', '~')
+                        if name in self.schemas:
+                            found.add(name)
+                    elif ref.startswith('#/') and ref not in followed:
+                        # e.g. #/components/parameters/Limit, which may in turn use schemas
+                        followed.add(ref)
+                        pending.append(self.resolve_shallow(current))
+                pending.extend(current.values())
+            elif isinstance(current, list):
+                pending.extend(current)
+        return found
+
+    def _schema_closure(self, name: str) -> Set[str]:
+        if name in self._closures:
+            return self._closures[name]
+        closure = set()
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            for dependency in self._schema_graph.get(current, ()):
+                if dependency in closure:
+                    continue
+                closure.add(dependency)
+                if dependency in self._closures:
+                    # Completed closures are final, so reuse them instead of walking again
+                    closure |= self._closures[dependency]
+                else:
+                    pending.append(dependency)
+        self._closures[name] = closure
+        return closure
+
+    def schemas_used_by(self, node: Any) -> List[str]:
+        """Names of every schema node uses directly or transitively, in spec order."""
+        used = set()
+        for name in self._direct_schema_refs(node):
+            used.add(name)
+            used |= self._schema_closure(name)
+        return [name for name in self.schemas if name in used]
+
 
 class SpecParser:
     @staticmethod
-    def parse_openapi_spec(file_content: str, file_type: str) -> Dict[str, Any]:
+    def parse_openapi_spec(file_content: str, file_type: str, validate=None) -> Dict[str, Any]:
+        """
+        `validate`, when given, is called with the loaded document before
+        anything is extracted; the exceptions it raises propagate unchanged.
+        """
+        try:
+            spec = SpecParser._load_document(file_content, file_type)
+        except Exception as e:
+            raise ValueError(f"Failed to parse specification: {str(e)}")
+        if validate is not None:
+            validate(spec)
         try:
-            if file_type.lower() in ['yaml', 'yml']:
-                spec = yaml.safe_load(file_content)
-            else:
-                spec = json.loads(file_content)
-            
             return SpecParser._extract_api_info(spec)
         except Exception as e:
             raise ValueError(f"Failed to parse specification: {str(e)}")
     
+    @staticmethod
+    def _load_document(file_content: str, file_type: str) -> Any:
+        """
+        Load YAML or JSON with the C-accelerated parsers when available
+        (libyaml, orjson). If the fast parser rejects the document, or may
+        not represent it exactly, it is parsed with the standard one, so
+        results and error messages are exactly those of yaml.safe_load /
+        json.loads.
+        """
+        if file_type.lower() in ['yaml', 'yml']:
+            if FAST_YAML_LOADER is not None:
+                try:
+                    return yaml.load(file_content, Loader=FAST_YAML_LOADER)
+                except Exception:
+                    pass
+            return yaml.safe_load(file_content)
+        
+        # orjson turns integers beyond 64 bits into lossy floats instead of failing,
+        # so documents with a digit run that long (even inside a string) go to json.loads
+        if orjson is not None and not LONG_DIGIT_RUN.search(file_content):
+            try:
+                return orjson.loads(file_content)
+            except Exception:
+                # e.g. NaN, Infinity or lone surrogates, which json accepts
+                pass
+        return json.loads(file_content)
+    
     @staticmethod
     def _extract_api_info(spec: Dict) -> Dict[str, Any]:
         info = {
@@ -28,21 +174,75 @@ class SpecParser:
         paths = spec.get('paths', {})
         components = spec.get('components', {})
         schemas = components.get('schemas', {})
+        resolver = RefResolver(spec)
         
         for path, methods in paths.items():
+            if path.startswith('x-'):
+                # Specification extension, not a path
+                continue
+            methods = resolver.resolve_shallow(methods)
+            # Parameters declared on the path item apply to every operation
+            shared_parameters = methods.get('parameters', [])
             for method, details in methods.items():
                 if method.lower() in ['get', 'post', 'put', 'delete', 'patch']:
+                    parameters = SpecParser._merge_parameters(
+                        [resolver.resolve_shallow(p) for p in shared_parameters],
+                        [resolver.resolve_shallow(p) for p in details.get('parameters', [])]
+                    )
+                    request_body = resolver.resolve_shallow(details.get('requestBody', {}))
+                    responses = {
+                        status: resolver.resolve_shallow(response)
+                        for status, response in details.get('responses', {}).items()
+                    }
                     endpoint_info = {
                         'path': path,
                         'method': method.upper(),
                         'summary': details.get('summary', ''),
                         'description': details.get('description', ''),
-                        'parameters': details.get('parameters', []),
-                        'request_body': details.get('requestBody', {}),
-                        'responses': details.get('responses', {}),
-                        'tags': details.get('tags', [])
+                        'parameters': parameters,
+                        'request_body': request_body,
+                        'responses': responses,
+                        'tags': details.get('tags', []),
+                        'schema_refs': resolver.schemas_used_by([parameters, request_body, responses])
                     }
                     info['endpoints'].append(endpoint_info)
         
         info['schemas'] = schemas
         return info
+    
+    @staticmethod
+    def _merge_parameters(shared: List[Dict], own: List[Dict]) -> List[Dict]:
+        """Operation parameters override path-level ones with the same name and location."""
+        overridden = {(p.get('name'), p.get('in')) for p in own if isinstance(p, dict)}
+        merged = [p for p in shared if not isinstance(p, dict) or (p.get('name'), p.get('in')) not in overridden]
+        return merged + list(own)
+    
+    @staticmethod
+    def referenced_schemas(endpoints: List[Dict], schemas: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the subset of schemas the given endpoints reach through $ref, directly or transitively."""
+        if all('schema_refs' in endpoint for endpoint in endpoints):
+            # Fast path: dependency index built by the parser
+            used = set()
+            for endpoint in endpoints:
+                used.update(endpoint['schema_refs'])
+            return {name: schemas[name] for name in schemas if name in used}
+        
+        prefix = SCHEMA_REF_PREFIX
+        selected = {}
+        pending = [endpoints]
+        
+        while pending:
+            node = pending.pop()
+            if isinstance(node, dict):
+                ref = node.get('$ref')
+                if isinstance(ref, str) and ref.startswith(prefix):
+                    name = ref[len(prefix):]
+                    if name in schemas and name not in selected:
+                        selected[name] = schemas[name]
+                        pending.append(schemas[name])
+                pending.extend(node.values())
+            elif isinstance(node, list):
+                pending.extend(node)
+        
+        # Keep the spec's own ordering
+        return {name: schemas[name] for name in schemas if name in selected}
@@ -0,0 +1,361 @@
+"""
+Validation of uploaded OpenAPI documents before any prompt is built.
+
+Two levels are available:
+
+    structural  a linear pass over the document: version, info, path items,
+                operations, parameters and that every local $ref resolves
+    full        openapi-spec-validator against the OpenAPI 2.0/3.0/3.1 schema
+                (needs the optional openapi-spec-validator package)
+
+SpecValidator always runs the structural pass. Full validation is opt-in,
+since it can take seconds for a mid-sized spec, and runs only when the
+structural pass succeeds. It has a time budget and a bounded number of
+validations in flight. When the budget runs out, the request goes ahead on
+the structural result, and full validation continues in the background.
+Its result then lands in the cache for the next upload of the same spec.
+When too many are already in flight, the request does not queue behind them
+and gets the structural result straight away. Results are cached by spec
+hash, so an identical spec is never validated twice.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Dict, List
+
+try:
+    from jsonschema_path import SchemaPath
+    from openapi_spec_validator.shortcuts import get_validator_cls
+    from openapi_spec_validator.validation.exceptions import ValidatorDetectError
+except ImportError:
+    get_validator_cls = None
+
+logger = logging.getLogger(__name__)
+
+MAX_ERRORS = 20
+OPERATION_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch', 'trace')
+PARAMETER_LOCATIONS = {'query', 'header', 'path', 'cookie'}
+SWAGGER_PARAMETER_LOCATIONS = {'query', 'header', 'path', 'formData', 'body'}
+
+
+def json_pointer(parts) -> str:
+    """'#/paths/~1pets/get' style location of a node, from its path of keys."""
+    return '#' + ''.join('/' + str(part).replace('~', '~0').replace('/', '~1') for part in parts)
+
+
+class SpecValidationError(Exception):
+    """Raised when a spec fails validation; `errors` holds {'path', 'message'} entries."""
+
+    def __init__(self, report):
+        self.report = report
+        self.errors = report['errors']
+        first = self.errors[0] if self.errors else {'path': '#', 'message': 'invalid'}
+        more = f" (and {len(self.errors) - 1} more)" if len(self.errors) > 1 else ""
+        super().__init__(f"Invalid OpenAPI specification at {first['path']}: {first['message']}{more}")
+
+
+class StructuralCheck:
+    """
+    Incremental structural validation. Feed it the document's top-level
+    members with document_member(), then call finish() with a function
+    telling whether a local $ref resolves. A `paths` or `components` object
+    given there is checked whole; pass {} instead when its members are fed
+    separately to path_item() and component().
+    """
+
+    def __init__(self, max_errors: int = MAX_ERRORS):
+        self.max_errors = max_errors
+        self.errors = []
+        self.members = set()
+        self.version = None
+        self._refs = {}
+
+    def _error(self, parts, message):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'path': json_pointer(parts), 'message': message})
+
+    def _collect_refs(self, node: Any, parts: list):
+        pending = [(node, parts)]
+        while pending:
+            current, where = pending.pop()
+            if isinstance(current, dict):
+                ref = current.get('$ref')
+                if isinstance(ref, str) and ref.startswith('#/') and ref not in self._refs:
+                    self._refs[ref] = where
+                pending.extend((value, where + [key]) for key, value in current.items())
+            elif isinstance(current, list):
+                pending.extend((value, where + [index]) for index, value in enumerate(current))
+
+    @property
+    def swagger(self) -> bool:
+        return isinstance(self.version, str) and self.version.startswith('2')
+
+    def document_member(self, key: str, value: Any):
+        self.members.add(key)
+        if key in ('openapi', 'swagger'):
+            if not isinstance(value, str) or not (value.startswith('3.') or value == '2.0'):
+                self._error([key], f"Unsupported version {value!r}; expected 2.0 or 3.x")
+            self.version = value
+        elif key == 'info':
+            if not isinstance(value, dict):
+                self._error([key], "'info' must be an object")
+                return
+            for field in ('title', 'version'):
+                if not isinstance(value.get(field), str):
+                    self._error([key, field], f"'{field}' is a required string")
+        elif key == 'paths':
+            if not isinstance(value, dict):
+                self._error([key], "'paths' must be an object")
+                return
+            for path, item in value.items():
+                if not path.startswith('x-'):
+                    self.path_item(path, item)
+        elif key == 'components':
+            if not isinstance(value, dict):
+                self._error([key], "'components' must be an object")
+                return
+            for kind, members in value.items():
+                if isinstance(members, dict):
+                    for name, node in members.items():
+                        self.component(kind, name, node)
+                else:
+                    self._error([key, kind], f"'{kind}' must be an object")
+        else:
+            self._collect_refs(value, [key])
+
+    def component(self, kind: str, name: str, node: Any):
+        """Collect the $refs of one component, e.g. ('schemas', 'Pet', {...})."""
+        self._collect_refs(node, ['components', kind, name])
+
+    def path_item(self, path: str, item: Any):
+        parts = ['paths', path]
+        if not path.startswith('/'):
+            self._error(parts, "Path must start with '/'")
+        if not isinstance(item, dict):
+            self._error(parts, "Path item must be an object")
+            return
+        self._collect_refs(item, parts)
+        if '$ref' in item:
+            return
+        self._parameters(item.get('parameters'), parts + ['parameters'])
+        for method, operation in item.items():
+            if method not in OPERATION_METHODS:
+                continue
+            where = parts + [method]
+            if not isinstance(operation, dict):
+                self._error(where, "Operation must be an object")
+                continue
+            self._parameters(operation.get('parameters'), where + ['parameters'])
+            responses = operation.get('responses')
+            if responses is None:
+                if not (isinstance(self.version, str) and self.version.startswith('3.1')):
+                    self._error(where, "'responses' is a required property")
+            elif not isinstance(responses, dict) or not responses:
+                self._error(where + ['responses'], "'responses' must be a non-empty object")
+
+    def _parameters(self, parameters: Any, parts: list):
+        if parameters is None:
+            return
+        if not isinstance(parameters, list):
+            self._error(parts, "'parameters' must be an array")
+            return
+        locations = SWAGGER_PARAMETER_LOCATIONS if self.swagger else PARAMETER_LOCATIONS
+        for index, parameter in enumerate(parameters):
+            where = parts + [index]
+            if not isinstance(parameter, dict):
+                self._error(where, "Parameter must be an object")
+            elif '$ref' not in parameter:
+                if not isinstance(parameter.get('name'), str):
+                    self._error(where, "'name' is a required string")
+                if parameter.get('in') not in locations:
+                    self._error(where + ['in'], f"'in' must be one of {', '.join(sorted(locations))}")
+
+    def finish(self, resolves: Callable[[str], bool]) -> List[Dict[str, str]]:
+        """Check required members and $refs; returns the errors found."""
+        if 'openapi' not in self.members and 'swagger' not in self.members:
+            self._error([], "'openapi' (or 'swagger') version is a required property")
+        if 'info' not in self.members:
+            self._error([], "'info' is a required property")
+        if 'paths' not in self.members and not (isinstance(self.version, str) and self.version.startswith('3.1')):
+            self._error([], "'paths' is a required property")
+        for ref, where in self._refs.items():
+            if not resolves(ref):
+                self._error(where, f"Unresolvable reference {ref}")
+        return self.errors
+
+
+def document_resolver(document: Any) -> Callable[[str], bool]:
+    """Function telling whether a local $ref points at a node of the document."""
+    def resolves(ref: str) -> bool:
+        node = document
+        for part in ref[2:].split('/'):
+            part = part.replace('~1', '/').replace('~0', '~')
+            try:
+                node = node[int(part)] if isinstance(node, list) else node[part]
+            except (KeyError, IndexError, ValueError, TypeError):
+                return False
+        return True
+    return resolves
+
+
+def structural_errors(document: Any, max_errors: int = MAX_ERRORS) -> List[Dict[str, str]]:
+    if not isinstance(document, dict):
+        return [{'path': '#', 'message': 'Specification must be an object'}]
+    check = StructuralCheck(max_errors)
+    for key, value in document.items():
+        check.document_member(key, value)
+    return check.finish(document_resolver(document))
+
+
+def full_errors(document: Dict, max_errors: int = MAX_ERRORS) -> List[Dict[str, str]]:
+    """Errors reported by openapi-spec-validator, with their locations."""
+    try:
+        validator = get_validator_cls(document)(SchemaPath.from_dict(document))
+    except ValidatorDetectError:
+        return [{'path': '#', 'message': 'Unknown or missing OpenAPI version'}]
+    errors = []
+    for error in validator.iter_errors():
+        parts = getattr(error, 'absolute_path', None) or getattr(error, 'path', None) or []
+        errors.append({'path': json_pointer(parts), 'message': getattr(error, 'message', str(error))})
+        if len(errors) >= max_errors:
+            break
+    return errors
+
+
+class SpecValidator:
+    """
+    Validates parsed spec documents, caching reports by spec hash (see the
+    module docstring). `mode` is 'structural' or 'full'. Full validation is
+    skipped for documents larger than `full_max_bytes`, and gives up waiting
+    after `time_budget` seconds. One full validation runs at a time per
+    process, with at most `max_in_flight` running or queued.
+    """
+
+    def __init__(self, mode='structural', time_budget=2.0, full_max_bytes=5 * 1024 * 1024, cache_entries=1000,
+                 max_in_flight=1):
+        self.mode = mode if get_validator_cls is not None else 'structural'
+        self.time_budget = time_budget
+        self.full_max_bytes = full_max_bytes
+        self.cache_entries = cache_entries
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='spec-validate')
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.budget_exceeded = 0
+        self.overloaded = 0
+        self.validations = {'structural': 0, 'full': 0}
+
+    @staticmethod
+    def _report(mode, errors, start):
+        return {
+            'valid': not errors,
+            'mode': mode,
+            'errors': errors,
+            'seconds': round(time.perf_counter() - start, 4)
+        }
+
+    def _store(self, spec_hash, report):
+        with self._lock:
+            self.validations[report['mode']] += 1
+            previous = self._cache.get(spec_hash)
+            # A structural pass never replaces a full result
+            if previous is None or report['mode'] == 'full' or previous['mode'] == 'structural':
+                self._cache[spec_hash] = report
+                self._cache.move_to_end(spec_hash)
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+
+    def _checked(self, report):
+        if not report['valid']:
+            with self._lock:
+                self.rejected += 1
+            raise SpecValidationError(report)
+        return report
+
+    def cached(self, spec_hash):
+        """The cached report for a spec, or None. Raises SpecValidationError when it is invalid."""
+        with self._lock:
+            report = self._cache.get(spec_hash)
+            if report is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(spec_hash)
+            self.hits += 1
+        return self._checked(dict(report, cached=True))
+
+    def record(self, spec_hash, mode, errors, start):
+        """Cache the result of a check made elsewhere (e.g. while streaming) and raise if invalid."""
+        report = self._report(mode, errors, start)
+        self._store(spec_hash, report)
+        return self._checked(report)
+
+    def _run_full(self, spec_hash, document):
+        start = time.perf_counter()
+        report = None
+        try:
+            errors = full_errors(document)
+        except Exception:
+            # A validator failure is not the spec's fault; keep the structural verdict
+            logger.warning("Full spec validation failed for %s", spec_hash[:12], exc_info=True)
+        else:
+            report = self._report('full', errors, start)
+            self._store(spec_hash, report)
+        finally:
+            # Only after the report is stored, so a request for the same spec
+            # always finds either the cached report or this validation
+            with self._lock:
+                self._inflight.pop(spec_hash, None)
+        return report
+
+    def validate(self, spec_hash, document, size):
+        """Validate a loaded document and return its report, or raise SpecValidationError."""
+        report = self.cached(spec_hash)
+        if report is not None:
+            return report
+
+        start = time.perf_counter()
+        errors = structural_errors(document)
+        if errors or self.mode != 'full' or size > self.full_max_bytes:
+            return self.record(spec_hash, 'structural', errors, start)
+
+        with self._lock:
+            future = self._inflight.get(spec_hash)
+            if future is None and len(self._inflight) >= self.max_in_flight:
+                # Don't wait behind other specs' validations; go ahead on the structural check
+                self.overloaded += 1
+                self.validations['structural'] += 1
+                return dict(self._report('structural', [], start), overloaded=True)
+            if future is None:
+                future = self._inflight[spec_hash] = self._pool.submit(self._run_full, spec_hash, document)
+        try:
+            report = future.result(timeout=max(self.time_budget - (time.perf_counter() - start), 0))
+        except TimeoutError:
+            with self._lock:
+                self.budget_exceeded += 1
+            report = dict(self._report('structural', [], start), budget_exceeded=True)
+            with self._lock:
+                self.validations['structural'] += 1
+            return report
+        if report is None:
+            return self.record(spec_hash, 'structural', [], start)
+        return self._checked(report)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'hits': self.hits,
+                'misses': self.misses,
+                'rejected': self.rejected,
+                'budget_exceeded': self.budget_exceeded,
+                'overloaded': self.overloaded,
+                'validations': dict(self.validations),
+                'cached': len(self._cache),
+                'in_flight': len(self._inflight)
+            }
@@ -10,12 +10,10 @@ document.addEventListener('DOMContentLoaded', function() {
     const feedbackInput = document.getElementById('feedbackInput');
     const regenerateBtn = document.getElementById('regenerateBtn');
     
-    let currentFilename = '';
+    let currentDownloadUrl = '';
     
-    // After successful generation, store the API spec and generated code
-    let lastApiSpec = '';
-    let lastApiSpecType = '';
-    let lastGeneratedCode = '';
+    // The server keeps the parsed spec and every revision; feedback only needs the session id
+    let currentSessionId = '';
 
     uploadForm.addEventListener('submit', async function(e) {
         e.preventDefault();
@@ -37,18 +35,7 @@ document.addEventListener('DOMContentLoaded', function() {
         formData.append('file', file);
         
         try {
-            const response = await fetch('/generate', {
-                method: 'POST',
-                body: formData
-            });
-            
-            const data = await response.json();
-            
-            if (response.ok && data.success) {
-                showResults(data);
-            } else {
-                showError(data.error || 'Failed to generate test cases');
-            }
+            await generateStreaming(formData);
         } catch (error) {
             showError('Network error: ' + error.message);
         } finally {
@@ -57,21 +44,95 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    async function generateBlocking(formData) {
+        const response = await fetch('/generate', {
+            method: 'POST',
+            body: formData
+        });
+        const data = await response.json();
+        if (response.ok && data.success) {
+            showResults(data);
+        } else {
+            showError(data.error || 'Failed to generate test cases');
+        }
+    }
+    
+    // Consume /generate/stream and render the code as it arrives
+    async function generateStreaming(formData) {
+        const response = await fetch('/generate/stream', {
+            method: 'POST',
+            body: formData
+        });
+        
+        if (response.status === 413) {
+            // Too large for one streamed prompt; /generate shards it
+            await generateBlocking(formData);
+            return;
+        }
+        if (!response.ok || !response.body) {
+            const data = await response.json();
+            showError(data.error || 'Failed to generate test cases');
+            return;
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let code = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const message = parseSseMessage(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                
+                if (message.event === 'meta') {
+                    showResults(Object.assign({ test_cases: '' }, message.data));
+                    downloadBtn.disabled = true;
+                } else if (message.event === 'chunk') {
+                    code += message.data.text;
+                    testOutput.textContent = code;
+                } else if (message.event === 'done') {
+                    showResults(Object.assign({ test_cases: code }, message.data));
+                } else if (message.event === 'error') {
+                    showError(message.data.error || 'Failed to generate test cases');
+                }
+            }
+        }
+    }
+    
+    function parseSseMessage(raw) {
+        let event = 'message';
+        let data = '';
+        raw.split('\n').forEach(function(line) {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data += line.slice(5).trim();
+            }
+        });
+        return { event: event, data: data ? JSON.parse(data) : {} };
+    }
+    
     downloadBtn.addEventListener('click', function() {
-        if (currentFilename) {
-            window.location.href = `/download/${currentFilename}`;
+        if (currentDownloadUrl) {
+            window.location.href = currentDownloadUrl;
         }
     });
     
     feedbackInput.addEventListener('input', function() {
-        regenerateBtn.disabled = !feedbackInput.value.trim() || !currentFilename || !lastGeneratedCode;
+        regenerateBtn.disabled = !feedbackInput.value.trim() || !currentSessionId;
     });
     
     function showResults(data) {
-        currentFilename = data.filename;
-        lastGeneratedCode = data.test_cases;
+        currentDownloadUrl = data.download_url || '';
+        currentSessionId = data.session_id || '';
         downloadBtn.disabled = false;
-        regenerateBtn.disabled = !feedbackInput.value.trim() || !currentFilename || !lastGeneratedCode;
+        regenerateBtn.disabled = !feedbackInput.value.trim() || !currentSessionId;
 
         apiInfo.innerHTML = `
             <strong>API:</strong> ${data.api_title}<br>
@@ -97,22 +158,9 @@ document.addEventListener('DOMContentLoaded', function() {
         errorSection.classList.add('d-none');
     }
     
-    // When uploading, store the spec content and type
-    fileInput.addEventListener('change', function(e) {
-        const file = e.target.files[0];
-        if (file) {
-            lastApiSpecType = file.name.split('.').pop();
-            const reader = new FileReader();
-            reader.onload = function(evt) {
-                lastApiSpec = evt.target.result;
-            };
-            reader.readAsText(file);
-        }
-    });
-    
     regenerateBtn.addEventListener('click', async function() {
         const feedback = feedbackInput.value.trim();
-        if (!feedback || !currentFilename) return;
+        if (!feedback || !currentSessionId) return;
 
         regenerateBtn.disabled = true;
         downloadBtn.disabled = true;
@@ -123,11 +171,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({
-                    filename: currentFilename,
-                    suggestions: feedbackInput.value.trim(),
-                    api_spec: lastApiSpec,
-                    api_spec_type: lastApiSpecType,
-                    previous_code: lastGeneratedCode
+                    session_id: currentSessionId,
+                    suggestions: feedback
                 })
             });
             const data = await response.json();
@@ -0,0 +1,460 @@
+"""
+Memory-bounded extraction of api_info from large JSON specs.
+
+SpecParser.parse_openapi_spec decodes the whole document into Python objects
+and then copies the raw parameters, request body and responses of every
+operation into api_info. For a spec of tens of megabytes that adds up to more
+than a gigabyte. StreamingSpecParser scans the JSON text instead. It decodes
+`paths` and `components.schemas` one member at a time and immediately reduces
+each member to the fields that prompts, sharding and incremental regeneration
+read:
+
+    endpoint  path, method, summary, tags, parameters (name, in, required,
+              type), request body type, response status codes, schema_refs
+    schema    type and property types
+
+Identical compact parameters and type nodes are shared, not duplicated. The
+other components (parameters, requestBodies, responses, ...) are kept whole,
+because operations point into them. `$ref`s are resolved once the whole
+document has been read, since components usually come after `paths`. The
+result has the same shape as SpecParser's output and renders the same prompt.
+It leaves out only what the prompt never shows: operation descriptions,
+examples, constraints and response bodies.
+"""
+import json
+import re
+import sys
+from json.decoder import scanstring
+from typing import Any, Dict, Iterator
+
+from spec_parser import SCHEMA_REF_PREFIX
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+HTTP_METHODS = ('get', 'post', 'put', 'delete', 'patch')
+
+
+def _unescape(part: str) -> str:
+    return part.replace('~1', '/').replace('~0', '~')
+
+
+def local_refs(node: Any) -> Iterator[str]:
+    """Every local `$ref` string in a decoded JSON node."""
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, dict):
+            ref = current.get('$ref')
+            if isinstance(ref, str) and ref.startswith('#/'):
+                yield ref
+            pending.extend(current.values())
+        elif isinstance(current, list):
+            pending.extend(current)
+
+
+class JsonScanner:
+    """Cursor over JSON text that decodes objects member by member."""
+
+    __slots__ = ('text', 'pos', '_decoder')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self._decoder = json.JSONDecoder()
+
+    def _skip_whitespace(self):
+        self.pos = WHITESPACE.match(self.text, self.pos).end()
+
+    def _expect(self, char: str):
+        self._skip_whitespace()
+        if not self.text.startswith(char, self.pos):
+            raise ValueError(f"Expecting {char!r}: char {self.pos}")
+        self.pos += 1
+
+    def at_object(self) -> bool:
+        self._skip_whitespace()
+        return self.text.startswith('{', self.pos)
+
+    def members(self) -> Iterator[str]:
+        """
+        Yield the keys of the object at the cursor. After each key the cursor
+        is on its value, which the caller must consume with value() before
+        asking for the next key.
+        """
+        self._expect('{')
+        self._skip_whitespace()
+        if self.text.startswith('}', self.pos):
+            self.pos += 1
+            return
+        while True:
+            self._expect('"')
+            key, self.pos = scanstring(self.text, self.pos)
+            self._expect(':')
+            yield key
+            self._skip_whitespace()
+            char = self.text[self.pos:self.pos + 1]
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Expecting ',' delimiter: char {self.pos - 1}")
+
+    def value(self) -> Any:
+        """Decode the value at the cursor and move past it."""
+        self._skip_whitespace()
+        value, self.pos = self._decoder.raw_decode(self.text, self.pos)
+        return value
+
+
+class PendingEndpoint:
+    """An operation whose component `$ref`s are resolved after the whole document is read."""
+
+    __slots__ = ('endpoint', 'shared_parameters', 'parameters', 'request_body', 'refs')
+
+    def __init__(self, endpoint, shared_parameters, parameters, request_body, refs):
+        self.endpoint = endpoint
+        # Parameters are (compact dict or None, $ref or None, refs) triples
+        self.shared_parameters = shared_parameters
+        self.parameters = parameters
+        # Compact request body, or the $ref string of a component
+        self.request_body = request_body
+        self.refs = refs
+
+
+class StreamingSpecParser:
+    """Builds compact api_info from a JSON spec; see the module docstring."""
+
+    def __init__(self, text: str, observer=None):
+        self.scanner = JsonScanner(text)
+        # Optional spec_validation.StructuralCheck fed as the document streams by
+        self.observer = observer
+        self.document = {}
+        self.components = {}
+        self.schemas = {}
+        self._schema_refs = {}
+        self._pending = []
+        self._nodes = {}
+        self._component_names = {}
+        self._closures = {}
+
+    @staticmethod
+    def parse_openapi_spec(file_content: str, observer=None) -> Dict[str, Any]:
+        try:
+            return StreamingSpecParser(file_content, observer).parse()
+        except Exception as e:
+            raise ValueError(f"Failed to parse specification: {str(e)}")
+
+    # Compact nodes -------------------------------------------------------
+
+    def _shared(self, key, build):
+        """The node cached under key, building it on first use, so equal nodes are one object."""
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = build()
+        return node
+
+    def _type_node(self, schema: Any):
+        """Smallest schema with the same schema_type(): a $ref, an array of items, or a type."""
+        if not isinstance(schema, dict):
+            return self._shared(('empty',), dict)
+        ref = schema.get('$ref')
+        if isinstance(ref, str):
+            return self._shared(('ref', ref), lambda: {'$ref': sys.intern(ref)})
+        kind = schema.get('type')
+        if kind == 'array':
+            items = self._type_node(schema.get('items', {}))
+            return self._shared(('array', id(items)), lambda: {'type': 'array', 'items': items})
+        if 'type' not in schema:
+            return self._shared(('empty',), dict)
+        if isinstance(kind, str):
+            return self._shared(('type', kind), lambda: {'type': sys.intern(kind)})
+        return {'type': kind}
+
+    def _parameter_node(self, parameter: Any):
+        if not isinstance(parameter, dict):
+            return self._shared(('empty',), dict)
+        name = parameter.get('name')
+        location = parameter.get('in')
+        schema = self._type_node(parameter['schema']) if 'schema' in parameter else None
+        required = bool(parameter.get('required'))
+
+        def build():
+            node = {}
+            if name is not None:
+                node['name'] = sys.intern(name) if isinstance(name, str) else name
+            if location is not None:
+                node['in'] = sys.intern(location) if isinstance(location, str) else location
+            if schema is not None:
+                node['schema'] = schema
+            if required:
+                node['required'] = True
+            return node
+
+        try:
+            return self._shared(('parameter', name, location, id(schema), required), build)
+        except TypeError:
+            # Unhashable name or location; not worth sharing
+            return build()
+
+    def _request_body_node(self, request_body: Any):
+        """Compact request body keeping only the first media type that has a schema."""
+        for media_type, media in (request_body if isinstance(request_body, dict) else {}).get('content', {}).items():
+            if isinstance(media, dict) and 'schema' in media:
+                return {'content': {media_type: {'schema': self._type_node(media['schema'])}}}
+        return {}
+
+    def _schema_node(self, schema: Any):
+        node = {}
+        if isinstance(schema, dict):
+            if 'type' in schema:
+                kind = schema['type']
+                node['type'] = sys.intern(kind) if isinstance(kind, str) else kind
+            properties = schema.get('properties', {})
+            if isinstance(properties, dict) and properties:
+                node['properties'] = {sys.intern(name): self._type_node(value) for name, value in properties.items()}
+        return node
+
+    # Reading the document ------------------------------------------------
+
+    def _pending_parameter(self, parameter: Any):
+        ref = parameter.get('$ref') if isinstance(parameter, dict) else None
+        if isinstance(ref, str) and ref.startswith('#/'):
+            return None, ref, (ref,)
+        return self._parameter_node(parameter), None, tuple(local_refs(parameter))
+
+    def _read_path_item(self, path: str, item: Any):
+        if not isinstance(item, dict):
+            return
+        shared_parameters = [self._pending_parameter(p) for p in item.get('parameters', []) or []]
+        for method, details in item.items():
+            if method.lower() not in HTTP_METHODS or not isinstance(details, dict):
+                continue
+            request_body = details.get('requestBody', {})
+            ref = request_body.get('$ref') if isinstance(request_body, dict) else None
+            if isinstance(ref, str) and ref.startswith('#/'):
+                body = ref
+            else:
+                body = self._request_body_node(request_body)
+            responses = details.get('responses', {}) or {}
+            endpoint = {
+                'path': path,
+                'method': sys.intern(method.upper()),
+                'summary': details.get('summary', ''),
+                'tags': [sys.intern(tag) if isinstance(tag, str) else tag for tag in details.get('tags', [])],
+                'responses': {sys.intern(str(status)): None for status in responses}
+            }
+            self._pending.append(PendingEndpoint(
+                endpoint,
+                shared_parameters,
+                [self._pending_parameter(p) for p in details.get('parameters', []) or []],
+                body,
+                set(local_refs([request_body, responses]))
+            ))
+
+    def _read_paths(self):
+        scanner = self.scanner
+        if not scanner.at_object():
+            self._observe('paths', scanner.value())
+            return
+        self._observe('paths', {})
+        for path in scanner.members():
+            item = scanner.value()
+            if path.startswith('x-'):
+                # Specification extension, not a path
+                continue
+            if self.observer is not None:
+                self.observer.path_item(path, item)
+            ref = item.get('$ref') if isinstance(item, dict) else None
+            if isinstance(ref, str):
+                # Path item defined elsewhere; read once components are known
+                self._pending.append((path, ref))
+            else:
+                self._read_path_item(path, item)
+
+    def _read_components(self):
+        scanner = self.scanner
+        if not scanner.at_object():
+            self._observe('components', scanner.value())
+            return
+        self._observe('components', {})
+        for kind in scanner.members():
+            if kind != 'schemas' or not scanner.at_object():
+                members = self.components[kind] = scanner.value()
+                if self.observer is not None and isinstance(members, dict):
+                    for name, node in members.items():
+                        self.observer.component(kind, name, node)
+                continue
+            for name in scanner.members():
+                schema = scanner.value()
+                if self.observer is not None:
+                    self.observer.component(kind, name, schema)
+                self.schemas[name] = self._schema_node(schema)
+                self._schema_refs[name] = tuple(set(local_refs(schema)))
+
+    def parse(self) -> Dict[str, Any]:
+        scanner = self.scanner
+        if not scanner.at_object():
+            raise ValueError("Specification is not a JSON object")
+        for key in scanner.members():
+            if key == 'paths':
+                self._read_paths()
+            elif key == 'components':
+                self._read_components()
+            elif key in ('info', 'servers'):
+                self.document[key] = scanner.value()
+                self._observe(key, self.document[key])
+            else:
+                self._observe(key, scanner.value())
+        if scanner.text[scanner.pos:].strip():
+            raise ValueError(f"Extra data: char {scanner.pos}")
+        if self.observer is not None:
+            self.observer.finish(self.resolves)
+        return self._finish()
+
+    def _observe(self, key: str, value: Any):
+        # Streamed sections ('paths', 'components') are announced as {}
+        if self.observer is not None:
+            self.observer.document_member(key, value)
+
+    def resolves(self, ref: str) -> bool:
+        """Whether a local $ref resolves; refs outside components are not kept and count as resolved."""
+        parts = ref[2:].split('/')
+        if parts[0] != 'components':
+            return True
+        if len(parts) >= 3 and parts[1] == 'schemas':
+            return _unescape(parts[2]) in self.schemas
+        return self._lookup(ref) is not None
+
+    # Resolving references ------------------------------------------------
+
+    def _lookup(self, ref: str):
+        """Target of a $ref into the kept (non-schema) components, or None."""
+        parts = ref[2:].split('/')
+        if len(parts) < 3 or parts[0] != 'components':
+            return None
+        node = self.components
+        for part in parts[1:]:
+            part = _unescape(part)
+            try:
+                node = node[int(part)] if isinstance(node, list) else node[part]
+            except (KeyError, IndexError, ValueError, TypeError):
+                return None
+        return node
+
+    def _resolve_shallow(self, node: Any) -> Any:
+        seen = set()
+        while isinstance(node, dict) and isinstance(node.get('$ref'), str) and node['$ref'].startswith('#/'):
+            ref = node['$ref']
+            target = self._lookup(ref)
+            if ref in seen or target is None:
+                break
+            seen.add(ref)
+            node = target
+        return node
+
+    def _schema_names(self, refs) -> set:
+        """Schema names reached directly from refs, following refs through other components."""
+        names = set()
+        for ref in refs:
+            if ref.startswith(SCHEMA_REF_PREFIX):
+                name = _unescape(ref[len(SCHEMA_REF_PREFIX):])
+                if name in self.schemas:
+                    names.add(name)
+            elif ref in self._component_names:
+                names |= self._component_names[ref]
+            else:
+                # Placeholder first, so a reference cycle ends here
+                self._component_names[ref] = set()
+                target = self._lookup(ref)
+                found = self._schema_names(local_refs(target)) if target is not None else set()
+                self._component_names[ref] = found
+                names |= found
+        return names
+
+    def _schema_closure(self, name: str) -> set:
+        if name in self._closures:
+            return self._closures[name]
+        closure = set()
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            for dependency in self._schema_names(self._schema_refs.get(current, ())):
+                if dependency in closure:
+                    continue
+                closure.add(dependency)
+                if dependency in self._closures:
+                    closure |= self._closures[dependency]
+                else:
+                    pending.append(dependency)
+        self._closures[name] = closure
+        return closure
+
+    def _resolve_parameters(self, pending_parameters):
+        """(compact parameters, refs) for (node, ref, refs) triples."""
+        resolved = []
+        for node, ref, refs in pending_parameters:
+            if ref is not None:
+                target = self._resolve_shallow({'$ref': ref})
+                node = self._parameter_node(target if isinstance(target, dict) and '$ref' not in target else {})
+            resolved.append((node, refs))
+        return resolved
+
+    def _finish_endpoint(self, pending: PendingEndpoint):
+        # Same merge as SpecParser._merge_parameters, keeping each parameter's refs alongside
+        own = self._resolve_parameters(pending.parameters)
+        overridden = {(node.get('name'), node.get('in')) for node, _ in own}
+        merged = [
+            (node, refs) for node, refs in self._resolve_parameters(pending.shared_parameters)
+            if (node.get('name'), node.get('in')) not in overridden
+        ] + own
+
+        refs = set(pending.refs)
+        for _, parameter_refs in merged:
+            refs.update(parameter_refs)
+        body = pending.request_body
+        if isinstance(body, str):
+            target = self._resolve_shallow({'$ref': body})
+            body = self._request_body_node(target) if isinstance(target, dict) and '$ref' not in target else {}
+
+        endpoint = pending.endpoint
+        endpoint['parameters'] = [node for node, _ in merged]
+        endpoint['request_body'] = body
+        endpoint['schema_refs'] = self._schema_refs_for(frozenset(self._schema_names(refs)))
+        return endpoint
+
+    def _schema_refs_for(self, names: frozenset) -> list:
+        """Spec-ordered transitive schema list for directly used names, one shared list per distinct set."""
+        key = ('schema_refs', names)
+        if key not in self._nodes:
+            used = set(names)
+            for name in names:
+                used |= self._schema_closure(name)
+            self._nodes[key] = [name for name in self.schemas if name in used]
+        return self._nodes[key]
+
+    def _finish(self) -> Dict[str, Any]:
+        document = self.document
+        info = document.get('info', {})
+        servers = document.get('servers', [{}])
+        api_info = {
+            'title': info.get('title', 'API'),
+            'version': info.get('version', '1.0'),
+            'description': info.get('description', ''),
+            'base_url': servers[0].get('url', ''),
+            'endpoints': []
+        }
+
+        pending, self._pending = self._pending, []
+        for entry in pending:
+            if isinstance(entry, tuple):
+                path, ref = entry
+                before = len(self._pending)
+                self._read_path_item(path, self._resolve_shallow({'$ref': ref}))
+                entries = self._pending[before:]
+                del self._pending[before:]
+            else:
+                entries = [entry]
+            for item in entries:
+                api_info['endpoints'].append(self._finish_endpoint(item))
+
+        api_info['schemas'] = self.schemas
+        return api_info
@@ -0,0 +1,74 @@
+import pytest
+
+
+def client_env(server):
+    """Environment pointing a Granite client at the fake server, without retries."""
+    return {
+        'IBM_API_KEY': 'test-key',
+        'IBM_PROJECT_ID': 'test-project',
+        'IBM_WATSONX_URL': server.url,
+        'IBM_IAM_URL': server.url + '/identity/token',
+        'GRANITE_MODEL': 'test-model',
+        'GRANITE_RETRY_MAX_ATTEMPTS': '1'
+    }
+
+
+@pytest.fixture(scope='session')
+def watsonx_server():
+    from fake_watsonx import FakeWatsonxConfig, FakeWatsonxServer
+    server = FakeWatsonxServer(config=FakeWatsonxConfig(latency=0, jitter=0)).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def watsonx_config(watsonx_server):
+    """The shared fake server's config; changes made by a test are undone after it."""
+    saved = dict(vars(watsonx_server.config))
+    yield watsonx_server.config
+    vars(watsonx_server.config).update(saved)
+
+
+@pytest.fixture
+def make_client(watsonx_server, monkeypatch):
+    """Build GraniteClients against the fake server; keyword arguments override the environment."""
+    clients = []
+
+    def make(**env):
+        for name, value in dict(client_env(watsonx_server), **env).items():
+            monkeypatch.setenv(name, value)
+        from granite_client import GraniteClient
+        clients.append(GraniteClient())
+        return clients[-1]
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture(scope='session')
+def pipeline(watsonx_server, tmp_path_factory):
+    """
+    The generation module, set up once against the fake watsonx server. Its
+    folders are relative, so the session runs from a temporary directory.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(tmp_path_factory.mktemp('app'))
+        for name, value in client_env(watsonx_server).items():
+            mp.setenv(name, value)
+        import generation
+        mp.setitem(generation.config, 'RESULT_CACHE_ENABLED', False)
+        generation.setup()
+        yield generation
+
+
+@pytest.fixture(scope='session')
+def app_module(pipeline):
+    """The Flask app module, sharing the pipeline's client, caches and stores."""
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
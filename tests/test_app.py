@@ -0,0 +1,77 @@
+import io
+import json
+import os
+
+from prometheus_client import REGISTRY
+
+from job_queue import QueueFullError
+
+SPEC = json.dumps({
+    'openapi': '3.0.0',
+    'info': {'title': 'Orders', 'version': '1.0'},
+    'paths': {'/orders': {'get': {'responses': {'200': {'description': 'OK'}}}}}
+}).encode('utf-8')
+
+
+def upload(client, query=''):
+    return client.post(f'/generate{query}', data={'file': (io.BytesIO(SPEC), 'api.json')},
+                       content_type='multipart/form-data')
+
+
+def queued_jobs():
+    return REGISTRY.get_sample_value('granite_jobs', {'state': 'queued'})
+
+
+def test_rejected_async_job_is_not_left_queued(client, app_module, monkeypatch):
+    def full(*args, **kwargs):
+        raise QueueFullError('Job queue is full')
+
+    before = queued_jobs()
+    monkeypatch.setattr(app_module.job_queue, 'submit', full)
+    response = upload(client, '?async=true')
+    assert response.status_code == 429 and response.headers['Retry-After'] == '5'
+    assert queued_jobs() == before
+
+
+def test_failed_async_submit_is_not_left_queued(client, app_module, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError('No space left on device')
+
+    before = queued_jobs()
+    monkeypatch.setattr(app_module.job_queue, 'submit', broken)
+    response = upload(client, '?async=true')
+    assert response.status_code == 500 and 'No space left on device' in response.get_json()['error']
+    assert queued_jobs() == before
+
+
+def test_download_answers_304_for_a_matching_etag(client):
+    result = upload(client).get_json()
+    response = client.get(result['download_url'])
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == result['test_cases']
+    assert 'Orders_Tests.java' in response.headers['Content-Disposition']
+    etag = response.headers['ETag']
+
+    response = client.get(result['download_url'], headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.get_data() == b''
+    response = client.get(result['download_url'], headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200 and response.headers['ETag'] == etag
+
+
+def test_download_of_an_artifact_larger_than_the_quota(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module.artifact_store, 'max_bytes', 10)
+    result = upload(client).get_json()
+    response = client.get(result['download_url'])
+    assert response.status_code == 200 and response.get_data(as_text=True) == result['test_cases']
+
+
+def test_download_restores_an_evicted_artifact_from_its_session(client, app_module):
+    result = upload(client).get_json()
+    os.remove(app_module.artifact_store.path_for(result['session_id']))
+    response = client.get(result['download_url'])
+    assert response.status_code == 200 and response.get_data(as_text=True) == result['test_cases']
+
+
+def test_download_of_an_unknown_artifact_is_404(client):
+    assert client.get('/download/' + '0' * 32).status_code == 404
+    assert client.get('/download/not-an-id').status_code == 404
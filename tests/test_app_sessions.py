@@ -0,0 +1,90 @@
+import io
+import json
+
+import pytest
+
+SPEC = json.dumps({
+    'openapi': '3.0.0',
+    'info': {'title': 'Orders', 'version': '1.0'},
+    'paths': {'/orders': {'get': {'responses': {'200': {'description': 'OK'}}}}}
+}).encode('utf-8')
+
+
+@pytest.fixture
+def revised_model(pipeline, monkeypatch):
+    """Regenerated classes carry the feedback they were asked for."""
+    generate_fresh = pipeline.granite_client.generate_test_cases
+
+    def generate_test_cases(prompt, priority, max_new_tokens):
+        if 'User Feedback: ' not in prompt:
+            return generate_fresh(prompt, priority, max_new_tokens)
+        feedback = prompt.split('User Feedback: ', 1)[1].split('\n', 1)[0]
+        return f'public class OrdersTests {{ /* {feedback} */ }}'
+
+    monkeypatch.setattr(pipeline.granite_client, 'generate_test_cases', generate_test_cases)
+
+
+def generate(client):
+    response = client.post('/generate', data={'file': (io.BytesIO(SPEC), 'api.json')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def regenerate(client, **body):
+    return client.post('/regenerate', json=body)
+
+
+def rollback(client, session_id, **body):
+    return client.post(f'/sessions/{session_id}/rollback', json=body)
+
+
+def test_rollback_makes_an_earlier_revision_current(client, revised_model):
+    first = generate(client)
+    session_id = first['session_id']
+    second = regenerate(client, session_id=session_id, suggestions='cover 404s').get_json()
+    assert second['revision'] == 2 and 'cover 404s' in second['test_cases']
+
+    response = rollback(client, session_id, revision=1)
+    assert response.status_code == 200
+    third = response.get_json()
+    assert third['revision'] == 3 and third['test_cases'] == first['test_cases']
+    assert client.get(third['download_url']).get_data(as_text=True) == first['test_cases']
+
+    revisions = client.get(f'/sessions/{session_id}').get_json()['revisions']
+    assert [revision['revision'] for revision in revisions] == [1, 2, 3]
+    assert revisions[2]['rolled_back_from'] == 1
+
+    # The rollback is itself a revision that can be rolled back
+    assert rollback(client, session_id, revision=2).get_json()['test_cases'] == second['test_cases']
+
+
+def test_rollback_rejects_bad_revisions(client):
+    session_id = generate(client)['session_id']
+    for body in ({}, {'revision': '1'}, {'revision': True}, {'revision': 1.0}):
+        response = rollback(client, session_id, **body)
+        assert response.status_code == 400 and response.get_json()['error'] == 'revision must be an integer'
+    for revision in (0, 2):
+        response = rollback(client, session_id, revision=revision)
+        assert response.status_code == 404 and f'no revision {revision}' in response.get_json()['error']
+
+
+def test_rollback_of_an_unknown_session_is_404(client):
+    assert rollback(client, '0' * 32, revision=1).status_code == 404
+    assert rollback(client, 'not-a-session', revision=1).status_code == 404
+
+
+def test_regenerate_requires_session_id_and_suggestions(client):
+    session_id = generate(client)['session_id']
+    for body in ({'suggestions': 'more tests'}, {'session_id': '', 'suggestions': 'more tests'},
+                 {'session_id': session_id}, {'session_id': session_id, 'suggestions': '  '}):
+        response = regenerate(client, **body)
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Missing session_id or suggestions for regeneration'
+    assert client.post('/regenerate', data='not json').status_code == 400
+
+
+def test_regenerate_of_an_unknown_session_is_404(client):
+    response = regenerate(client, session_id='0' * 32, suggestions='more tests')
+    assert response.status_code == 404
+    assert regenerate(client, session_id='not-a-session', suggestions='more tests').status_code == 404
@@ -0,0 +1,113 @@
+import os
+import time
+import uuid
+
+import pytest
+
+import artifact_store
+from artifact_store import ArtifactStore
+
+
+def new_id():
+    return uuid.uuid4().hex
+
+
+def test_put_and_get(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    artifact_id = new_id()
+    meta = store.put(artifact_id, 'PetsApiTest.java', 'class PetsApiTest {}', spec_hash='abc', model='m')
+    assert meta['filename'] == 'PetsApiTest.java'
+    assert meta['size'] == len('class PetsApiTest {}')
+    with open(store.path_for(artifact_id), encoding='utf-8') as f:
+        assert f.read() == 'class PetsApiTest {}'
+    assert store.get(artifact_id)['etag'] == meta['etag']
+    assert [row['id'] for row in store.list()] == [artifact_id]
+
+
+def test_rewrite_keeps_created_at_and_spec_hash(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    artifact_id = new_id()
+    first = store.put(artifact_id, 'A.java', 'v1', spec_hash='abc')
+    second = store.put(artifact_id, 'A.java', 'version 2')
+    assert second['created_at'] == first['created_at']
+    assert second['spec_hash'] == 'abc'
+    assert second['etag'] != first['etag']
+
+
+def test_put_file_moves_a_temp_file_into_place(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    artifact_id = new_id()
+    temp_path = store.temp_path()
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write('class A {}')
+    store.put_file(artifact_id, 'A.java', temp_path)
+    assert not os.path.exists(temp_path)
+    assert os.path.exists(store.path_for(artifact_id))
+
+
+def test_invalid_ids(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    assert store.get('../index.sqlite3') is None
+    with pytest.raises(ValueError):
+        store.path_for('../../etc/passwd')
+
+
+def test_expired_artifact_is_deleted_on_lookup(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path), ttl=60)
+    artifact_id = new_id()
+    store.put(artifact_id, 'A.java', 'class A {}')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    assert store.get(artifact_id) is None
+    assert not os.path.exists(store.path_for(artifact_id))
+    assert store.stats()['artifacts'] == 0
+
+
+def test_missing_file_drops_the_index_row(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    artifact_id = new_id()
+    store.put(artifact_id, 'A.java', 'class A {}')
+    os.remove(store.path_for(artifact_id))
+    assert store.get(artifact_id) is None
+    assert store.stats()['artifacts'] == 0
+
+
+def test_least_recently_used_are_evicted_beyond_max_bytes(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=250)
+    first, second, third = new_id(), new_id(), new_id()
+    store.put(first, 'A.java', 'a' * 100)
+    store.put(second, 'B.java', 'b' * 100)
+    store.get(first)  # first is now more recently used than second
+    store.put(third, 'C.java', 'c' * 100)
+    assert store.get(second) is None
+    assert not os.path.exists(store.path_for(second))
+    assert store.get(first) is not None and store.get(third) is not None
+    stats = store.stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] == 200
+
+
+
+def test_artifact_larger_than_max_bytes_survives_its_own_put(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=150)
+    small, large = new_id(), new_id()
+    store.put(small, 'A.java', 'a' * 100)
+    meta = store.put(large, 'B.java', 'b' * 400)
+    assert meta is not None and meta['size'] == 400
+    assert store.get(small) is None and store.get(large) is not None
+    # It is the first to go once something else is stored
+    store.put(small, 'A.java', 'a' * 100)
+    assert store.get(large) is None and store.get(small) is not None
+
+def test_stale_partial_files_are_swept(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    stale = store.temp_path()
+    fresh = store.temp_path()
+    for path in (stale, fresh):
+        open(path, 'w').close()
+    old = time.time() - artifact_store.STALE_PARTIAL_SECONDS - 60
+    os.utime(stale, (old, old))
+
+    store.put(new_id(), 'A.java', 'class A {}')
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
@@ -0,0 +1,73 @@
+import io
+import json
+import zipfile
+
+
+def spec(title, path='/items'):
+    return json.dumps({
+        'openapi': '3.0.0',
+        'info': {'title': title, 'version': '1.0'},
+        'paths': {path: {'get': {'responses': {'200': {'description': 'OK'}}}}}
+    }).encode('utf-8')
+
+
+def zip_of(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def post_batch(client, files):
+    return client.post('/generate/batch', data={
+        'files': [(io.BytesIO(content), name) for name, content in files]
+    }, content_type='multipart/form-data')
+
+
+def test_batch_returns_a_class_per_spec_and_a_manifest(client):
+    archive = zip_of({
+        'billing/api.yaml': spec('Billing', '/invoices'),
+        'notes.txt': b'not a spec',
+        'broken.json': b'{"openapi": '
+    })
+    response = post_batch(client, [('orders.json', spec('Orders', '/orders')), ('more.zip', archive)])
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as result:
+        names = set(result.namelist())
+        assert names == {'orders_Tests.java', 'billing/api_Tests.java', 'manifest.json'}
+        assert 'GET /orders' in result.read('orders_Tests.java').decode('utf-8')
+        assert 'GET /invoices' in result.read('billing/api_Tests.java').decode('utf-8')
+        manifest = json.loads(result.read('manifest.json'))
+
+    assert manifest['totals'] == {'specs': 3, 'generated': 2, 'failed': 1}
+    by_spec = {entry['spec']: entry for entry in manifest['specs']}
+    assert by_spec['orders.json']['output'] == 'orders_Tests.java'
+    assert by_spec['billing/api.yaml']['api_title'] == 'Billing'
+    assert by_spec['broken.json']['status'] == 'failed' and 'output' not in by_spec['broken.json']
+
+
+def test_batch_reads_specs_after_the_request_files_are_closed(client, app_module, monkeypatch):
+    # Werkzeug 3 closes request files when the view returns, before the ZIP is streamed
+    view = app_module.app.view_functions['generate_tests_batch']
+
+    def closing_view():
+        response = view()
+        for file in app_module.request.files.values():
+            file.close()
+        return response
+
+    monkeypatch.setitem(app_module.app.view_functions, 'generate_tests_batch', closing_view)
+    response = post_batch(client, [('orders.json', spec('Orders')), ('more.zip', zip_of({'a.json': spec('A')}))])
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as result:
+        manifest = json.loads(result.read('manifest.json'))
+    assert manifest['totals']['generated'] == 2
+
+
+def test_batch_rejects_uploads_without_specs(client):
+    response = post_batch(client, [('notes.txt', b'text')])
+    assert response.status_code == 400
+    response = post_batch(client, [('bad.zip', b'not a zip')])
+    assert response.status_code == 400 and 'not a valid ZIP' in response.get_json()['error']
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+
+import batch_generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PETSTORE = os.path.join(ROOT, 'sample_specs', 'petstore.yaml')
+
+
+def test_importing_the_cli_does_not_load_the_web_app(tmp_path):
+    env = {key: value for key, value in os.environ.items() if not key.startswith(('IBM_', 'GRANITE_'))}
+    env['PYTHONPATH'] = ROOT
+    result = subprocess.run(
+        [sys.executable, '-c', "import sys, batch_generate; print('app' in sys.modules)"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == 'False'
+    # No folders, client or stores are created just by importing
+    assert os.listdir(tmp_path) == []
+
+
+def test_cli_generates_then_skips_unchanged_specs(pipeline, tmp_path, monkeypatch):
+    spec_dir = tmp_path / 'specs'
+    (spec_dir / 'billing').mkdir(parents=True)
+    with open(PETSTORE, encoding='utf-8') as f:
+        (spec_dir / 'billing' / 'petstore.yaml').write_text(f.read())
+    (spec_dir / 'notes.txt').write_text('not a spec')
+    output = tmp_path / 'out'
+
+    monkeypatch.setattr(sys, 'argv', ['batch_generate.py', str(spec_dir), '--output', str(output)])
+    assert batch_generate.main() == 0
+    assert (output / 'billing' / 'petstore_Tests.java').read_text().count('@Test') > 0
+    summary = json.loads((output / 'batch_summary.json').read_text())
+    assert summary['totals']['generated'] == 1
+
+    assert batch_generate.main() == 0
+    summary = json.loads((output / 'batch_summary.json').read_text())
+    assert (summary['totals']['generated'], summary['totals']['skipped']) == (0, 1)
+
+
+def test_specs_sharing_a_stem_get_separate_outputs(pipeline, tmp_path, monkeypatch):
+    spec_dir = tmp_path / 'specs'
+    spec_dir.mkdir()
+    with open(PETSTORE, encoding='utf-8') as f:
+        (spec_dir / 'api.yaml').write_text(f.read())
+    (spec_dir / 'api.json').write_text(json.dumps({
+        'openapi': '3.0.0',
+        'info': {'title': 'Orders', 'version': '1.0'},
+        'paths': {'/orders': {'get': {'responses': {'200': {'description': 'OK'}}}}}
+    }))
+    output = tmp_path / 'out'
+
+    monkeypatch.setattr(sys, 'argv', ['batch_generate.py', str(spec_dir), '--output', str(output)])
+    assert batch_generate.main() == 0
+    assert '/orders' in (output / 'api_json_Tests.java').read_text()
+    assert '/orders' not in (output / 'api_yaml_Tests.java').read_text()
+    assert not (output / 'api_Tests.java').exists()
+
+    assert batch_generate.main() == 0
+    summary = json.loads((output / 'batch_summary.json').read_text())
+    assert summary['totals']['skipped'] == 2
+
+
+def test_output_paths_mirror_specs_and_never_collide():
+    paths = batch_generate.output_paths_for('out', ['a/api.yaml', 'api.json', 'api.yaml', 'api_yaml.json'])
+    assert paths['a/api.yaml'] == os.path.join('out', 'a/api_Tests.java')
+    assert len({path.lower() for path in paths.values()}) == 4
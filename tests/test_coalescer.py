@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+import coalescer
+from coalescer import RequestCoalescer
+from result_cache import ResultCache
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Condition not reached")
+        time.sleep(0.005)
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+
+    def call(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_identical_concurrent_requests_share_one_call():
+    requests = RequestCoalescer()
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        release.wait()
+        return 'code'
+
+    threads, results = run_concurrently(5, lambda: requests.run('key', generate))
+    wait_until(lambda: requests.stats()['coalesced'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ['code'] * 5
+    assert requests.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 4, 'coalesced_across_workers': 0}
+
+
+def test_leader_failure_is_raised_to_every_follower():
+    requests = RequestCoalescer()
+    release = threading.Event()
+
+    def generate():
+        release.wait()
+        raise RuntimeError('upstream failed')
+
+    threads, results = run_concurrently(3, lambda: requests.run('key', generate))
+    wait_until(lambda: requests.stats()['coalesced'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(result, RuntimeError) and str(result) == 'upstream failed' for result in results)
+    # The failure is not remembered: the next request calls again
+    assert requests.run('key', lambda: 'retried') == 'retried'
+
+
+def test_different_keys_are_not_coalesced():
+    requests = RequestCoalescer()
+    assert requests.run('a', lambda: 'a') == 'a'
+    assert requests.run('b', lambda: 'b') == 'b'
+    assert requests.stats()['leaders'] == 2
+
+
+def generate_in_worker(lock_dir, cache_path, calls_path, barrier):
+    """One gunicorn worker handling the request, as generation.generate_cached does."""
+    requests = RequestCoalescer(lock_dir=lock_dir)
+    cache = ResultCache(cache_path)
+    barrier.wait()
+    with requests.worker_lock('key'):
+        if cache.get('key') is None:
+            with open(calls_path, 'a') as f:
+                f.write('call\n')
+            time.sleep(0.2)
+            cache.put('key', 'code')
+
+
+@pytest.mark.skipif(coalescer.fcntl is None, reason='flock is unavailable')
+def test_worker_lock_serializes_generations_across_processes(tmp_path):
+    context = multiprocessing.get_context('fork')
+    calls_path = tmp_path / 'calls'
+    barrier = context.Barrier(3)
+    workers = [
+        context.Process(target=generate_in_worker, args=(
+            str(tmp_path / 'locks'), str(tmp_path / 'results.sqlite3'), str(calls_path), barrier
+        ))
+        for _ in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+        assert worker.exitcode == 0
+    assert calls_path.read_text() == 'call\n'
+
+
+@pytest.mark.skipif(coalescer.fcntl is None, reason='flock is unavailable')
+def test_idle_lock_files_are_pruned(tmp_path):
+    requests = RequestCoalescer(lock_dir=str(tmp_path))
+    with requests.worker_lock('old'):
+        pass
+    old = time.time() - RequestCoalescer.LOCK_FILE_TTL - 1
+    os.utime(tmp_path / 'old.lock', (old, old))
+    requests._last_prune = 0
+    with requests.worker_lock('new'):
+        pass
+    assert os.listdir(tmp_path) == ['new.lock']
+
+
+def test_pipeline_coalesces_identical_generations(pipeline, monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def generate_test_cases(prompt, priority, max_new_tokens):
+        calls.append(prompt)
+        release.wait()
+        return 'class PetsApiTest {}'
+
+    monkeypatch.setattr(pipeline.granite_client, 'generate_test_cases', generate_test_cases)
+    api_info = {'title': 'Pets', 'endpoints': []}
+    coalesced = pipeline.coalescer.stats()['coalesced']
+    threads, results = run_concurrently(4, lambda: pipeline.generate_cached(api_info, 'coalesced prompt'))
+    wait_until(lambda: pipeline.coalescer.stats()['coalesced'] == coalesced + 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ['coalesced prompt']
+    assert results == ['class PetsApiTest {}'] * 4
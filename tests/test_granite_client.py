@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fake_watsonx import generated_test_class
+
+
+def token_calls(server):
+    return server.snapshot().get('token', 0)
+
+
+def test_concurrent_callers_share_one_token_refresh(make_client, watsonx_server):
+    client = make_client()
+    before = token_calls(watsonx_server)
+    start = threading.Barrier(8)
+    tokens = []
+
+    def call():
+        start.wait()
+        tokens.append(client.get_access_token())
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(tokens)) == 1 and len(tokens) == 8
+    assert token_calls(watsonx_server) - before == 1
+
+
+def test_expired_token_is_refreshed_once(make_client, watsonx_server):
+    client = make_client()
+    first = client.get_access_token()
+    client.token_expires_at = time.time() - 1
+    before = token_calls(watsonx_server)
+    assert client.get_access_token() and client.get_access_token()
+    assert token_calls(watsonx_server) - before == 1
+    assert client.token_status()['valid'] and first
+
+
+def test_short_lived_tokens_stay_valid_for_half_their_lifetime(make_client, watsonx_config):
+    watsonx_config.token_ttl = 60
+    client = make_client()
+    client.get_access_token()
+    assert 29 <= client.token_expires_at - time.time() <= 30
+
+
+def test_refresher_renews_the_token_before_it_expires(make_client, watsonx_server):
+    client = make_client(
+        GRANITE_TOKEN_BACKGROUND_REFRESH='true',
+        GRANITE_TOKEN_REFRESH_AHEAD='3299.8',
+        GRANITE_TOKEN_REFRESH_MIN_INTERVAL='0.05'
+    )
+    client.get_access_token()
+    before = token_calls(watsonx_server)
+    time.sleep(0.5)
+    assert token_calls(watsonx_server) - before >= 1
+    assert client.token_status()['valid']
+    client.stop_token_refresher()
+    assert client._refresher is None
+
+
+def test_refresher_waits_at_least_the_minimum_interval(make_client, watsonx_server, watsonx_config):
+    watsonx_config.token_ttl = 1
+    client = make_client(
+        GRANITE_TOKEN_BACKGROUND_REFRESH='true',
+        GRANITE_TOKEN_REFRESH_MIN_INTERVAL='0.2'
+    )
+    client.get_access_token()
+    before = token_calls(watsonx_server)
+    time.sleep(1)
+    client.stop_token_refresher()
+    assert 1 <= token_calls(watsonx_server) - before <= 6
+
+
+def test_refresher_retries_failed_renewals_after_the_retry_interval(make_client):
+    client = make_client(
+        GRANITE_TOKEN_REFRESH_RETRY='0.2',
+        GRANITE_TOKEN_REFRESH_MIN_INTERVAL='0'
+    )
+    client.get_access_token()
+    attempts = []
+
+    def failing_refresh():
+        attempts.append(time.monotonic())
+        raise Exception('Failed to get access token: IAM unavailable')
+
+    client._refresh_access_token = failing_refresh
+    client.token_expires_at = time.time()
+    client.start_token_refresher()
+    time.sleep(0.5)
+    client.stop_token_refresher()
+    assert 2 <= len(attempts) <= 4
+    assert all(later - earlier >= 0.15 for earlier, later in zip(attempts, attempts[1:]))
+
+
+PROMPT = 'Write JUnit tests as public class OrdersTests for:\n- GET /orders\n- POST /orders\n'
+MODES = ['blocking', 'stream', 'async', 'async-stream']
+
+
+def generate(make_client, watsonx_server, mode, max_new_tokens, **env):
+    """Generate PROMPT in the given mode; returns the text, the client's stats and the upstream calls made."""
+    from async_granite_client import AsyncGraniteClient
+    client = make_client(**env)
+    counter = 'stream' if mode.endswith('stream') else 'generation'
+    before = watsonx_server.snapshot()[counter]
+
+    if mode == 'blocking':
+        text = client.generate_test_cases(PROMPT, max_new_tokens=max_new_tokens)
+    elif mode == 'stream':
+        text = ''.join(client.generate_test_cases_stream(PROMPT, max_new_tokens=max_new_tokens))
+    else:
+        client = AsyncGraniteClient()
+
+        async def run():
+            try:
+                if mode == 'async':
+                    return await client.generate_test_cases(PROMPT, max_new_tokens=max_new_tokens)
+                return ''.join([chunk async for chunk in client.generate_test_cases_stream(
+                    PROMPT, max_new_tokens=max_new_tokens
+                )])
+            finally:
+                await client.aclose()
+
+        text = asyncio.run(run())
+    return text, client.resilience_stats(), watsonx_server.snapshot()[counter] - before
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_truncated_class_is_completed_by_continuations(make_client, watsonx_server, mode):
+    full = generated_test_class(PROMPT)
+    assert 320 < len(full) <= 480
+
+    text, stats, calls = generate(make_client, watsonx_server, mode, max_new_tokens=40)
+    assert text == full
+    assert calls == 3
+    assert (stats['continuations'], stats['truncated']) == (2, 0)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_continuations_stop_at_max_continuations(make_client, watsonx_server, mode):
+    text, stats, calls = generate(make_client, watsonx_server, mode, max_new_tokens=40, GRANITE_MAX_CONTINUATIONS='1')
+    assert text == generated_test_class(PROMPT)[:320]
+    assert calls == 2
+    assert (stats['continuations'], stats['truncated']) == (1, 1)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_continuations_stop_at_max_total_new_tokens(make_client, watsonx_server, mode):
+    text, stats, calls = generate(
+        make_client, watsonx_server, mode, max_new_tokens=40, GRANITE_MAX_TOTAL_NEW_TOKENS='60'
+    )
+    # The second call only gets the 20 tokens left of the total
+    assert text == generated_test_class(PROMPT)[:240]
+    assert calls == 2
+    assert (stats['continuations'], stats['truncated']) == (1, 1)
+
+
+def test_complete_output_needs_no_continuation(make_client, watsonx_server):
+    text, stats, calls = generate(make_client, watsonx_server, 'blocking', max_new_tokens=1000)
+    assert text.rstrip().endswith('```') and calls == 1
+    assert (stats['continuations'], stats['truncated']) == (0, 0)
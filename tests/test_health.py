@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from health import CachedCheck
+
+
+class CountingCheck:
+    def __init__(self, result=None, error=None, delay=0):
+        self.result = result if result is not None else {'ok': True}
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return dict(self.result)
+
+
+def test_result_is_reused_until_ttl(monkeypatch):
+    check = CountingCheck()
+    cached = CachedCheck(check, ttl=15)
+    assert cached.get()[0] == {'ok': True}
+    assert cached.get()[0] == {'ok': True}
+    assert check.calls == 1
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 10)
+    assert cached.get() == ({'ok': True}, 10.0)
+    monkeypatch.setattr(time, 'time', lambda: now + 16)
+    cached.get()
+    assert check.calls == 2 and cached.runs == 2
+
+
+def test_failures_are_cached_too():
+    check = CountingCheck(error=RuntimeError('IAM unreachable'))
+    cached = CachedCheck(check, ttl=15)
+    assert cached.get()[0] == {'ok': False, 'error': 'IAM unreachable'}
+    assert cached.get()[0]['ok'] is False
+    assert check.calls == 1
+
+
+def test_concurrent_callers_share_one_run():
+    check = CountingCheck(delay=0.2)
+    cached = CachedCheck(check, ttl=15)
+    threads = [threading.Thread(target=cached.get) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert check.calls == 1
+
+
+@pytest.fixture
+def probes(app_module, monkeypatch):
+    """Fresh probe caches, so results cached by earlier tests do not leak in."""
+    monkeypatch.setattr(app_module, 'readiness', CachedCheck(app_module.readiness_check, ttl=15))
+    monkeypatch.setattr(app_module, 'deep_health', CachedCheck(app_module.deep_health_check, ttl=300))
+    return app_module
+
+
+def test_health_never_calls_upstream(client, watsonx_server):
+    before = watsonx_server.snapshot()
+    response = client.get('/health')
+    assert response.status_code == 200 and response.get_json() == {'status': 'alive'}
+    assert watsonx_server.snapshot() == before
+
+
+def test_ready_checks_token_and_endpoint_without_generating(client, probes, watsonx_server):
+    before = watsonx_server.snapshot()
+    response = client.get('/ready')
+    body = response.get_json()
+    assert response.status_code == 200 and body['status'] == 'ready'
+    assert body['checks']['iam_token']['ok'] and body['checks']['watsonx']['ok']
+    assert watsonx_server.snapshot()['generation'] == before['generation']
+
+    client.get('/ready')
+    assert probes.readiness.runs == 1
+
+
+def test_ready_answers_503_when_a_check_fails(client, probes, monkeypatch):
+    def unreachable(timeout=5):
+        raise ConnectionError('connection refused')
+
+    monkeypatch.setattr(probes.granite_client, 'ping', unreachable)
+    response = client.get('/ready')
+    body = response.get_json()
+    assert response.status_code == 503 and body['status'] == 'not_ready'
+    assert body['checks']['watsonx'] == {'ok': False, 'error': 'connection refused'}
+
+
+def test_deep_health_generates_at_most_once_per_interval(client, probes, watsonx_server):
+    before = watsonx_server.snapshot()['generation']
+    first = client.get('/health/deep')
+    second = client.get('/health/deep')
+    assert first.status_code == second.status_code == 200
+    assert first.get_json()['status'] == 'healthy'
+    assert watsonx_server.snapshot()['generation'] == before + 1
+
+
+def test_deep_health_failure_is_500_and_cached(client, probes, monkeypatch):
+    calls = []
+
+    def failing(prompt, priority):
+        calls.append(prompt)
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(probes.granite_client, 'generate_test_cases', failing)
+    for _ in range(2):
+        response = client.get('/health/deep')
+        assert response.status_code == 500
+        assert response.get_json()['status'] == 'unhealthy'
+    assert len(calls) == 1
+
+
+def test_deep_health_can_be_disabled(client, probes, monkeypatch):
+    monkeypatch.setitem(probes.app.config, 'DEEP_HEALTH_ENABLED', False)
+    assert client.get('/health/deep').status_code == 404
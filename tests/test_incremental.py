@@ -0,0 +1,161 @@
+import copy
+import json
+import os
+import time
+
+import pytest
+
+from fake_watsonx import generated_test_class
+from incremental import IncrementalStore, diff_specs, endpoint_fingerprints
+from spec_parser import SpecParser
+
+PET = {'type': 'object', 'properties': {'name': {'type': 'string'}}}
+SPEC = {
+    'openapi': '3.0.0',
+    'info': {'title': 'Pets', 'version': '1.0'},
+    'paths': {
+        '/pets': {
+            'get': {'responses': {'200': {'description': 'OK', 'content': {
+                'application/json': {'schema': {'type': 'array', 'items': {'$ref': '#/components/schemas/Pet'}}}
+            }}}},
+            'post': {
+                'requestBody': {'content': {'application/json': {'schema': {'$ref': '#/components/schemas/Pet'}}}},
+                'responses': {'201': {'description': 'Created'}}
+            }
+        },
+        '/owners': {'get': {'responses': {'200': {'description': 'OK'}}}}
+    },
+    'components': {'schemas': {'Pet': PET}}
+}
+
+
+def parse(spec):
+    return SpecParser.parse_openapi_spec(json.dumps(spec), 'json')
+
+
+def changed_spec():
+    """Pet gains a field, POST /pets is removed and DELETE /owners/{id} is added."""
+    spec = copy.deepcopy(SPEC)
+    spec['components']['schemas']['Pet']['properties']['age'] = {'type': 'integer'}
+    del spec['paths']['/pets']['post']
+    spec['paths']['/owners/{id}'] = {'delete': {'responses': {'204': {'description': 'Deleted'}}}}
+    return spec
+
+
+def state_for(api_info, code='class T {}'):
+    return {
+        'api_info': api_info,
+        'endpoints': {
+            key: {'fingerprint': fingerprint, 'name': key, 'code': code}
+            for key, fingerprint in endpoint_fingerprints(api_info).items()
+        }
+    }
+
+
+def test_fingerprints_are_stable_and_follow_referenced_schemas():
+    api_info = parse(SPEC)
+    fingerprints = endpoint_fingerprints(api_info)
+    assert fingerprints == endpoint_fingerprints(parse(SPEC))
+
+    spec = copy.deepcopy(SPEC)
+    spec['components']['schemas']['Pet']['properties']['age'] = {'type': 'integer'}
+    changed = endpoint_fingerprints(parse(spec))
+    assert changed['GET /pets'] != fingerprints['GET /pets']
+    assert changed['POST /pets'] != fingerprints['POST /pets']
+    assert changed['GET /owners'] == fingerprints['GET /owners']
+
+
+def test_diff_classifies_operations_and_schemas():
+    previous = state_for(parse(SPEC))
+    api_info = parse(changed_spec())
+    diff = diff_specs(previous, api_info, endpoint_fingerprints(api_info))
+    assert diff['added'] == ['DELETE /owners/{id}']
+    assert diff['changed'] == ['GET /pets']
+    assert diff['removed'] == ['POST /pets']
+    assert diff['unchanged'] == ['GET /owners']
+    assert diff['schemas_changed'] == ['Pet']
+    assert diff['schemas_added'] == diff['schemas_removed'] == []
+
+
+def test_diff_without_previous_state_adds_everything_and_regenerates_missing_code():
+    api_info = parse(SPEC)
+    fingerprints = endpoint_fingerprints(api_info)
+    assert diff_specs(None, api_info, fingerprints)['added'] == list(fingerprints)
+
+    previous = state_for(api_info)
+    previous['endpoints']['GET /owners']['code'] = ''
+    diff = diff_specs(previous, api_info, fingerprints)
+    assert diff['changed'] == ['GET /owners']
+    assert diff['unchanged'] == ['GET /pets', 'POST /pets']
+
+
+def test_store_round_trip_expiry_and_key_validation(tmp_path):
+    store = IncrementalStore(str(tmp_path), ttl=60)
+    api_info = parse(SPEC)
+    state = state_for(api_info)
+    store.save('client-key_1', api_info, state['endpoints'])
+    assert store.load('client-key_1') == state
+    assert store.load('other-key') is None
+
+    path = store._path('client-key_1')
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert store.load('client-key_1') is None
+    with pytest.raises(ValueError):
+        store.load('../escape')
+
+
+@pytest.fixture
+def stub_model(pipeline, monkeypatch):
+    """Generated classes carry the number of the generation round that produced them."""
+    prompts = []
+    round_number = [1]
+
+    def generate_test_cases(prompt, priority, max_new_tokens):
+        prompts.append(prompt)
+        return generated_test_class(prompt).replace('assertEquals(200, 200);', f'// round {round_number[0]}')
+
+    monkeypatch.setattr(pipeline.granite_client, 'generate_test_cases', generate_test_cases)
+    return prompts, round_number
+
+
+def test_only_changed_operations_are_regenerated_and_spliced(pipeline, stub_model):
+    prompts, round_number = stub_model
+    key = IncrementalStore.new_key()
+
+    first, diff = pipeline.generate_incremental(parse(SPEC), key)
+    assert sorted(diff['added']) == ['GET /owners', 'GET /pets', 'POST /pets']
+    assert len(prompts) == 3
+    kept_code = pipeline.incremental_store.load(key)['endpoints']['GET /owners']['code']
+
+    round_number[0] = 2
+    second, diff = pipeline.generate_incremental(parse(changed_spec()), key)
+    assert (diff['added'], diff['changed'], diff['removed'], diff['unchanged']) == (
+        ['DELETE /owners/{id}'], ['GET /pets'], ['POST /pets'], ['GET /owners']
+    )
+    # One prompt per stale operation, each holding only that operation
+    regenerated = prompts[3:]
+    assert len(regenerated) == 2
+    assert any('- GET /pets' in prompt and '/owners' not in prompt for prompt in regenerated)
+    assert any('- DELETE /owners/{id}' in prompt and '- GET /pets' not in prompt for prompt in regenerated)
+
+    state = pipeline.incremental_store.load(key)['endpoints']
+    assert sorted(state) == ['DELETE /owners/{id}', 'GET /owners', 'GET /pets']
+    assert state['GET /owners']['code'] == kept_code
+    assert '// round 2' in state['GET /pets']['code']
+
+    # The merged class keeps the stored test of the unchanged operation and drops the removed one
+    assert second.count('@Nested') == 3
+    assert '// GET /owners' in second and '// round 1' in second
+    assert '// POST /pets' not in second
+    assert second.count('// round 2') == 2
+
+
+def test_unchanged_spec_makes_no_model_call(pipeline, stub_model):
+    prompts, _ = stub_model
+    key = IncrementalStore.new_key()
+    first, _ = pipeline.generate_incremental(parse(SPEC), key)
+    second, diff = pipeline.generate_incremental(parse(SPEC), key)
+    assert len(prompts) == 3
+    assert diff['added'] == diff['changed'] == diff['removed'] == []
+    assert second == first
@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, QueueFullError
+
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = queue.get(job_id)
+        if state and state['status'] in ('succeeded', 'failed'):
+            return state
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_job_result_and_failure(tmp_path):
+    queue = JobQueue(max_workers=2, state_dir=str(tmp_path))
+    ok = queue.submit(lambda x: x * 2, 21)
+    bad = queue.submit(lambda: 1 / 0)
+    assert wait_for(queue, ok.id)['result'] == 42
+    failed = wait_for(queue, bad.id)
+    assert failed['status'] == 'failed' and 'division by zero' in failed['error']
+    queue.shutdown()
+
+
+def test_queue_full():
+    release = threading.Event()
+    queue = JobQueue(max_workers=1, max_pending=1)
+    queue.submit(release.wait)
+    queue.submit(release.wait)
+    with pytest.raises(QueueFullError):
+        queue.submit(release.wait)
+    release.set()
+    queue.shutdown()
+
+
+def test_other_processes_read_persisted_state(tmp_path):
+    queue = JobQueue(state_dir=str(tmp_path))
+    job = queue.submit(lambda: 'done')
+    wait_for(queue, job.id)
+    assert JobQueue(state_dir=str(tmp_path)).get(job.id)['result'] == 'done'
+    queue.shutdown()
+
+
+def test_expired_persisted_results_are_not_loaded(tmp_path):
+    path = tmp_path / ('a' * 32 + '.json')
+    finished_at = time.time() - 7200
+    path.write_text(json.dumps({'job_id': 'a' * 32, 'status': 'succeeded', 'result': 1, 'finished_at': finished_at}))
+    queue = JobQueue(result_ttl=3600, state_dir=str(tmp_path))
+    assert queue.get('a' * 32) is None
+    assert not os.path.exists(path)
+
+
+def test_expired_jobs_in_memory_are_not_returned(monkeypatch):
+    queue = JobQueue(result_ttl=60)
+    job = queue.submit(lambda: 'done')
+    wait_for(queue, job.id)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    assert queue.get(job.id) is None
+    queue.shutdown()
+
+
+def test_prune_keeps_state_of_jobs_still_queued_or_running(tmp_path):
+    old = time.time() - 7200
+    states = {
+        'a' * 32: {'status': 'running', 'created_at': old, 'started_at': old, 'finished_at': None},
+        'b' * 32: {'status': 'queued', 'created_at': old, 'started_at': None, 'finished_at': None},
+        'c' * 32: {'status': 'succeeded', 'created_at': old, 'finished_at': old, 'result': 1},
+        'd' * 32: {'status': 'failed', 'created_at': old, 'finished_at': time.time(), 'error': 'x'}
+    }
+    for job_id, state in states.items():
+        path = tmp_path / f"{job_id}.json"
+        path.write_text(json.dumps(dict(state, job_id=job_id)))
+        os.utime(path, (old, old))
+    stale_tmp = tmp_path / ('e' * 32 + '.json.1.2.tmp')
+    stale_tmp.write_text('{')
+    os.utime(stale_tmp, (old, old))
+
+    queue = JobQueue(result_ttl=3600, state_dir=str(tmp_path))
+    queue._prune()
+    assert sorted(os.listdir(tmp_path)) == sorted(f"{c * 32}.json" for c in 'abd')
+    assert queue.get('a' * 32)['status'] == 'running'
+    queue.shutdown()
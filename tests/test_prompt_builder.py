@@ -0,0 +1,102 @@
+from prompt_builder import (
+    COMPACTION_STEPS, PromptBuilder, build_test_generation_prompt, parameter_definition, schema_type
+)
+from rate_limiter import estimate_tokens
+
+
+def make_api_info(num_endpoints=40, num_schemas=20):
+    endpoints = []
+    for i in range(num_endpoints):
+        endpoints.append({
+            'path': f'/items{i}/{{itemId}}',
+            'method': 'GET',
+            'summary': f'Fetch item collection {i} with a fairly long human readable summary',
+            'tags': ['items'],
+            'parameters': [
+                {'name': 'itemId', 'in': 'path', 'required': True, 'schema': {'type': 'integer'}},
+                {'name': 'limit', 'in': 'query', 'schema': {'type': 'integer'}}
+            ],
+            'request_body': {},
+            'responses': {'200': None, '404': None},
+            'schema_refs': [f'Item{i % num_schemas}']
+        })
+    schemas = {
+        f'Item{i}': {'type': 'object', 'properties': {'id': {'type': 'integer'}, 'name': {'type': 'string'}}}
+        for i in range(num_schemas)
+    }
+    schemas['Unused'] = {'type': 'object', 'properties': {'flag': {'type': 'boolean'}}}
+    return {
+        'title': 'Item API',
+        'version': '1.0',
+        'description': 'An API with items ' * 20,
+        'base_url': 'https://example.com',
+        'endpoints': endpoints,
+        'schemas': schemas
+    }
+
+
+def test_schema_type_labels():
+    assert schema_type({'$ref': '#/components/schemas/Pet'}) == 'Pet'
+    assert schema_type({'type': 'array', 'items': {'$ref': '#/components/schemas/Pet'}}) == 'array<Pet>'
+    assert schema_type({}) == 'unknown'
+    assert parameter_definition({'name': 'petId', 'in': 'path', 'required': True, 'schema': {'type': 'integer'}}) \
+        == 'petId (path, integer, required)'
+
+
+def test_no_budget_renders_full_detail():
+    api_info = make_api_info()
+    build = build_test_generation_prompt(api_info)
+    assert build.fits
+    assert not build.compacted
+    assert 'Summary: Fetch item collection 0' in build.text
+    assert 'id: integer' in build.text
+    assert 'Unused' in build.text
+
+
+def test_generous_budget_applies_no_compaction():
+    api_info = make_api_info()
+    full = build_test_generation_prompt(api_info)
+    build = build_test_generation_prompt(api_info, max_tokens=full.estimated_tokens)
+    assert build.text == full.text
+    assert build.compactions == []
+    assert build.report()['fits'] is True
+
+
+def test_compaction_stops_at_the_first_step_that_fits():
+    api_info = make_api_info()
+    full = build_test_generation_prompt(api_info)
+    build = build_test_generation_prompt(api_info, max_tokens=full.estimated_tokens - 1)
+    assert build.compactions == ['descriptions']
+    assert build.fits
+    assert 'Summary:' not in build.text
+    assert build.dropped['descriptions'] == len(api_info['endpoints']) + 1
+
+
+def test_each_step_shrinks_the_prompt():
+    builder = PromptBuilder(make_api_info())
+    sizes = [estimate_tokens(builder.render(list(COMPACTION_STEPS[:count]))) for count in range(len(COMPACTION_STEPS) + 1)]
+    assert all(smaller < larger for larger, smaller in zip(sizes, sizes[1:]))
+    # A budget that can never be met applies every step, in order
+    assert builder.build(max_tokens=1).compactions == list(COMPACTION_STEPS)
+
+
+def test_every_endpoint_is_kept_when_the_budget_cannot_be_met():
+    api_info = make_api_info()
+    build = build_test_generation_prompt(api_info, max_tokens=100)
+    assert not build.fits
+    assert build.report()['fits'] is False
+    for endpoint in api_info['endpoints']:
+        assert f"- GET {endpoint['path']}" in build.text
+    assert 'endpoints' not in build.dropped
+
+
+def test_full_compaction_reports_what_was_dropped():
+    api_info = make_api_info()
+    build = build_test_generation_prompt(api_info, max_tokens=1)
+    assert build.dropped['repeated_parameter_definitions'] == 2
+    assert build.dropped['schemas'] == ['Unused']
+    assert build.dropped['schema_property_types'] is True
+    assert build.dropped['schema_properties'] is True
+    assert 'Common Parameters' in build.text
+    assert 'itemId (path, integer, required)' in build.text
+    assert 'Unused' not in build.text
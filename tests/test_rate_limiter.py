@@ -0,0 +1,117 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from rate_limiter import BATCH, INTERACTIVE, RateLimitExceeded, TokenBucketLimiter, estimate_tokens
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens('abcd') == 1
+    assert estimate_tokens('abcde') == 2
+
+
+def test_disabled_limiter_never_blocks():
+    limiter = TokenBucketLimiter()
+    assert not limiter.enabled
+    for _ in range(100):
+        limiter.acquire(10 ** 9)
+    assert limiter.stats()['acquired'] == 0
+
+
+def test_requests_bucket_rejects_beyond_capacity():
+    limiter = TokenBucketLimiter(requests_per_second=2, max_wait=0)
+    limiter.acquire(0)
+    limiter.acquire(0)
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        limiter.acquire(0)
+    assert excinfo.value.retry_after > 0
+    stats = limiter.stats()
+    assert stats['acquired'] == 2
+    assert stats['rejected'] == 1
+
+
+def test_tokens_bucket_charges_estimated_tokens():
+    limiter = TokenBucketLimiter(tokens_per_minute=1000, max_wait=0)
+    limiter.acquire(600)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(600)
+    limiter.acquire(300)
+
+
+def test_oversized_request_is_capped_at_a_full_bucket():
+    limiter = TokenBucketLimiter(tokens_per_minute=1000, max_wait=0)
+    limiter.acquire(5000)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(1)
+
+
+def test_batch_requests_leave_the_reserve_for_interactive():
+    limiter = TokenBucketLimiter(tokens_per_minute=1000, batch_reserve=0.25, max_wait=0)
+    limiter.acquire(700, priority=BATCH)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(100, priority=BATCH)
+    limiter.acquire(250, priority=INTERACTIVE)
+
+
+def test_acquire_waits_for_refill():
+    limiter = TokenBucketLimiter(requests_per_second=20, max_wait=5)
+    for _ in range(20):
+        limiter.acquire(0)
+    limiter.acquire(0)
+    stats = limiter.stats()
+    assert stats['acquired'] == 21
+    assert stats['waited'] == 1
+    assert 0 < stats['wait_seconds'] < 1
+
+
+def test_acquire_async_waits_for_refill():
+    limiter = TokenBucketLimiter(requests_per_second=20, max_wait=5)
+
+    async def run():
+        for _ in range(21):
+            await limiter.acquire_async(0)
+
+    asyncio.run(run())
+    assert limiter.stats()['waited'] == 1
+
+
+def test_sqlite_state_is_shared_between_limiters(tmp_path):
+    path = str(tmp_path / 'limits' / 'buckets.db')
+    first = TokenBucketLimiter(requests_per_second=2, max_wait=0, state_path=path)
+    second = TokenBucketLimiter(requests_per_second=2, max_wait=0, state_path=path)
+    first.acquire(0)
+    second.acquire(0)
+    with pytest.raises(RateLimitExceeded):
+        first.acquire(0)
+
+
+def test_acquire_async_keeps_sqlite_lock_waits_off_the_event_loop(tmp_path):
+    path = str(tmp_path / 'buckets.db')
+    limiter = TokenBucketLimiter(requests_per_second=10, max_wait=5, state_path=path)
+    # Another process holding the write lock
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        acquire = asyncio.create_task(limiter.acquire_async(0))
+        await asyncio.sleep(0.3)
+        holder.execute("COMMIT")
+        await acquire
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+    assert limiter.stats()['acquired'] == 1
+    holder.close()
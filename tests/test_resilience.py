@@ -0,0 +1,261 @@
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, RetryBudget, RetryPolicy, parse_retry_after
+
+
+def open_breaker(threshold=2, reset_timeout=0.0):
+    breaker = CircuitBreaker(failure_threshold=threshold, reset_timeout=reset_timeout)
+    for _ in range(threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(later) <= 30
+
+
+def test_retry_policy_backoff_is_capped_and_honors_retry_after():
+    policy = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=4.0)
+    for attempt in range(1, 6):
+        assert 0 <= policy.delay(attempt) <= min(4.0, 2 ** (attempt - 1))
+    assert policy.delay(1, retry_after=3.0) == 3.0
+    assert policy.delay(1, retry_after=10.0) is None
+
+
+def test_retry_budget_allows_min_retries_then_refills_per_call():
+    budget = RetryBudget(ratio=0.5, min_retries=2)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_call()
+    budget.record_call()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = open_breaker(threshold=2, reset_timeout=60)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = open_breaker(reset_timeout=0.0)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_trial_success_closes_and_failure_reopens():
+    breaker = open_breaker(reset_timeout=0.0)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.stats()['state'] == CircuitBreaker.CLOSED
+    assert breaker.stats()['consecutive_failures'] == 0
+
+    breaker = open_breaker(reset_timeout=0.0)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()['opens'] == 2
+
+
+def test_release_trial_frees_the_slot_without_closing():
+    breaker = open_breaker(reset_timeout=0.0)
+    breaker.before_call()
+    breaker.release_trial()
+    stats = breaker.stats()
+    assert stats['state'] == CircuitBreaker.HALF_OPEN
+    assert stats['consecutive_failures'] == 2
+    # The next call can take the trial again
+    breaker.before_call()
+
+
+def test_release_trial_keeps_failure_count_when_closed():
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.release_trial()
+    assert breaker.stats()['consecutive_failures'] == 1
+
+
+def test_reset_timeout_keeps_circuit_open_until_elapsed():
+    breaker = open_breaker(reset_timeout=0.2)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.25)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+
+def test_breaker_reports_openings_and_rejections_to_its_listener():
+    events = []
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60, listener=events.append)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert events == ['opened', 'rejected']
+
+@pytest.fixture
+def make_client(make_client):
+    """Clients whose breaker opens on the first failure and half-opens at once."""
+    return partial(make_client, GRANITE_BREAKER_FAILURE_THRESHOLD='1', GRANITE_BREAKER_RESET_TIMEOUT='0')
+
+
+def test_client_iam_failure_does_not_close_a_half_open_breaker(make_client, watsonx_server):
+    client = make_client(IBM_IAM_URL=watsonx_server.url + '/no-such-iam')
+    breaker = client.circuit_breaker
+    breaker.before_call()
+    breaker.record_failure()
+
+    with pytest.raises(Exception):
+        client.generate_test_cases('prompt')
+    stats = breaker.stats()
+    assert stats['state'] == CircuitBreaker.HALF_OPEN
+    assert stats['consecutive_failures'] == 1
+
+
+def test_client_rate_limit_rejection_keeps_failure_count(make_client, watsonx_config):
+    from rate_limiter import RateLimitExceeded
+    client = make_client(
+        GRANITE_BREAKER_FAILURE_THRESHOLD='5', GRANITE_RATE_LIMIT_RPS='1', GRANITE_RATE_LIMIT_MAX_WAIT='0'
+    )
+    watsonx_config.error_rate = 1.0
+    with pytest.raises(Exception):
+        client.generate_test_cases('prompt')
+    assert client.circuit_breaker.stats()['consecutive_failures'] == 1
+
+    with pytest.raises(RateLimitExceeded):
+        client.generate_test_cases('prompt')
+    assert client.circuit_breaker.stats()['consecutive_failures'] == 1
+
+
+def test_client_waiting_for_quota_does_not_hold_the_half_open_trial(make_client):
+    import threading
+    client = make_client(GRANITE_RATE_LIMIT_RPS='1', GRANITE_RATE_LIMIT_MAX_WAIT='5')
+    client.generate_test_cases('prompt')
+    breaker = client.circuit_breaker
+    breaker.before_call()
+    breaker.record_failure()
+
+    # This call has to wait about a second for the next request token
+    waiting = threading.Thread(target=client.generate_test_cases, args=('prompt',))
+    waiting.start()
+    time.sleep(0.2)
+    breaker.before_call()
+    breaker.release_trial()
+    waiting.join()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_logs_each_failed_attempt_with_a_truncated_body(make_client, watsonx_config, caplog):
+    import granite_client
+    client = make_client(GRANITE_RETRY_MAX_ATTEMPTS='2', GRANITE_BREAKER_FAILURE_THRESHOLD='5')
+    client.retry_policy.base_delay = 0
+    watsonx_config.error_rate = 1.0
+    with caplog.at_level('WARNING', logger='granite_client'), pytest.raises(Exception):
+        client.generate_test_cases('prompt')
+    messages = [record.getMessage() for record in caplog.records if record.name == 'granite_client']
+    assert [m.split(':')[0] for m in messages] == ['watsonx attempt 1 failed', 'watsonx attempt 2 failed']
+    assert messages[0].startswith('watsonx attempt 1 failed: HTTP 503')
+    assert all(len(m) < granite_client.LOGGED_BODY_CHARS + 100 for m in messages)
+
+
+def test_async_client_logs_each_failed_attempt(make_client, watsonx_config, caplog):
+    import asyncio
+    from async_granite_client import AsyncGraniteClient
+    make_client(GRANITE_RETRY_MAX_ATTEMPTS='2', GRANITE_BREAKER_FAILURE_THRESHOLD='5')
+    client = AsyncGraniteClient()
+    client.retry_policy.base_delay = 0
+    watsonx_config.error_rate = 1.0
+
+    async def run():
+        try:
+            await client.generate_test_cases('prompt')
+        finally:
+            await client.aclose()
+
+    with caplog.at_level('WARNING', logger='granite_client'), pytest.raises(Exception):
+        asyncio.run(run())
+    messages = [record.getMessage() for record in caplog.records if record.name == 'granite_client']
+    assert [m.split(':')[0] for m in messages] == ['watsonx attempt 1 failed', 'watsonx attempt 2 failed']
+
+
+def test_streamed_call_latency_covers_the_whole_body(make_client, watsonx_config, monkeypatch):
+    import asyncio
+    import metrics
+    from async_granite_client import AsyncGraniteClient
+    observed = []
+    monkeypatch.setattr(metrics, 'observe', lambda stage, seconds: observed.append((stage, seconds)))
+    # Headers come back at once; the body takes about 0.4s
+    watsonx_config.latency = 0.4
+    client = make_client()
+    assert ''.join(client.generate_test_cases_stream('prompt'))
+
+    async_client = AsyncGraniteClient()
+
+    async def run():
+        try:
+            return [chunk async for chunk in async_client.generate_test_cases_stream('prompt')]
+        finally:
+            await async_client.aclose()
+
+    assert asyncio.run(run())
+    assert [stage for stage, _ in observed] == ['watsonx_call', 'watsonx_call']
+    assert all(seconds >= 0.3 for _, seconds in observed)
+
+
+def test_client_exports_retry_and_breaker_counters(make_client, watsonx_config):
+    import metrics
+    from prometheus_client import REGISTRY
+
+    def sample(name, event):
+        return REGISTRY.get_sample_value(name, {'event': event}) or 0
+
+    upstream = ('calls', 'attempts', 'retries', 'retries_exhausted')
+    breaker = ('opened', 'rejected')
+    before = [sample('granite_upstream_events_total', event) for event in upstream]
+    before += [sample('granite_circuit_breaker_events_total', event) for event in breaker]
+
+    client = make_client(GRANITE_RETRY_MAX_ATTEMPTS='2', GRANITE_BREAKER_FAILURE_THRESHOLD='2',
+                         GRANITE_BREAKER_RESET_TIMEOUT='60')
+    client.retry_policy.base_delay = 0
+    watsonx_config.error_rate = 1.0
+    with pytest.raises(Exception):
+        client.generate_test_cases('prompt')
+    with pytest.raises(CircuitOpenError):
+        client.generate_test_cases('prompt')
+
+    after = [sample('granite_upstream_events_total', event) for event in upstream]
+    after += [sample('granite_circuit_breaker_events_total', event) for event in breaker]
+    assert [b - a for a, b in zip(before, after)] == [2, 2, 1, 1, 1, 1]
+    body, _ = metrics.render()
+    assert b'granite_upstream_events_total{event="budget_denied"}' in body
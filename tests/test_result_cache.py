@@ -0,0 +1,74 @@
+import time
+
+from result_cache import ResultCache
+
+API_INFO = {'title': 'Pets', 'endpoints': [{'method': 'GET', 'path': '/pets'}]}
+PARAMETERS = {'decoding_method': 'greedy', 'max_new_tokens': 1000}
+
+
+def key(**changes):
+    args = dict(api_info=API_INFO, prompt='prompt', model_id='granite', parameters=PARAMETERS)
+    args.update(changes)
+    return ResultCache.make_key(**args)
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite3'))
+    assert cache.get(key()) is None
+    cache.put(key(), 'class PetsTest {}')
+    assert cache.get(key()) == 'class PetsTest {}'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['stores'], stats['entries']) == (1, 1, 1, 1)
+
+
+def test_entries_are_shared_through_the_file(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    ResultCache(path).put(key(), 'code')
+    assert ResultCache(path).get(key()) == 'code'
+
+
+def test_key_depends_on_everything_that_shapes_the_output():
+    base = key()
+    assert key(model_id='granite-2') != base
+    assert key(parameters=dict(PARAMETERS, max_new_tokens=2000)) != base
+    assert key(parameters=dict(PARAMETERS, decoding_method='sample')) != base
+    assert key(prompt='other prompt') != base
+    assert key(api_info=dict(API_INFO, title='Dogs')) != base
+    # Normalized: dict order does not matter
+    assert key(parameters={'max_new_tokens': 1000, 'decoding_method': 'greedy'}) == base
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / 'results.sqlite3'), ttl=60)
+    cache.put(key(), 'code')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert cache.get(key()) is None
+    # Expired rows are deleted by the next store
+    cache.put(key(prompt='other'), 'other')
+    assert cache.stats()['entries'] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite3'), max_entries=2)
+    cache.put(key(prompt='a'), 'a')
+    time.sleep(0.01)
+    cache.put(key(prompt='b'), 'b')
+    time.sleep(0.01)
+    assert cache.get(key(prompt='a')) == 'a'
+    time.sleep(0.01)
+    cache.put(key(prompt='c'), 'c')
+    assert cache.get(key(prompt='b')) is None
+    assert cache.get(key(prompt='a')) == 'a'
+    assert cache.get(key(prompt='c')) == 'c'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_eviction_keeps_total_size_under_max_bytes(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite3'), max_bytes=2500)
+    for name in 'abc':
+        cache.put(key(prompt=name), name * 1000)
+        time.sleep(0.01)
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['bytes'] == 2000
+    assert cache.get(key(prompt='a')) is None
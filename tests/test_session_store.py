@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+import pytest
+
+import session_store
+from session_store import SessionNotFound, SessionStore
+
+API_INFO = {'title': 'Pets', 'endpoints': []}
+
+
+def age(store, session_id, seconds):
+    """Make a session file look `seconds` older."""
+    path = store._path(session_id)
+    mtime = os.stat(path).st_mtime - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_create_and_get(tmp_path):
+    store = SessionStore(str(tmp_path))
+    session = store.create(API_INFO, 'class A {}', 'A.java', prompt='Generate tests')
+    loaded = store.get(session['id'])
+    assert loaded['prompt'] == 'Generate tests'
+    assert SessionStore.current(loaded)['code'] == 'class A {}'
+    assert store.stats()['memory_hits'] == 1
+
+
+@pytest.mark.parametrize('session_id', ['../etc/passwd', 'f' * 31, None, 'a' * 32])
+def test_unknown_or_malformed_ids(tmp_path, session_id):
+    store = SessionStore(str(tmp_path))
+    with pytest.raises(SessionNotFound):
+        store.get(session_id)
+    with pytest.raises(SessionNotFound):
+        store.add_revision(session_id, 'code')
+
+
+def test_revisions_and_rollback_keep_history(tmp_path):
+    store = SessionStore(str(tmp_path))
+    session_id = store.create(API_INFO, 'v1', 'A.java')['id']
+    store.add_revision(session_id, 'v2', feedback='more tests')
+    session = store.rollback(session_id, 1)
+    assert [r['code'] for r in session['revisions']] == ['v1', 'v2', 'v1']
+    assert session['revisions'][1]['feedback'] == 'more tests'
+    assert SessionStore.current(session)['rolled_back_from'] == 1
+    with pytest.raises(ValueError):
+        store.rollback(session_id, 4)
+
+
+def test_set_prompt(tmp_path):
+    store = SessionStore(str(tmp_path))
+    session_id = store.create(API_INFO, 'v1', 'A.java')['id']
+    assert store.get(session_id)['prompt'] is None
+    store.set_prompt(session_id, 'base prompt')
+    assert store.get(session_id)['prompt'] == 'base prompt'
+
+
+def test_stores_sharing_a_folder_see_each_others_updates(tmp_path):
+    first = SessionStore(str(tmp_path))
+    second = SessionStore(str(tmp_path))
+    session_id = first.create(API_INFO, 'v1', 'A.java')['id']
+    assert len(second.get(session_id)['revisions']) == 1
+    first.add_revision(session_id, 'v2')
+    assert SessionStore.current(second.get(session_id))['code'] == 'v2'
+
+
+def test_concurrent_updates_are_serialized(tmp_path):
+    stores = [SessionStore(str(tmp_path)) for _ in range(4)]
+    session_id = stores[0].create(API_INFO, 'v0', 'A.java')['id']
+
+    def update(store, worker):
+        for i in range(5):
+            store.add_revision(session_id, f'{worker}-{i}')
+
+    threads = [threading.Thread(target=update, args=(store, n)) for n, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    revisions = stores[0].get(session_id, fresh=True)['revisions']
+    assert [r['revision'] for r in revisions] == list(range(1, 22))
+    assert len({r['code'] for r in revisions}) == 21
+
+
+def test_memory_cache_is_bounded(tmp_path):
+    store = SessionStore(str(tmp_path), memory_max_bytes=2000)
+    for _ in range(10):
+        store.create(API_INFO, 'x' * 500, 'A.java')
+    stats = store.stats()
+    assert 0 < stats['memory_sessions'] < 10
+    assert stats['memory_bytes'] <= 2000
+
+
+def test_expired_sessions_are_not_found(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path), ttl=60)
+    session_id = store.create(API_INFO, 'v1', 'A.java')['id']
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    with pytest.raises(SessionNotFound):
+        store.get(session_id)
+    assert store.stats()['memory_sessions'] == 0
+    with pytest.raises(SessionNotFound):
+        store.get(session_id, fresh=True)
+
+
+def test_prune_removes_expired_and_oldest_files(tmp_path):
+    store = SessionStore(str(tmp_path), ttl=3600)
+    expired = store.create(API_INFO, 'v1', 'A.java')['id']
+    store.add_revision(expired, 'v2')
+    age(store, expired, 7200)
+    oldest = store.create(API_INFO, 'x' * 1000, 'B.java')['id']
+    age(store, oldest, 60)
+    newest = store.create(API_INFO, 'x' * 1000, 'C.java')['id']
+
+    store.disk_max_bytes = os.path.getsize(store._path(newest)) + 100
+    store._last_prune = 0
+    store._prune()
+    assert not os.path.exists(store._path(expired))
+    assert not os.path.exists(store._lock_path(expired))
+    assert not os.path.exists(store._path(oldest))
+    assert os.path.exists(store._path(newest))
+    with pytest.raises(SessionNotFound):
+        store.get(oldest)
+
+
+@pytest.mark.skipif(session_store.fcntl is None, reason='flock is unavailable')
+def test_prune_skips_sessions_whose_lock_is_held(tmp_path):
+    store = SessionStore(str(tmp_path), ttl=3600)
+    session_id = store.create(API_INFO, 'v1', 'A.java')['id']
+    age(store, session_id, 7200)
+
+    # Another worker in the middle of an update
+    with open(store._lock_path(session_id), 'a') as lock_file:
+        session_store.fcntl.flock(lock_file, session_store.fcntl.LOCK_EX)
+        store._last_prune = 0
+        store._prune()
+        assert os.path.exists(store._path(session_id))
+        assert os.path.exists(store._lock_path(session_id))
+        session_store.fcntl.flock(lock_file, session_store.fcntl.LOCK_UN)
+
+    store._last_prune = 0
+    store._prune()
+    assert not os.path.exists(store._path(session_id))
+    assert not os.path.exists(store._lock_path(session_id))
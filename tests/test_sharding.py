@@ -0,0 +1,126 @@
+import pytest
+
+from sharding import endpoint_name, extract_java_code, java_code_complete, merge_test_classes, shard_endpoints
+
+PETS_CLASS = """```java
+package com.example.pets;
+
+import org.junit.jupiter.api.Test;
+import static org.junit.jupiter.api.Assertions.*;
+
+@SpringBootTest
+public class PetsApiTest {
+    @Test
+    void listPets() {
+        assertTrue(true);
+    }
+}
+```"""
+
+STORE_CLASS = """package com.example.store;
+
+import org.junit.jupiter.api.Test;
+import org.springframework.boot.test.context.SpringBootTest;
+
+@SpringBootTest
+class StoreApiTest {
+    @Test
+    void getInventory() {}
+}
+<end of code>"""
+
+
+def endpoint(method, path, tags=()):
+    return {'method': method, 'path': path, 'tags': list(tags)}
+
+
+def test_shards_group_by_tag_and_fall_back_to_path():
+    endpoints = [
+        endpoint('GET', '/pets', ['pet store']),
+        endpoint('POST', '/pets', ['pet store']),
+        endpoint('GET', '/orders/{id}'),
+        endpoint('GET', '/')
+    ]
+    shards = shard_endpoints(endpoints)
+    assert [(name, len(group)) for name, group in shards] == [('PetStore', 2), ('Orders', 1), ('Root', 1)]
+    by_path = shard_endpoints(endpoints, by='path')
+    assert [name for name, _ in by_path] == ['Pets', 'Orders', 'Root']
+
+
+def test_large_groups_are_split_with_unique_names():
+    endpoints = [endpoint('GET', f'/pets/{i}', ['pets']) for i in range(25)]
+    shards = shard_endpoints(endpoints, max_endpoints=10)
+    assert [(name, len(group)) for name, group in shards] == [('Pets', 10), ('Pets2', 10), ('Pets3', 5)]
+    assert sum((group for _, group in shards), []) == endpoints
+
+
+def test_endpoint_name_is_a_java_identifier():
+    assert endpoint_name(endpoint('GET', '/pets/{petId}')) == 'GetPetsPetId'
+    assert endpoint_name(endpoint('DELETE', '/v1/items')) == 'DeleteV1Items'
+
+
+def test_extract_java_code_strips_fences_and_stop_marker():
+    assert extract_java_code(PETS_CLASS).startswith('package com.example.pets;')
+    assert extract_java_code(STORE_CLASS).endswith('}')
+
+
+def test_merge_nests_shard_classes_in_one_file():
+    merged = merge_test_classes('PetstoreApiTest', [('Pets', PETS_CLASS), ('Store', STORE_CLASS)])
+    lines = merged.splitlines()
+    assert lines[0] == 'package com.example.pets;'
+    imports = [line for line in lines if line.startswith('import ')]
+    assert imports == sorted(set(imports))
+    assert 'import org.junit.jupiter.api.Nested;' in imports
+    assert merged.count('@SpringBootTest') == 1
+    assert lines[lines.index('@SpringBootTest') + 1] == 'public class PetstoreApiTest {'
+    assert '    @Nested\n    class PetsApiTest {' in merged
+    assert '    @Nested\n    class StoreApiTest {' in merged
+    assert merged.count('{') == merged.count('}')
+
+
+def test_merge_renames_duplicate_classes_and_keeps_shards_without_a_class():
+    merged = merge_test_classes('ApiTest', [
+        ('Pets', PETS_CLASS), ('Pets2', PETS_CLASS), ('Broken', 'Sorry, I cannot help with that.')
+    ])
+    assert 'class PetsApiTest {' in merged
+    assert 'class PetsApiTestPets2 {' in merged
+    assert '// Shard Broken did not contain a test class:' in merged
+    assert '    // Sorry, I cannot help with that.' in merged
+    assert 'package com.example.pets;' in merged
+
+
+def test_merge_uses_the_default_package():
+    merged = merge_test_classes('ApiTest', [('Store', 'class StoreTest {}')])
+    assert merged.startswith('package com.example.api.test;\n')
+
+
+def test_finished_class_is_complete():
+    assert java_code_complete(PETS_CLASS)
+    assert java_code_complete(STORE_CLASS)
+
+
+@pytest.mark.parametrize('code', [
+    'public class ApiTest {\n    @Test\n    void a() {\n',
+    'public class ApiTest {\n    String s = "unterminated\n}',
+    'public class ApiTest {\n    /* comment that never ends }',
+    'public class ApiTest {\n    String s = """\n        text block }',
+    'public class ApiTest {}\n}',
+    'void orphan() {}',
+    ''
+], ids=['open-brace', 'open-string', 'open-comment', 'open-text-block', 'extra-brace', 'no-class', 'empty'])
+def test_truncated_or_invalid_code_is_incomplete(code):
+    assert not java_code_complete(code)
+
+
+def test_braces_in_strings_and_comments_are_ignored():
+    code = """public class ApiTest {
+    // a stray } in a comment
+    /* and { here */
+    String open = "{";
+    char close = '}';
+    String escaped = "quote \\" {";
+    String block = \"\"\"
+        { "json": true
+        \"\"\";
+}"""
+    assert java_code_complete(code)
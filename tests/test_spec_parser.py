@@ -0,0 +1,164 @@
+import json
+
+import pytest
+import yaml
+
+from spec_parser import RefResolver, SpecParser
+
+
+def schema_ref(name):
+    return {'$ref': f'#/components/schemas/{name}'}
+
+
+SPEC = {
+    'openapi': '3.0.0',
+    'info': {'title': 'Pets', 'version': '1.0'},
+    'paths': {
+        '/pets/{petId}': {'$ref': '#/components/pathItems/Pet'},
+        '/owners': {
+            'get': {
+                'parameters': [{'$ref': '#/components/parameters/Limit'}],
+                'responses': {'200': {'$ref': '#/components/responses/Owners'}}
+            }
+        }
+    },
+    'components': {
+        'pathItems': {
+            'Pet': {'get': {'responses': {'200': {'$ref': '#/components/responses/Pet'}}}}
+        },
+        'parameters': {
+            'Limit': {'$ref': '#/components/parameters/PageSize'},
+            'PageSize': {'name': 'limit', 'in': 'query', 'schema': schema_ref('Size')}
+        },
+        'responses': {
+            'Pet': {'description': 'A pet', 'content': {'application/json': {'schema': schema_ref('Pet')}}},
+            'Owners': {'description': 'Owners', 'content': {'application/json': {'schema': schema_ref('Owner')}}}
+        },
+        'schemas': {
+            'Size': {'type': 'integer'},
+            'Pet': {'type': 'object', 'properties': {'owner': schema_ref('Owner'), 'tags': {'type': 'array', 'items': schema_ref('Tag')}}},
+            'Owner': {'type': 'object', 'properties': {'pets': {'type': 'array', 'items': schema_ref('Pet')}}},
+            'Tag': {'type': 'string'},
+            'Unused': {'type': 'string'}
+        }
+    }
+}
+
+
+def test_nested_refs_are_resolved_at_the_top_of_a_node_only():
+    resolver = RefResolver(SPEC)
+    parameter = resolver.resolve_shallow({'$ref': '#/components/parameters/Limit'})
+    assert parameter['name'] == 'limit'
+    # Schemas stay references instead of being expanded
+    assert parameter['schema'] == schema_ref('Size')
+    assert resolver.resolve_shallow({'type': 'string'}) == {'type': 'string'}
+
+
+def test_escaped_ref_segments():
+    spec = {'paths': {'/pets/{id}': {'get': {'summary': 'Get'}}}}
+    resolver = RefResolver(spec)
+    assert resolver.resolve_shallow({'$ref': '#/paths/~1pets~1{id}/get'}) == {'summary': 'Get'}
+
+
+def test_circular_ref_chains_stop_instead_of_looping():
+    spec = {'components': {'parameters': {
+        'A': {'$ref': '#/components/parameters/B'},
+        'B': {'$ref': '#/components/parameters/A'}
+    }}}
+    resolved = RefResolver(spec).resolve_shallow({'$ref': '#/components/parameters/A'})
+    assert resolved == {'$ref': '#/components/parameters/A'}
+
+
+def test_unresolvable_refs_are_left_in_place():
+    resolver = RefResolver(SPEC)
+    missing = {'$ref': '#/components/parameters/Missing'}
+    assert resolver.resolve_shallow(missing) is missing
+    bad_index = {'$ref': '#/paths/~1owners/get/parameters/7'}
+    assert resolver.resolve_shallow(bad_index) is bad_index
+    external = {'$ref': 'common.yaml#/Pet'}
+    assert resolver.resolve_shallow(external) is external
+    assert resolver.schemas_used_by([schema_ref('Missing'), external]) == []
+
+
+def test_schemas_used_by_is_transitive_cycle_safe_and_in_spec_order():
+    resolver = RefResolver(SPEC)
+    # Pet -> Owner -> Pet is a cycle; Tag is reached through Pet
+    assert resolver.schemas_used_by(schema_ref('Owner')) == ['Pet', 'Owner', 'Tag']
+    assert resolver.schemas_used_by(schema_ref('Pet')) == ['Pet', 'Owner', 'Tag']
+    # Through non-schema component refs
+    assert resolver.schemas_used_by({'$ref': '#/components/parameters/Limit'}) == ['Size']
+    assert resolver.schemas_used_by({'type': 'string'}) == []
+
+
+def test_parser_resolves_refs_and_indexes_schema_refs():
+    api_info = SpecParser.parse_openapi_spec(json.dumps(SPEC), 'json')
+    endpoints = {f"{e['method']} {e['path']}": e for e in api_info['endpoints']}
+    assert set(endpoints) == {'GET /pets/{petId}', 'GET /owners'}
+
+    owners = endpoints['GET /owners']
+    assert owners['parameters'][0]['name'] == 'limit'
+    assert owners['responses']['200']['description'] == 'Owners'
+    assert owners['schema_refs'] == ['Size', 'Pet', 'Owner', 'Tag']
+    assert endpoints['GET /pets/{petId}']['schema_refs'] == ['Pet', 'Owner', 'Tag']
+
+    # The index gives the same answer as walking the endpoints
+    walked = SpecParser.referenced_schemas(
+        [{key: value for key, value in owners.items() if key != 'schema_refs'}], api_info['schemas']
+    )
+    assert list(SpecParser.referenced_schemas([owners], api_info['schemas'])) == list(walked)
+
+
+JSON_DOCUMENTS = [
+    '{"openapi": "3.0.0", "paths": {}, "x-big": 12345678901234567890123}',
+    '{"max": 18446744073709551616, "min": -9223372036854775809, "u64": 18446744073709551615}',
+    '{"id": "12345678901234567890123", "n": 1.5, "tiny": 1.5e-400}',
+    '{"a": NaN, "b": Infinity, "c": 1e400}',
+    '{"s": "\\ud800", "dup": 1, "dup": 2}',
+    '{"unicode": "\\u00e9\\ud83d\\ude00", "nested": [[], {}, [1, [2.0, null, true]]]}',
+]
+
+
+@pytest.mark.parametrize('text', JSON_DOCUMENTS)
+def test_json_fast_path_matches_json_loads(text):
+    loaded = SpecParser._load_document(text, 'json')
+    expected = json.loads(text)
+    assert repr(loaded) == repr(expected)
+
+
+def test_big_integers_stay_exact():
+    api_info = SpecParser.parse_openapi_spec(json.dumps({
+        'openapi': '3.0.0',
+        'info': {'title': 'Big', 'version': '1.0'},
+        'paths': {'/n': {'get': {'responses': {'200': {'description': 'OK', 'content': {'application/json': {
+            'schema': {'type': 'integer', 'maximum': 12345678901234567890123}
+        }}}}}}}
+    }), 'json')
+    schema = api_info['endpoints'][0]['responses']['200']['content']['application/json']['schema']
+    assert schema['maximum'] == 12345678901234567890123 and isinstance(schema['maximum'], int)
+
+
+YAML_DOCUMENTS = [
+    'openapi: 3.0.0\nbig: 12345678901234567890123\nhex: 0x1F\noctal: 0o17\nfloat: 1.5e3\n',
+    'base: &base {type: string}\nuses: [*base, *base]\nmerged: {<<: *base, format: date}\n',
+    'date: 2024-01-02\nstamp: 2024-01-02T03:04:05Z\nflags: [yes, no, on, off, ~, null]\n',
+    'text: |\n  line one\n  line two\nfolded: >\n  a\n  b\nunicode: "\\u00e9"\n',
+]
+
+
+@pytest.mark.parametrize('text', YAML_DOCUMENTS)
+def test_yaml_fast_path_matches_safe_load(text):
+    assert repr(SpecParser._load_document(text, 'yaml')) == repr(yaml.safe_load(text))
+
+
+@pytest.mark.parametrize('text, file_type, load', [
+    ('{"openapi": "3.0.0",', 'json', json.loads),
+    ('{"openapi": 01}', 'json', json.loads),
+    ('openapi: [3.0.0\n', 'yaml', yaml.safe_load),
+    ('a: b\n  c: d\n', 'yaml', yaml.safe_load),
+])
+def test_parse_errors_match_the_standard_parsers(text, file_type, load):
+    with pytest.raises(Exception) as expected:
+        load(text)
+    with pytest.raises(ValueError) as raised:
+        SpecParser.parse_openapi_spec(text, file_type)
+    assert str(raised.value) == f"Failed to parse specification: {expected.value}"
@@ -0,0 +1,195 @@
+import json
+import threading
+
+import pytest
+
+import spec_validation
+from spec_validation import SpecValidationError, SpecValidator, StructuralCheck, structural_errors
+from streaming_spec_parser import StreamingSpecParser
+
+requires_full = pytest.mark.skipif(spec_validation.get_validator_cls is None, reason='openapi-spec-validator is not installed')
+
+
+def valid_spec():
+    return {
+        'openapi': '3.0.0',
+        'info': {'title': 'Pets', 'version': '1.0'},
+        'paths': {
+            '/pets/{petId}': {
+                'get': {
+                    'parameters': [{'$ref': '#/components/parameters/PetId'}],
+                    'responses': {'200': {'description': 'OK', 'content': {'application/json': {
+                        'schema': {'$ref': '#/components/schemas/Pet'}
+                    }}}}
+                }
+            }
+        },
+        'components': {
+            'parameters': {'PetId': {'name': 'petId', 'in': 'path', 'required': True, 'schema': {'type': 'integer'}}},
+            'schemas': {'Pet': {'type': 'object', 'properties': {'id': {'type': 'integer'}}}}
+        }
+    }
+
+
+def messages(errors):
+    return {(error['path'], error['message']) for error in errors}
+
+
+def streamed_errors(document):
+    check = StructuralCheck()
+    StreamingSpecParser.parse_openapi_spec(json.dumps(document), check)
+    return check.errors
+
+
+def test_valid_spec_has_no_structural_errors():
+    assert structural_errors(valid_spec()) == []
+    assert streamed_errors(valid_spec()) == []
+
+
+def test_structural_errors_point_at_the_problem():
+    spec = valid_spec()
+    spec['openapi'] = '1.0'
+    del spec['info']['title']
+    spec['paths']['pets'] = {'get': {'parameters': [{'name': 'q', 'in': 'body'}]}}
+    errors = messages(structural_errors(spec))
+    assert ('#/openapi', "Unsupported version '1.0'; expected 2.0 or 3.x") in errors
+    assert ('#/info/title', "'title' is a required string") in errors
+    assert ('#/paths/pets', "Path must start with '/'") in errors
+    assert ('#/paths/pets/get', "'responses' is a required property") in errors
+    assert ('#/paths/pets/get/parameters/0/in', "'in' must be one of cookie, header, path, query") in errors
+
+
+def test_missing_required_members():
+    assert messages(structural_errors({})) == {
+        ('#', "'openapi' (or 'swagger') version is a required property"),
+        ('#', "'info' is a required property"),
+        ('#', "'paths' is a required property")
+    }
+    assert structural_errors([]) == [{'path': '#', 'message': 'Specification must be an object'}]
+
+
+@pytest.mark.parametrize('errors_of', [structural_errors, streamed_errors], ids=['document', 'streaming'])
+def test_unresolvable_refs_are_reported_in_paths_and_components(errors_of):
+    spec = valid_spec()
+    del spec['components']['parameters']
+    spec['components']['schemas']['Owner'] = {'properties': {'pet': {'$ref': '#/components/schemas/Missing'}}}
+    assert messages(errors_of(spec)) == {
+        ('#/paths/~1pets~1{petId}/get/parameters/0', 'Unresolvable reference #/components/parameters/PetId'),
+        ('#/components/schemas/Owner/properties/pet', 'Unresolvable reference #/components/schemas/Missing')
+    }
+
+
+@pytest.mark.parametrize('errors_of', [structural_errors, streamed_errors], ids=['document', 'streaming'])
+def test_path_extensions_are_not_paths(errors_of):
+    spec = valid_spec()
+    spec['paths']['x-internal'] = {'owner': 'pets team'}
+    spec['paths']['x-flag'] = True
+    assert errors_of(spec) == []
+
+
+def test_errors_are_capped():
+    spec = valid_spec()
+    spec['paths'] = {f'p{i}': {} for i in range(50)}
+    assert len(structural_errors(spec)) == spec_validation.MAX_ERRORS
+
+
+def test_validator_caches_reports_by_hash():
+    validator = SpecValidator()
+    report = validator.validate('abc', valid_spec(), 100)
+    assert report['valid'] and report['mode'] == 'structural'
+    assert validator.validate('abc', valid_spec(), 100)['cached'] is True
+    stats = validator.stats()
+    assert stats['hits'] == 1
+    assert stats['validations'] == {'structural': 1, 'full': 0}
+
+
+def test_invalid_spec_raises_and_is_cached_as_invalid():
+    validator = SpecValidator()
+    with pytest.raises(SpecValidationError) as excinfo:
+        validator.validate('bad', {'openapi': '3.0.0'}, 10)
+    assert excinfo.value.errors
+    with pytest.raises(SpecValidationError):
+        validator.validate('bad', {}, 10)
+    assert validator.stats()['rejected'] == 2
+
+
+@requires_full
+def test_full_mode_reports_schema_errors():
+    validator = SpecValidator(mode='full', time_budget=30)
+    spec = valid_spec()
+    spec['components']['schemas']['Pet']['type'] = 'not-a-type'
+    with pytest.raises(SpecValidationError) as excinfo:
+        validator.validate('full', spec, 100)
+    assert excinfo.value.report['mode'] == 'full'
+
+
+@requires_full
+def test_full_mode_is_skipped_for_large_documents():
+    validator = SpecValidator(mode='full', full_max_bytes=10)
+    assert validator.validate('large', valid_spec(), 11)['mode'] == 'structural'
+
+
+@pytest.fixture
+def blocked_full_validation(monkeypatch):
+    release = threading.Event()
+
+    def slow_full_errors(document, max_errors=spec_validation.MAX_ERRORS):
+        release.wait(10)
+        return []
+
+    monkeypatch.setattr(spec_validation, 'full_errors', slow_full_errors)
+    yield release
+    release.set()
+
+
+@requires_full
+def test_time_budget_falls_back_to_structural_and_caches_full_later(blocked_full_validation):
+    validator = SpecValidator(mode='full', time_budget=0.05)
+    report = validator.validate('slow', valid_spec(), 100)
+    assert report['mode'] == 'structural' and report['budget_exceeded']
+    blocked_full_validation.set()
+    validator._pool.shutdown(wait=True)
+    assert validator.cached('slow')['mode'] == 'full'
+    assert validator.stats()['budget_exceeded'] == 1
+
+
+@requires_full
+def test_requests_beyond_max_in_flight_do_not_wait(blocked_full_validation):
+    validator = SpecValidator(mode='full', time_budget=0.05, max_in_flight=1)
+    assert validator.validate('first', valid_spec(), 100)['budget_exceeded']
+    report = validator.validate('second', valid_spec(), 100)
+    assert report['overloaded'] and report['mode'] == 'structural'
+    # Not cached, so a later upload still gets full validation
+    assert validator.cached('second') is None
+    assert validator.stats()['overloaded'] == 1
+
+
+@requires_full
+def test_validator_failure_keeps_the_structural_verdict(monkeypatch, caplog):
+    def broken_full_errors(document, max_errors=spec_validation.MAX_ERRORS):
+        raise RuntimeError('validator crashed')
+
+    monkeypatch.setattr(spec_validation, 'full_errors', broken_full_errors)
+    validator = SpecValidator(mode='full', time_budget=5)
+    with caplog.at_level('WARNING', logger='spec_validation'):
+        report = validator.validate('crash', valid_spec(), 100)
+    assert report['mode'] == 'structural' and report['valid']
+    assert 'Full spec validation failed for crash' in caplog.text
+
+
+@requires_full
+def test_full_report_is_stored_before_the_validation_leaves_in_flight(monkeypatch):
+    validator = SpecValidator(mode='full', time_budget=5)
+    store = validator._store
+    seen = []
+
+    def checking_store(spec_hash, report):
+        # A request arriving now must still find the running validation
+        with validator._lock:
+            seen.append(spec_hash in validator._inflight)
+        store(spec_hash, report)
+
+    monkeypatch.setattr(validator, '_store', checking_store)
+    assert validator.validate('ordered', valid_spec(), 100)['mode'] == 'full'
+    assert seen == [True]
+    assert validator.stats()['in_flight'] == 0
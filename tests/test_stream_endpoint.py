@@ -0,0 +1,133 @@
+import glob
+import io
+import json
+import os
+
+import pytest
+
+from result_cache import ResultCache
+from spec_validation import SpecValidator
+
+
+def spec(title='Orders', path='/orders'):
+    return json.dumps({
+        'openapi': '3.0.0',
+        'info': {'title': title, 'version': '1.0'},
+        'paths': {path: {'get': {'responses': {'200': {'description': 'OK'}}}}}
+    }).encode('utf-8')
+
+
+def post_stream(client, content, name='api.json', **kwargs):
+    return client.post('/generate/stream', data={'file': (io.BytesIO(content), name)},
+                       content_type='multipart/form-data', **kwargs)
+
+
+def parse_events(body):
+    events = []
+    for message in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in message.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def partial_files(app_module):
+    return glob.glob(os.path.join(app_module.artifact_store.folder, '*.part'))
+
+
+@pytest.fixture
+def result_cache(pipeline, app_module, tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / 'results.sqlite3'))
+    monkeypatch.setattr(pipeline, 'result_cache', cache)
+    monkeypatch.setattr(app_module, 'result_cache', cache)
+    return cache
+
+
+def test_stream_relays_meta_chunks_and_done(client, app_module):
+    response = post_stream(client, spec())
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    events = parse_events(response.get_data(as_text=True))
+
+    assert events[0] == ('meta', {'filename': 'Orders_Tests.java', 'api_title': 'Orders', 'endpoints_count': 1})
+    assert {name for name, _ in events[1:-1]} == {'chunk'}
+    name, done = events[-1]
+    assert name == 'done' and done['success'] and done['revision'] == 1
+
+    generated = ''.join(data['text'] for _, data in events[1:-1])
+    assert 'GET /orders' in generated
+    download = client.get(done['download_url'])
+    assert download.status_code == 200 and download.get_data(as_text=True) == generated
+    assert app_module.session_store.get(done['session_id'])['revisions'][-1]['code'] == generated
+    assert partial_files(app_module) == []
+
+
+def test_stream_serves_cached_results_without_calling_the_model(client, result_cache, watsonx_server):
+    first = parse_events(post_stream(client, spec('Cached')).get_data(as_text=True))
+    calls = watsonx_server.snapshot().get('stream', 0)
+
+    events = parse_events(post_stream(client, spec('Cached')).get_data(as_text=True))
+    assert [name for name, _ in events] == ['meta', 'chunk', 'done']
+    assert events[1][1]['text'] == ''.join(data['text'] for name, data in first if name == 'chunk')
+    assert events[2][1]['cached'] and events[2][1]['session_id'] != first[-1][1]['session_id']
+    assert client.get(events[2][1]['download_url']).get_data(as_text=True) == events[1][1]['text']
+    assert watsonx_server.snapshot().get('stream', 0) == calls
+
+
+def test_stream_rejects_specs_too_large_for_one_prompt(client, pipeline, monkeypatch):
+    monkeypatch.setitem(pipeline.config, 'PROMPT_TOKEN_BUDGET', 10)
+    response = post_stream(client, spec())
+    assert response.status_code == 413
+    body = response.get_json()
+    assert '/generate' in body['error'] and 'prompt' in body
+
+
+def test_stream_rejects_bad_uploads_and_specs(client, pipeline, monkeypatch):
+    assert post_stream(client, spec(), name='api.txt').status_code == 400
+    assert client.post('/generate/stream', data={}, content_type='multipart/form-data').status_code == 400
+
+    response = post_stream(client, b'{"openapi": ')
+    assert response.status_code == 500 and 'Failed to generate tests' in response.get_json()['error']
+
+    monkeypatch.setattr(pipeline, 'spec_validator', SpecValidator())
+    response = post_stream(client, json.dumps({'openapi': '3.0.0', 'paths': []}).encode('utf-8'))
+    assert response.status_code == 400 and response.get_json()['validation_errors']
+
+
+def test_upstream_error_sends_an_error_event_and_removes_the_partial_file(client, app_module, monkeypatch):
+    def failing_stream(prompt, priority, max_new_tokens):
+        yield 'public class OrdersTests {'
+        assert len(partial_files(app_module)) == 1
+        raise Exception('watsonx stream failed: 503')
+
+    monkeypatch.setattr(app_module.granite_client, 'generate_test_cases_stream', failing_stream)
+    events = parse_events(post_stream(client, spec()).get_data(as_text=True))
+    assert [name for name, _ in events] == ['meta', 'chunk', 'error']
+    assert 'watsonx stream failed' in events[-1][1]['error']
+    assert partial_files(app_module) == []
+
+
+def test_empty_generation_sends_an_error_event(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module.granite_client, 'generate_test_cases_stream',
+                        lambda prompt, priority, max_new_tokens: iter(['  ', '\n']))
+    events = parse_events(post_stream(client, spec()).get_data(as_text=True))
+    assert events[-1] == ('error', {'error': 'Test generation failed or returned empty result.'})
+    assert partial_files(app_module) == []
+
+
+def test_client_disconnect_removes_the_partial_file(client, app_module, monkeypatch):
+    produced = []
+
+    def endless_stream(prompt, priority, max_new_tokens):
+        while True:
+            produced.append(1)
+            yield 'assertEquals(200, 200);\n'
+
+    monkeypatch.setattr(app_module.granite_client, 'generate_test_cases_stream', endless_stream)
+    response = post_stream(client, spec(), buffered=False)
+    body = iter(response.response)
+    assert next(body).startswith(b'event: meta')
+    assert next(body).startswith(b'event: chunk')
+    assert len(partial_files(app_module)) == 1
+
+    response.close()
+    assert partial_files(app_module) == []
+    assert len(produced) == 1
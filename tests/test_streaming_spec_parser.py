@@ -0,0 +1,136 @@
+import json
+import os
+
+import pytest
+import yaml
+
+from bench_spec_parser import generate_spec
+from prompt_builder import build_test_generation_prompt
+from spec_parser import SpecParser
+from streaming_spec_parser import JsonScanner, StreamingSpecParser
+
+PETSTORE = os.path.join(os.path.dirname(__file__), '..', 'sample_specs', 'petstore.yaml')
+
+REFS_SPEC = {
+    'openapi': '3.0.0',
+    'info': {'title': 'Refs API', 'version': '2.0', 'description': 'Operations pointing into components'},
+    'servers': [{'url': 'https://refs.example.com'}],
+    'paths': {
+        '/orders/{orderId}': {
+            'parameters': [
+                {'$ref': '#/components/parameters/OrderId'},
+                {'name': 'trace', 'in': 'header', 'schema': {'type': 'string'}}
+            ],
+            'get': {
+                'summary': 'Get an order',
+                'parameters': [{'name': 'trace', 'in': 'header', 'required': True, 'schema': {'type': 'string'}}],
+                'responses': {'200': {'$ref': '#/components/responses/OrderResponse'}, '404': {'description': 'Missing'}}
+            },
+            'put': {
+                'summary': 'Replace an order',
+                'requestBody': {'$ref': '#/components/requestBodies/OrderBody'},
+                'responses': {'204': {'description': 'Replaced'}}
+            }
+        },
+        '/customers': {'$ref': '#/components/pathItems/Customers'},
+        'x-owner': 'orders team'
+    },
+    'components': {
+        'parameters': {
+            'OrderId': {'name': 'orderId', 'in': 'path', 'required': True, 'schema': {'type': 'integer'}}
+        },
+        'requestBodies': {
+            'OrderBody': {'content': {'application/json': {'schema': {'$ref': '#/components/schemas/Order'}}}}
+        },
+        'responses': {
+            'OrderResponse': {
+                'description': 'An order',
+                'content': {'application/json': {'schema': {'$ref': '#/components/schemas/Order'}}}
+            }
+        },
+        'pathItems': {
+            'Customers': {
+                'get': {
+                    'summary': 'List customers',
+                    'responses': {'200': {'content': {'application/json': {
+                        'schema': {'type': 'array', 'items': {'$ref': '#/components/schemas/Customer'}}
+                    }}}}
+                }
+            }
+        },
+        'schemas': {
+            'Order': {'type': 'object', 'properties': {
+                'id': {'type': 'integer'},
+                'customer': {'$ref': '#/components/schemas/Customer'},
+                'lines': {'type': 'array', 'items': {'$ref': '#/components/schemas/OrderLine'}}
+            }},
+            'OrderLine': {'type': 'object', 'properties': {'order': {'$ref': '#/components/schemas/Order'}}},
+            'Customer': {'type': 'object', 'properties': {'name': {'type': 'string'}}},
+            'Unused': {'type': 'object', 'properties': {'flag': {'type': 'boolean'}}}
+        }
+    }
+}
+
+
+def load_petstore():
+    with open(PETSTORE, encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def parse_both(document):
+    text = json.dumps(document)
+    return SpecParser.parse_openapi_spec(text, 'json'), StreamingSpecParser.parse_openapi_spec(text)
+
+
+def endpoint_summary(endpoint):
+    return (endpoint['path'], endpoint['method'], endpoint['summary'], list(endpoint['tags']),
+            list(endpoint['responses']), list(endpoint['schema_refs']))
+
+
+@pytest.mark.parametrize('document', [
+    pytest.param(load_petstore(), id='petstore'),
+    pytest.param(generate_spec(num_paths=50, num_schemas=20), id='generated'),
+    pytest.param(REFS_SPEC, id='refs')
+])
+def test_streaming_parser_matches_spec_parser(document):
+    expected, actual = parse_both(document)
+    for key in ('title', 'version', 'description', 'base_url'):
+        assert actual[key] == expected[key]
+    assert [endpoint_summary(e) for e in actual['endpoints']] == [endpoint_summary(e) for e in expected['endpoints']]
+    assert list(actual['schemas']) == list(expected['schemas'])
+    # Same prompt at full detail and fully compacted
+    for max_tokens in (None, 1):
+        assert build_test_generation_prompt(actual, max_tokens).text == \
+            build_test_generation_prompt(expected, max_tokens).text
+
+
+def test_component_refs_are_resolved():
+    _, api_info = parse_both(REFS_SPEC)
+    get_order, put_order, list_customers = api_info['endpoints']
+    assert [(p['name'], p['in'], p.get('required', False)) for p in get_order['parameters']] == [
+        ('orderId', 'path', True), ('trace', 'header', True)
+    ]
+    assert get_order['schema_refs'] == ['Order', 'OrderLine', 'Customer']
+    assert put_order['request_body'] == {'content': {'application/json': {'schema': {'$ref': '#/components/schemas/Order'}}}}
+    assert list_customers['path'] == '/customers'
+    assert list_customers['schema_refs'] == ['Customer']
+
+
+def test_identical_compact_nodes_are_shared():
+    _, api_info = parse_both(generate_spec(num_paths=10, num_schemas=5))
+    id_parameters = {id(e['parameters'][0]) for e in api_info['endpoints']}
+    assert len(id_parameters) == 1
+
+
+@pytest.mark.parametrize('text', ['[]', '{"paths": {}', '{"paths": {}} trailing', '{"a" 1}'])
+def test_malformed_documents_raise_value_error(text):
+    with pytest.raises(ValueError, match='Failed to parse specification'):
+        StreamingSpecParser.parse_openapi_spec(text)
+
+
+def test_scanner_reads_members_one_value_at_a_time():
+    scanner = JsonScanner('{"a": [1, 2], "b": {"c": null}}')
+    values = {}
+    for key in scanner.members():
+        values[key] = scanner.value()
+    assert values == {'a': [1, 2], 'b': {'c': None}}
@@ -0,0 +1,73 @@
+import io
+import json
+from tempfile import SpooledTemporaryFile
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+SPEC = {
+    'openapi': '3.0.0',
+    'info': {'title': 'Orders', 'version': '1.0'},
+    'paths': {'/orders': {'get': {'responses': {'200': {'description': 'OK'}}}}}
+}
+
+
+@pytest.fixture
+def spools(app_module, monkeypatch):
+    """Every buffer the request class creates for an upload, with a 1 KB spool threshold."""
+    monkeypatch.setitem(app_module.app.config, 'UPLOAD_SPOOL_THRESHOLD', 1024)
+    created = []
+    get_file_stream = app_module.SpooledUploadRequest._get_file_stream
+
+    def recording(self, *args, **kwargs):
+        created.append(get_file_stream(self, *args, **kwargs))
+        return created[-1]
+
+    monkeypatch.setattr(app_module.SpooledUploadRequest, '_get_file_stream', recording)
+    return created
+
+
+def upload(client, content, name='api.json'):
+    return client.post('/generate', data={'file': (io.BytesIO(content), name)}, content_type='multipart/form-data')
+
+
+def padded_spec(size):
+    spec = dict(SPEC, info=dict(SPEC['info'], description=''))
+    spec['info']['description'] = 'x' * (size - len(json.dumps(spec)))
+    return json.dumps(spec).encode('utf-8')
+
+
+def test_small_uploads_stay_in_memory(client, spools):
+    response = upload(client, padded_spec(512))
+    assert response.status_code == 200
+    assert len(spools) == 1 and not spools[0]._rolled and spools[0].closed
+
+
+def test_uploads_over_the_threshold_spill_to_a_temp_file(client, spools):
+    response = upload(client, padded_spec(4096))
+    assert response.status_code == 200
+    assert len(spools) == 1 and spools[0]._rolled and spools[0].closed
+
+
+@pytest.mark.parametrize('content', [b'\xff\xfe' * 2048, b'{"openapi": ' + b' ' * 4096])
+def test_temp_file_is_closed_when_the_spec_cannot_be_read(client, spools, content):
+    response = upload(client, content)
+    assert response.status_code == 500 and 'Failed to generate tests' in response.get_json()['error']
+    assert len(spools) == 1 and spools[0]._rolled and spools[0].closed
+
+
+def test_read_upload_closes_the_buffer_on_decode_errors(app_module):
+    buffer = SpooledTemporaryFile(max_size=16, mode='rb+')
+    buffer.write(b'\xff' * 64)
+    buffer.seek(0)
+    with pytest.raises(UnicodeDecodeError):
+        app_module.read_upload(FileStorage(stream=buffer, filename='../api.json'))
+    assert buffer.closed
+
+    buffer = SpooledTemporaryFile(max_size=16, mode='rb+')
+    buffer.write(b'{"openapi": "3.0.0"}')
+    buffer.seek(0)
+    assert app_module.read_upload(FileStorage(stream=buffer, filename='../api.json')) == (
+        'api.json', '{"openapi": "3.0.0"}'
+    )
+    assert buffer.closed
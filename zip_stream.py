@@ -0,0 +1,48 @@
+import time
+import zipfile
+
+
+class _Sink:
+    """Write-only file object collecting the bytes ZipFile produces until they are drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """
+    Builds a ZIP archive piece by piece for a streamed response. Each add()
+    returns the bytes of the finished entry, ready to be sent, so only the
+    entry being written is held in memory. The sink cannot seek, so ZipFile
+    writes sizes and CRCs in data descriptors after each entry, and the
+    central directory comes out of close().
+    """
+
+    def __init__(self, compression=zipfile.ZIP_DEFLATED):
+        self.compression = compression
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, 'w', compression)
+
+    def add(self, name, text):
+        """Add a text file to the archive and return the bytes to send for it."""
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = self.compression
+        self._zip.writestr(info, text.encode('utf-8'))
+        return self._sink.drain()
+
+    def close(self):
+        """Finish the archive and return its remaining bytes (the central directory)."""
+        self._zip.close()
+        return self._sink.drain()